@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+
+# Vendored asset files are looked up next to this module, whatever the working directory
+VENDOR_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor')
+ASSETS_FOLDER = 'assets'
+
+# Vendored file -> CDN copy used when the file is not in the vendor folder
+CDN_URLS = {
+    'bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+}
+
+# Stylesheets linked from every page (the layout classes rely on Bootstrap's grid)
+PAGE_STYLESHEETS = ['bootstrap.min.css']
+
+# Feature recorded while rendering -> scripts the page needs for it
+FEATURE_SCRIPTS = {
+    'carousel': ['bootstrap.bundle.min.js'],
+}
+
+def hashed_filename(filename, content):
+    """
+    :param filename: Asset filename, e.g. bootstrap.min.css
+    :param content: Asset bytes
+    :return: Filename with a content hash before the extension, e.g. bootstrap.min.1a2b3c4d5e.css
+    """
+    import hashlib
+
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+
+class AssetManifest:
+    def __init__(self, output_folder, vendor_folder=None):
+        """
+        Resolve front-end assets to content-hashed copies of the vendored files
+
+        Vendored files are copied once into ``<output_folder>/assets/`` under a
+        content-hashed name, so pages can be cached forever and served without
+        network access. Assets missing from the vendor folder fall back to the
+        CDN with a warning.
+
+        :param output_folder: Folder the pages are written to, or None to always link the CDN
+        :param vendor_folder: Folder holding the vendored asset files, defaults to VENDOR_FOLDER
+        """
+        self.output_folder = output_folder
+        self.vendor_folder = vendor_folder or VENDOR_FOLDER
+        self.urls = {}
+        self._lock = threading.Lock()
+
+    def url(self, filename):
+        """
+        :param filename: Asset filename from CDN_URLS
+        :return: URL of the asset relative to the output folder
+        """
+        url = self.urls.get(filename)
+        if url is None:
+            with self._lock:
+                url = self.urls.get(filename)
+                if url is None:
+                    url = self.urls[filename] = self._resolve(filename)
+        return url
+
+    def _resolve(self, filename):
+        if self.output_folder is None:
+            return CDN_URLS[filename]
+        vendor_path = os.path.join(self.vendor_folder, filename)
+        try:
+            with open(vendor_path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            print(f"Warning: {filename} is not vendored in {self.vendor_folder}, pages link it from the CDN "
+                  f"and need network access: {CDN_URLS[filename]}")
+            return CDN_URLS[filename]
+
+        target = hashed_filename(filename, content)
+        target_path = os.path.join(self.output_folder, ASSETS_FOLDER, target)
+        if not os.path.exists(target_path):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            tmp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, target_path)
+        return f"{ASSETS_FOLDER}/{target}"
+
+    def stylesheet_links(self):
+        """
+        :return: <link> tags for the stylesheets every page uses
+        """
+        return "".join(f'    <link href="{self.url(name)}" rel="stylesheet">\n' for name in PAGE_STYLESHEETS)
+
+    def script_tags(self, features):
+        """
+        :param features: Features recorded while rendering the page
+        :return: Deferred <script> tags for the scripts those features need
+        """
+        scripts = []
+        for feature in sorted(features):
+            for name in FEATURE_SCRIPTS.get(feature, ()):
+                if name not in scripts:
+                    scripts.append(name)
+        return "".join(f'<script src="{self.url(name)}" defer></script>\n' for name in scripts)
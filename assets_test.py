@@ -0,0 +1,31 @@
+import os
+
+from assets import ASSETS_FOLDER, CDN_URLS, VENDOR_FOLDER, AssetManifest, hashed_filename
+
+def test_default_vendor_folder_does_not_depend_on_the_working_directory(workdir):
+    assert os.path.isabs(VENDOR_FOLDER)
+    assert AssetManifest(str(workdir)).vendor_folder == VENDOR_FOLDER
+
+def test_vendored_assets_are_copied_under_hashed_names(tmp_path):
+    vendor = tmp_path / 'vendor'
+    vendor.mkdir()
+    (vendor / 'bootstrap.min.css').write_bytes(b'body{}')
+    output = tmp_path / 'output'
+    manifest = AssetManifest(str(output), str(vendor))
+
+    name = hashed_filename('bootstrap.min.css', b'body{}')
+    assert manifest.stylesheet_links() == f'    <link href="{ASSETS_FOLDER}/{name}" rel="stylesheet">\n'
+    assert (output / ASSETS_FOLDER / name).read_bytes() == b'body{}'
+
+def test_missing_assets_fall_back_to_the_cdn_with_a_warning(tmp_path, capsys):
+    manifest = AssetManifest(str(tmp_path / 'output'), str(tmp_path / 'empty'))
+    assert manifest.url('bootstrap.min.css') == CDN_URLS['bootstrap.min.css']
+    assert 'Warning: bootstrap.min.css is not vendored' in capsys.readouterr().out
+    # Resolved once per manifest
+    manifest.url('bootstrap.min.css')
+    assert capsys.readouterr().out == ''
+
+def test_scripts_are_only_linked_for_used_features():
+    manifest = AssetManifest(None)
+    assert manifest.script_tags(set()) == ''
+    assert manifest.script_tags({'carousel'}) == f'<script src="{CDN_URLS["bootstrap.bundle.min.js"]}" defer></script>\n'
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import random
+
+from element_registry import PrerenderedChildren
+from json_compiler import node_fields
+
+class Backend:
+    """
+    Output target fed by a single traversal of a parsed DSL tree
+
+    traverse() calls enter() for a node before its children and leave()
+    after them. Backends that set ``uses_fields`` receive the node's JSON
+    object (see json_compiler.node_fields), shared between all backends of
+    the traversal; the others get None.
+    """
+    uses_fields = True
+
+    def enter(self, node, fields):
+        pass
+
+    def leave(self, node, fields):
+        pass
+
+    def result(self):
+        return None
+
+class JSONBackend(Backend):
+    """
+    Builds the JSON intermediate, identical to Node.tojson
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.root = None
+
+    def enter(self, node, fields):
+        if self.stack:
+            self.stack[-1]['nodes'].append(fields)
+        else:
+            self.root = fields
+        self.stack.append(fields)
+
+    def leave(self, node, fields):
+        self.stack.pop()
+
+    def result(self):
+        return self.root
+
+class HTMLBackend(Backend):
+    """
+    Renders HTML through the element handlers, identical to JSONCompiler.render_node
+
+    Nodes are rendered on leave() with their children's HTML already
+    collected, so the tree is walked once. The features used by the page are
+    left in renderer.features.
+    """
+
+    def __init__(self, renderer):
+        """
+        :param renderer: new_compiler.JSONCompiler providing the registry and placeholder content
+        """
+        self.renderer = renderer
+        self.registry = renderer.registry
+        # Handlers run one at a time on leave(), so one proxy serves every node
+        self.proxy = PrerenderedChildren(renderer, '')
+        self.stack = []
+        self.html = None
+
+    def enter(self, node, fields):
+        if not self.stack:
+            self.renderer.features = set()
+        self.stack.append([])
+
+    def leave(self, node, fields):
+        children = ''.join(self.stack.pop())
+        element = fields.get('element', '')
+        features = self.registry.features.get(element)
+        if features:
+            self.renderer.features.update(features)
+        handler = self.registry.handlers.get(element)
+        if handler is None:
+            # Fallback to generic div for unmapped elements
+            html = f'<div class="{element}">{children}</div>'
+        else:
+            self.proxy._html = children
+            html = handler(self.proxy, fields)
+        if self.stack:
+            self.stack[-1].append(html)
+        else:
+            self.html = html
+
+    def result(self):
+        return self.html
+
+class TokenBackend(Backend):
+    """
+    Flattens the tree into structure tokens, identical to dataset_export.iter_tokens/encode_tree
+    """
+    uses_fields = False
+
+    def __init__(self, vocab=None):
+        """
+        :param vocab: Optional vocabulary from dataset_export.build_vocabulary; when given
+            the result is the list of token ids wrapped in <start>/<end>
+        """
+        self.vocab = vocab
+        self.tokens = []
+        self.depth = 0
+
+    def enter(self, node, fields):
+        # The root and use nodes add no tokens of their own, see iter_tokens
+        if self.depth and node.component is None:
+            self.tokens.append(node.name)
+            if node.children:
+                self.tokens.append('{')
+        self.depth += 1
+
+    def leave(self, node, fields):
+        self.depth -= 1
+        if self.depth and node.component is None and node.children:
+            self.tokens.append('}')
+
+    def result(self):
+        if self.vocab is None:
+            return self.tokens
+        unk = self.vocab['<unk>']
+        ids = [self.vocab['<start>']]
+        ids.extend(self.vocab.get(token, unk) for token in self.tokens)
+        ids.append(self.vocab['<end>'])
+        return ids
+
+def traverse(root, backends, rng=random):
+    """
+    Walk a parsed DSL tree once, feeding every backend
+
+    The JSON fields of all nodes are drawn first, in the pre-order Node.tojson
+    draws them in, before any handler runs. With a renderer drawing from the
+    same rng, the JSON and HTML therefore equal ``root.tojson(rng)`` and
+    ``renderer.render_node()`` of that JSON.
+
+    :param root: Node returned by Compiler.parse_dsl
+    :param backends: List of Backend instances
+    :param rng: random.Random for the JSON placeholder content, defaults to the global RNG
+    :return: List of the backends' results, in the same order
+    """
+    uses_fields = any(backend.uses_fields for backend in backends)
+    enters = [backend.enter for backend in backends]
+    leaves = [backend.leave for backend in reversed(backends)]
+
+    fields_list = []
+    if uses_fields:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            fields_list.append(node_fields(node, rng))
+            stack.extend(reversed(node.children))
+    fields_iter = iter(fields_list)
+
+    def visit(node):
+        fields = next(fields_iter) if uses_fields else None
+        for enter in enters:
+            enter(node, fields)
+        for child in node.children:
+            visit(child)
+        for leave in leaves:
+            leave(node, fields)
+
+    visit(root)
+    return [backend.result() for backend in backends]
@@ -0,0 +1,57 @@
+import random
+import struct
+
+from backends import HTMLBackend, JSONBackend, TokenBackend, traverse
+from dataset_export import iter_tokens
+from json_compiler import Compiler
+from new_compiler import JSONCompiler
+
+# text-c, text-r and image draw from the renderer's RNG while rendering
+DSL = """container{
+\ttext
+\ttext-c
+\trow{
+\t\timage
+\t\tparagraph
+\t\ttext-r
+\t}
+\tbutton
+}
+card{
+\timage
+\tnavlink
+}
+"""
+
+def png(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height)
+
+def test_single_traversal_matches_tojson_and_render_node_with_a_seeded_rng(tmp_path, mapping_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    for name in ('a.png', 'b.png', 'c.png'):
+        (images / name).write_bytes(png(4, 3))
+    compiler = JSONCompiler(mapping_path, None, str(images))
+    root = Compiler(mapping_path).parse_dsl(DSL)
+
+    for seed in range(5):
+        rng = random.Random(seed)
+        json_data, html = traverse(root, [JSONBackend(), HTMLBackend(compiler.context(rng))], rng)
+
+        rng = random.Random(seed)
+        expected_json = root.tojson(rng)
+        expected_html = compiler.context(rng).render_node(expected_json)
+        assert json_data == expected_json
+        assert html == expected_html
+
+def test_token_backend_matches_iter_tokens(mapping_path):
+    root = Compiler(mapping_path).parse_dsl(DSL)
+    (tokens,) = traverse(root, [TokenBackend()])
+    assert tokens == list(iter_tokens(root))
+
+def test_token_backend_does_not_draw_json_fields(mapping_path):
+    root = Compiler(mapping_path).parse_dsl(DSL)
+    rng = random.Random(1)
+    state = rng.getstate()
+    traverse(root, [TokenBackend()], rng)
+    assert rng.getstate() == state
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import re
+
+# Metrics a budget can limit, in report column order
+METRICS = ('nodes', 'depth', 'html_bytes', 'css_bytes', 'images', 'image_bytes')
+
+_IMG_SRC = re.compile(r'<img\b[^>]*?\bsrc="([^"]*)"')
+
+class BudgetExceeded(Exception):
+    """
+    Raised when pages exceed a budget's fail threshold
+    """
+
+class PageStats:
+    """
+    Size statistics of one page, filled in by the renderer while it walks the tree
+    """
+
+    def __init__(self, page=None):
+        self.page = page
+        self.elements = {}
+        self.nodes = 0
+        self.depth = 0
+        self.html_bytes = 0
+        self.css_bytes = 0
+        self.images = 0
+        self.image_bytes = 0
+
+    def add_node(self, element, depth):
+        self.elements[element] = self.elements.get(element, 0) + 1
+        self.nodes += 1
+        if depth > self.depth:
+            self.depth = depth
+
+    def add_image(self, entry):
+        """
+        :param entry: Image index entry of the referenced image, or None if it is not indexed
+        """
+        self.images += 1
+        if entry:
+            self.image_bytes += entry['size']
+
+    def add_images_from_html(self, html, image_index):
+        # Fragments served from the fragment cache were not rendered, so their
+        # images are read back from the HTML
+        for src in _IMG_SRC.findall(html):
+            self.add_image(image_index.get(src.replace('\\', '/').rsplit('/', 1)[-1]))
+
+    def as_dict(self):
+        return {'page': self.page, **{metric: getattr(self, metric) for metric in METRICS},
+                'elements': dict(sorted(self.elements.items()))}
+
+def load_budgets(path):
+    """
+    Load budgets from a JSON file of ``{"metric": {"warn": limit, "fail": limit}}``
+
+    Either threshold may be left out. Metrics are listed in METRICS.
+
+    :param path: Path to the budgets file
+    :return: Dictionary of metric -> {'warn': ..., 'fail': ...}
+    """
+    with open(path, 'r') as f:
+        budgets = json.load(f)
+    unknown = set(budgets) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown budget metrics: {', '.join(sorted(unknown))}")
+    return budgets
+
+def check_budgets(stats, budgets):
+    """
+    Compare page statistics against budgets and print a line per exceeded threshold.
+
+    :param stats: List of PageStats
+    :param budgets: Budgets from load_budgets
+    :return: (warnings, failures) as lists of (page, metric, value, limit)
+    """
+    warnings = []
+    failures = []
+    for page_stats in stats:
+        for metric, limits in budgets.items():
+            value = getattr(page_stats, metric)
+            if limits.get('fail') is not None and value > limits['fail']:
+                failures.append((page_stats.page, metric, value, limits['fail']))
+            elif limits.get('warn') is not None and value > limits['warn']:
+                warnings.append((page_stats.page, metric, value, limits['warn']))
+    for page, metric, value, limit in warnings:
+        print(f"Budget warning: {page} {metric} = {value} (budget {limit})")
+    for page, metric, value, limit in failures:
+        print(f"Budget exceeded: {page} {metric} = {value} (limit {limit})")
+    return warnings, failures
+
+def write_report(stats, path):
+    """
+    Write page statistics as CSV (for a .csv path) or JSON
+
+    :param stats: List of PageStats
+    :param path: Report file path
+    """
+    rows = [page_stats.as_dict() for page_stats in sorted(stats, key=lambda s: str(s.page))]
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['page', *METRICS, 'elements'])
+            for row in rows:
+                elements = ' '.join(f"{element}:{count}" for element, count in row['elements'].items())
+                writer.writerow([row['page'], *(row[metric] for metric in METRICS), elements])
+    else:
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=2)
+    print(f"Wrote page statistics: {path}")
+
+def enforce_budgets(stats, budgets_path=None, report_path=None):
+    """
+    Write the statistics report and apply the budgets of a build
+
+    :param stats: List of PageStats
+    :param budgets_path: Optional budgets file
+    :param report_path: Optional report file (.json or .csv)
+    :raises BudgetExceeded: If any page is over a fail threshold
+    """
+    if report_path:
+        write_report(stats, report_path)
+    if budgets_path:
+        _, failures = check_budgets(stats, load_budgets(budgets_path))
+        if failures:
+            raise BudgetExceeded(f"{len(failures)} budget(s) exceeded on {len({f[0] for f in failures})} page(s)")
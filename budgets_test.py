@@ -0,0 +1,73 @@
+import csv
+import json
+import os
+
+import pytest
+
+from budgets import BudgetExceeded, PageStats, check_budgets, enforce_budgets, load_budgets, write_report
+from new_compiler import process_json_batch
+
+def node(element, *nodes):
+    return {'name': '', 'element': element, 'nodes': list(nodes)}
+
+def stats(page, **metrics):
+    page_stats = PageStats(page)
+    for metric, value in metrics.items():
+        setattr(page_stats, metric, value)
+    return page_stats
+
+def test_page_stats_counts_nodes_and_images():
+    page_stats = PageStats('p')
+    page_stats.add_node('root', 1)
+    page_stats.add_node('text', 3)
+    page_stats.add_node('text', 2)
+    page_stats.add_image({'size': 100})
+    page_stats.add_image(None)
+    page_stats.add_images_from_html('<img class="x" src="images\\a.png"><img src="b.png">', {'a.png': {'size': 7}})
+    assert (page_stats.nodes, page_stats.depth, page_stats.images, page_stats.image_bytes) == (3, 3, 4, 107)
+    assert page_stats.as_dict()['elements'] == {'root': 1, 'text': 2}
+
+def test_check_budgets_separates_warnings_and_failures():
+    budgets = {'nodes': {'warn': 10, 'fail': 20}, 'depth': {'fail': 5}}
+    warnings, failures = check_budgets([stats('a', nodes=15, depth=5), stats('b', nodes=25, depth=6)], budgets)
+    assert warnings == [('a', 'nodes', 15, 10)]
+    assert sorted(failures) == [('b', 'depth', 6, 5), ('b', 'nodes', 25, 20)]
+
+def test_load_budgets_rejects_unknown_metrics(tmp_path):
+    path = tmp_path / 'budgets.json'
+    path.write_text(json.dumps({'nodes': {'warn': 1}, 'colors': {'fail': 3}}))
+    with pytest.raises(ValueError, match='colors'):
+        load_budgets(str(path))
+
+def test_write_report_csv_and_json(tmp_path):
+    page_stats = [stats('b', nodes=2), stats('a', nodes=1)]
+    page_stats[1].add_node('text', 1)
+    write_report(page_stats, str(tmp_path / 'report.csv'))
+    write_report(page_stats, str(tmp_path / 'report.json'))
+
+    with open(tmp_path / 'report.csv', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['page', 'nodes', 'depth', 'html_bytes', 'css_bytes', 'images', 'image_bytes', 'elements']
+    assert [row[0] for row in rows[1:]] == ['a', 'b']
+    assert rows[1][-1] == 'text:1'
+    with open(tmp_path / 'report.json') as f:
+        assert [row['page'] for row in json.load(f)] == ['a', 'b']
+
+def test_enforce_budgets_on_a_compiled_batch(workdir, mapping_path):
+    os.makedirs('json')
+    with open(os.path.join('json', 'page.json'), 'w') as f:
+        json.dump(node('root', node('container', node('text'), node('image'))), f)
+    page_stats = []
+    process_json_batch('json', 'output', mapping_path, stats=page_stats)
+    assert [(s.page, s.nodes, s.depth, s.images) for s in page_stats] == [('page', 4, 3, 1)]
+    assert page_stats[0].html_bytes == os.path.getsize(os.path.join('output', 'page.html'))
+    assert page_stats[0].css_bytes == os.path.getsize(os.path.join('output', 'page_styles.css'))
+
+    with open('budgets.json', 'w') as f:
+        json.dump({'nodes': {'warn': 3, 'fail': 10}}, f)
+    enforce_budgets(page_stats, 'budgets.json', 'report.json')
+    assert os.path.exists('report.json')
+    with open('budgets.json', 'w') as f:
+        json.dump({'nodes': {'fail': 3}}, f)
+    with pytest.raises(BudgetExceeded):
+        enforce_budgets(page_stats, 'budgets.json')
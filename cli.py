@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the DSL compilers.
+
+    python cli.py dsl2json dsl/ -j json
+    python cli.py json2html json/0.json -o output
+    python cli.py json2html json --budget budgets.json --stats-report stats.csv
+    python cli.py build dsl/ -j json -o output
+    python cli.py batch json -o output --workers 8
+    python cli.py build dsl/ -j json -o output --memprofile 10
+    python cli.py bench --pages 10000
+    python cli.py render json/0.json --path root/container/row[1]
+    python cli.py regress json --record
+    python cli.py variants dsl/0.dsl --count 500
+    python cli.py report -o output
+    python cli.py serve -d output
+
+Modules are imported inside the subcommands so a one-page compile only
+loads what it uses.
+"""
+
+import itertools
+import os
+import sys
+
+def _dsl_lines(path):
+    # A single .dsl file is read as a one-document bundle named after the file
+    page = os.path.splitext(os.path.basename(path))[0]
+    return itertools.chain([f"--- {page}\n"], open(path, 'r', buffering=1 << 16))
+
+def _history(args):
+    # dsl2json has no HTML folder of its own: its history goes where json2html's does
+    from telemetry import history_path
+
+    return args.history or history_path(getattr(args, 'output', None) or HTML_FOLDER['default'])
+
+def dsl2json(args, output_folder=None):
+    from json_compiler import process_dsl_files, process_dsl_stream
+
+    inline = not args.component_refs
+    if args.memprofile:
+        from memprofile import profile_files
+
+        return len(profile_files(args.inputs, args.json, output_folder, args.mapping, args.images,
+                                 args.memprofile, inline, args.compact).files)
+    count = 0
+    for source in args.inputs:
+        if os.path.isdir(source) and output_folder is None:
+            process_dsl_files(source, args.json, args.json, args.mapping, inline, args.compact, _history(args))
+        elif os.path.isdir(source):
+            for filename in sorted(os.listdir(source)):
+                if filename.endswith('.dsl'):
+                    count += process_dsl_stream(_dsl_lines(os.path.join(source, filename)), args.json,
+                                                output_folder, args.mapping, args.images,
+                                                inline_components=inline, compact=args.compact)
+        elif source.endswith('.dsl'):
+            count += process_dsl_stream(_dsl_lines(source), args.json, output_folder, args.mapping, args.images,
+                                        inline_components=inline, compact=args.compact)
+        else:
+            count += process_dsl_stream(source, args.json, output_folder, args.mapping, args.images, args.format,
+                                        inline, args.compact)
+    return count
+
+def json2html(args):
+    import json
+
+    from new_compiler import JSONCompiler, generate_css_cached, process_json_batch, process_json_files
+
+    if args.memprofile:
+        from memprofile import profile_files
+
+        profile_files(args.inputs, None, args.output, args.mapping, args.images, args.memprofile)
+        return
+
+    # Page statistics are only collected when they are reported or budgeted
+    stats = [] if args.budget or args.stats_report else None
+    if stats is not None:
+        from budgets import BudgetExceeded, PageStats, enforce_budgets
+    compiler = None
+    for source in args.inputs:
+        if os.path.isdir(source) and args.threads:
+            process_json_batch(source, args.output, args.mapping, args.images, args.threads, args.seed,
+                               args.fragment_cache, stats)
+            continue
+        if os.path.isdir(source):
+            process_json_files(source, args.output, args.mapping, args.images,
+                               fragment_cache_path=args.fragment_cache, stats=stats, history=_history(args))
+            continue
+        if compiler is None:
+            compiler = JSONCompiler(args.mapping, args.output, args.images)
+        with open(source, 'r') as f:
+            data = json.load(f)
+        page = os.path.splitext(os.path.basename(source))[0]
+        css_content = generate_css_cached(data.get('styles', {}))
+        with open(os.path.join(args.output, f"{page}_styles.css"), 'w') as f:
+            f.write(css_content)
+        page_stats = None
+        if stats is not None:
+            page_stats = PageStats(page)
+            page_stats.css_bytes = len(css_content.encode('utf-8'))
+            stats.append(page_stats)
+        compiler.compile_data(data, page, page_stats)
+
+    if stats is not None:
+        try:
+            enforce_budgets(stats, args.budget, args.stats_report)
+        except BudgetExceeded as e:
+            print(f"Build failed: {e}")
+            sys.exit(1)
+
+def batch(args):
+    from job_queue import process_json_queue
+
+    counts = process_json_queue(args.inputs[0], args.output, args.mapping, args.images, args.workers, args.batch_size,
+                                args.attempts, args.seed, args.retry_failed, args.lease)
+    if counts['failed']:
+        sys.exit(1)
+
+def build(args):
+    # DSL straight to HTML, keeping the JSON intermediate in args.json
+    dsl2json(args, output_folder=args.output)
+
+def bench(args):
+    from page_generator import generate_pages
+
+    generate_pages(args.pages, shard_size=args.shard_size, workers=args.workers, seed=args.seed,
+                   dsl_mapping_path=args.mapping, image_folder=args.images)
+
+def render(args):
+    from subtree_path import render_path
+
+    html = render_path(args.inputs[0], args.path, args.mapping, args.images)
+    if html is None:
+        sys.exit(1)
+    sys.stdout.write(html + '\n')
+
+def regress(args):
+    from regression import check_golden, record_golden
+
+    for source in args.inputs:
+        if args.record:
+            record_golden(source, args.golden, args.mapping, args.images, args.seed, args.workers)
+        elif check_golden(source, args.golden, args.mapping, args.images, args.workers):
+            sys.exit(1)
+
+def variants(args):
+    from json_compiler import Compiler
+    from layout_compiler import compile_layout
+    from new_compiler import JSONCompiler, generate_css_cached
+
+    source = args.inputs[0]
+    page = os.path.splitext(os.path.basename(source))[0]
+    with open(source, 'r') as f:
+        root = Compiler(args.mapping).parse_dsl(f.read())
+    compiler = JSONCompiler(args.mapping, args.output, args.images)
+    with open(os.path.join(args.output, f"{page}_styles.css"), 'w') as f:
+        f.write(generate_css_cached(root.tojson().get('styles', {})))
+    # The page is compiled once; every variant only fills its text and image slots
+    layout = compile_layout(root, compiler)
+    head = compiler.document_head(f"{page}_styles.css")
+    for i in range(args.count):
+        with open(os.path.join(args.output, f"{page}_v{i}.html"), 'w') as f:
+            f.write(head + compiler.document_body(layout.render(seed=f"{args.seed}:{i}"), layout.features))
+    print(f"Rendered {args.count} variants of {source} to {args.output}")
+
+def report(args):
+    from telemetry import report as print_report
+
+    print_report(args.db or _history(args), args.limit, args.threshold, args.window)
+
+def serve(args):
+    import functools
+    import http.server
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=args.directory)
+    with http.server.ThreadingHTTPServer((args.host, args.port), handler) as server:
+        print(f"Serving {args.directory} on http://{args.host}:{args.port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+INPUTS = {'nargs': '+', 'help': "DSL file, folder, bundle/JSONL file or '-' for stdin"}
+JSON_FOLDER = {'default': 'json', 'help': 'JSON output folder'}
+HTML_FOLDER = {'default': 'output', 'help': 'HTML output folder'}
+FORMAT = {'default': 'auto', 'choices': ('auto', 'bundle', 'jsonl')}
+COMPACT = {'action': 'store_true', 'help': "Write compact JSON without empty 'name' and 'nodes' fields"}
+COMPONENT_REFS = {'action': 'store_true', 'help': "Keep 'use' references in the JSON instead of inlining component bodies"}
+MEMPROFILE = {'type': int, 'default': None, 'metavar': 'N',
+              'help': 'Compile one file at a time under tracemalloc and report the memory of each phase for the N heaviest files'}
+
+GLOBAL_OPTIONS = [
+    (('--mapping',), {'default': 'dsl_mapping.json', 'help': 'DSL mapping file'}),
+    (('--images',), {'default': 'images', 'help': 'Image folder'}),
+    (('--history',), {'default': None, 'help': 'Build history database shared by all commands, '
+                                                'defaults to <output>/.build_history.sqlite'}),
+]
+
+# name -> (help, handler, [(flags, add_argument keywords)])
+COMMANDS = {
+    'dsl2json': ('Convert DSL files, folders or bundles to JSON', dsl2json, [
+        (('inputs',), INPUTS),
+        (('-j', '--json'), JSON_FOLDER),
+        (('--format',), FORMAT),
+        (('--component-refs',), COMPONENT_REFS),
+        (('--compact',), COMPACT),
+        (('--memprofile',), MEMPROFILE),
+    ]),
+    'json2html': ('Render JSON files or folders to HTML', json2html, [
+        (('inputs',), {'nargs': '+', 'help': 'JSON file or folder'}),
+        (('-o', '--output'), HTML_FOLDER),
+        (('--fragment-cache',), {'default': None, 'help': 'SQLite fragment cache shared across runs'}),
+        (('--threads',), {'type': int, 'default': None, 'help': 'Compile folders on a thread pool of this size'}),
+        (('--seed',), {'default': None, 'help': 'Seed the placeholder content of threaded builds per page'}),
+        (('--budget',), {'default': None, 'help': 'JSON file of per-page budgets, e.g. {"nodes": {"warn": 500, "fail": 2000}}'}),
+        (('--stats-report',), {'default': None, 'help': 'Write per-page size statistics to this .json or .csv file'}),
+        (('--memprofile',), MEMPROFILE),
+    ]),
+    'batch': ('Compile a JSON folder through a resumable job queue', batch, [
+        (('inputs',), {'nargs': 1, 'help': 'JSON folder'}),
+        (('-o', '--output'), HTML_FOLDER),
+        (('--workers',), {'type': int, 'default': None}),
+        (('--batch-size',), {'type': int, 'default': 64, 'help': 'Pages claimed per worker transaction'}),
+        (('--attempts',), {'type': int, 'default': 3, 'help': 'Attempts per page before it is marked failed'}),
+        (('--seed',), {'default': None, 'help': 'Seed the placeholder content per page'}),
+        (('--retry-failed',), {'action': 'store_true', 'help': 'Give pages that failed in earlier runs new attempts'}),
+        (('--lease',), {'type': float, 'default': 300, 'help': 'Seconds before the pages of an unresponsive worker are claimed again'}),
+    ]),
+    'build': ('Compile DSL straight to HTML', build, [
+        (('inputs',), INPUTS),
+        (('-j', '--json'), JSON_FOLDER),
+        (('-o', '--output'), HTML_FOLDER),
+        (('--format',), FORMAT),
+        (('--component-refs',), COMPONENT_REFS),
+        (('--compact',), COMPACT),
+        (('--memprofile',), MEMPROFILE),
+    ]),
+    'bench': ('Compile synthetic pages and report throughput', bench, [
+        (('--pages',), {'type': int, 'default': 10000}),
+        (('--shard-size',), {'type': int, 'default': 1000}),
+        (('--workers',), {'type': int, 'default': None}),
+        (('--seed',), {'type': int, 'default': 0}),
+    ]),
+    'render': ('Render one subtree of a page, e.g. --path root/container/row[1]', render, [
+        (('inputs',), {'nargs': 1, 'help': 'JSON or DSL page'}),
+        (('--path',), {'required': True, 'help': 'Subtree path, e.g. root/container/row[1]/div-6[0]'}),
+    ]),
+    'regress': ('Record or check per-page output digests of a corpus', regress, [
+        (('inputs',), {'nargs': 1, 'help': 'Folder of JSON/DSL pages or a DSL bundle'}),
+        (('--golden',), {'default': 'regression.json.gz', 'help': 'Golden digest file'}),
+        (('--record',), {'action': 'store_true', 'help': 'Write the golden file instead of checking against it'}),
+        (('--seed',), {'type': int, 'default': 0}),
+        (('--workers',), {'type': int, 'default': None}),
+    ]),
+    'variants': ('Render many placeholder-content variants of one DSL page', variants, [
+        (('inputs',), {'nargs': 1, 'help': 'DSL page'}),
+        (('-o', '--output'), HTML_FOLDER),
+        (('--count',), {'type': int, 'default': 100}),
+        (('--seed',), {'type': int, 'default': 0}),
+    ]),
+    'report': ('Show the slowest and largest pages and compile time regressions', report, [
+        (('-o', '--output'), HTML_FOLDER),
+        (('--db',), {'default': None, 'help': 'Build history database, defaults to --history'}),
+        (('--limit',), {'type': int, 'default': 10}),
+        (('--threshold',), {'type': float, 'default': 1.5, 'help': 'Slowdown factor flagged as a regression'}),
+        (('--window',), {'type': int, 'default': 5, 'help': 'Previous runs in the rolling baseline'}),
+    ]),
+    'serve': ('Serve the generated pages over HTTP', serve, [
+        (('-d', '--directory'), {'default': '.', 'help': 'Folder to serve'}),
+        (('--host',), {'default': '127.0.0.1'}),
+        (('--port',), {'type': int, 'default': 8000}),
+    ]),
+}
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='cli.py', description='DSL -> JSON -> HTML compiler')
+    for flags, options in GLOBAL_OPTIONS:
+        parser.add_argument(*flags, **options)
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, (help_text, func, arguments) in COMMANDS.items():
+        sub = commands.add_parser(name, help=help_text)
+        for flags, options in arguments:
+            sub.add_argument(*flags, **options)
+        sub.set_defaults(func=func)
+    return parser
+
+def _dest(flags):
+    return flags[-1].lstrip('-').replace('-', '_')
+
+def _default(options):
+    # argparse defaults store_true options to False
+    return options.get('default', False if options.get('action') == 'store_true' else None)
+
+def fast_parse(argv):
+    """
+    Parse the plain ``[global options] command [options] inputs`` form without argparse.
+
+    Importing and building the argparse parser costs more than compiling a
+    small page, so the common invocations are handled here from the same
+    option table. Anything unusual (help, unknown or malformed options)
+    returns None and is left to argparse for proper error reporting.
+
+    :param argv: Command-line arguments without the program name
+    :return: argparse-compatible namespace, or None
+    """
+    from types import SimpleNamespace
+
+    values = {_dest(flags): _default(options) for flags, options in GLOBAL_OPTIONS}
+    specs = {flag: (flags, options) for flags, options in GLOBAL_OPTIONS for flag in flags}
+    command = None
+    positional = []
+    args = iter(argv)
+    for arg in args:
+        if arg.startswith('-') and arg != '-':
+            flag, _, value = arg.partition('=')
+            if flag not in specs:
+                return None
+            if specs[flag][1].get('action') == 'store_true':
+                if value:
+                    return None
+                values[_dest(specs[flag][0])] = True
+                continue
+            if not value:
+                value = next(args, None)
+                if value is None:
+                    return None
+            flags, options = specs[flag]
+            try:
+                value = options.get('type', str)(value)
+            except ValueError:
+                return None
+            if 'choices' in options and value not in options['choices']:
+                return None
+            values[_dest(flags)] = value
+        elif command is None:
+            if arg not in COMMANDS:
+                return None
+            command = arg
+            # Like the argparse subparser, only the command's own options
+            # are accepted after it, global options must come first
+            specs = {}
+            for flags, options in COMMANDS[command][2]:
+                if flags[0].startswith('-'):
+                    values[_dest(flags)] = _default(options)
+                    specs.update((flag, (flags, options)) for flag in flags)
+        else:
+            positional.append(arg)
+
+    if command is None:
+        return None
+    takes_inputs = any(flags == ('inputs',) for flags, _ in COMMANDS[command][2])
+    if takes_inputs != bool(positional):
+        return None
+    for flags, options in COMMANDS[command][2]:
+        if flags == ('inputs',) and options['nargs'] == 1 and len(positional) != 1:
+            return None
+        if options.get('required') and values.get(_dest(flags)) is None:
+            return None
+    if takes_inputs:
+        values['inputs'] = positional
+    return SimpleNamespace(command=command, func=COMMANDS[command][1], **values)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = fast_parse(argv) or build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+from cli import build_parser, fast_parse, main
+from mapping_cache import load_compiled_mapping, snapshot_path
+
+@pytest.mark.parametrize('argv', [
+    ['dsl2json', 'dsl', '-j', 'out'],
+    ['--mapping', 'm.json', 'json2html', 'json/0.json', 'json/1.json', '--threads', '4', '--seed=3'],
+    ['build', 'dsl', '--compact', '--component-refs', '--memprofile', '5'],
+    ['batch', 'json', '--workers', '2', '--retry-failed'],
+    ['render', 'json/0.json', '--path', 'root/row[1]'],
+    ['report', '--limit', '3'],
+])
+def test_fast_parse_matches_argparse(argv):
+    fast = vars(fast_parse(argv))
+    full = vars(build_parser().parse_args(argv))
+    assert fast == full
+
+@pytest.mark.parametrize('argv', [
+    ['--help'],
+    ['dsl2json'],
+    ['render', 'json/0.json'],
+    ['batch', 'a', 'b'],
+    ['dsl2json', 'dsl', '--format', 'xml'],
+    ['bench', '--pages', 'many'],
+    ['nosuchcommand'],
+])
+def test_fast_parse_leaves_unusual_invocations_to_argparse(argv):
+    assert fast_parse(argv) is None
+
+@pytest.mark.parametrize('argv', [
+    ['--history', 'h.sqlite', 'dsl2json', 'dsl'],
+    ['dsl2json', 'dsl', '--mapping', 'm.json'],
+    ['json2html', 'json/0.json', '--history', 'h.sqlite'],
+    ['report', '--mapping=m.json'],
+    ['build', 'dsl', '--compact', '--seed', '3'],
+])
+def test_fast_parse_agrees_with_argparse_on_option_placement(argv):
+    fast = fast_parse(argv)
+    try:
+        full = build_parser().parse_args(argv)
+    except SystemExit:
+        assert fast is None
+    else:
+        assert fast is not None and vars(fast) == vars(full)
+
+def test_mapping_snapshot_is_rebuilt_when_the_mapping_changes(mapping_path):
+    mapping, templates = load_compiled_mapping(mapping_path)
+    assert os.path.exists(snapshot_path(mapping_path))
+    assert templates['row'] == tuple(mapping['row'].split('{}', 1))
+
+    mapping['row'] = '<section>{}</section>'
+    with open(mapping_path, 'w') as f:
+        json.dump(mapping, f)
+    assert load_compiled_mapping(mapping_path)[1]['row'] == ('<section>', '</section>')
+
+def test_dsl2json_command(tmp_path, mapping_path):
+    (tmp_path / 'dsl').mkdir()
+    (tmp_path / 'dsl' / 'home.dsl').write_text('container{\n\ttext\n}\n')
+    main(['--mapping', mapping_path, 'dsl2json', str(tmp_path / 'dsl'), '-j', str(tmp_path / 'json')])
+    with open(tmp_path / 'json' / 'home.json') as f:
+        assert json.load(f)['nodes'][0]['element'] == 'container'
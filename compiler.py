@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 
-import json
 import random
 import os
 
+from element_registry import ElementRegistry, NodeRenderer
+from image_index import get_image_index
+from json_compiler import DEFINE_KEYWORD, USE_KEYWORD, ComponentError
+from mapping_cache import load_registry
+
 class Node:
     def __init__(self, name, parent=None, content=""):
         self.name = name
@@ -18,40 +22,57 @@ class Node:
     def set_attribute(self, key, value):
         self.attributes[key] = value
 
-    def render(self, dsl_mapping, image_folder=None):
-        element_mapping = dsl_mapping.get(self.name, "")
-        
-        if not element_mapping:
-            # If no element mapping, use default rendering
-            return f"<{self.name}>{self.content}</{self.name}>"
-
-        result = element_mapping
-        for key, value in self.attributes.items():
-            result = result.replace(f"${key}", value)
+    def render(self, registry, image_folder=None, rng=random, stats=None):
+        if not isinstance(registry, ElementRegistry):
+            registry = ElementRegistry(registry)
+        renderer = PageRenderer(registry, image_folder, rng)
+        renderer.stats = stats
+        return renderer.render(self)
 
-        # Generate random text for text-based nodes
-        if self.name in ['text', 'text-c', 'text-r']:
-            self.content = generate_random_text()
-
-        child_content = "".join(child.render(dsl_mapping, image_folder) for child in self.children)
-        result = result.replace("{}", child_content or self.content)
+class PageRenderer(NodeRenderer):
+    def __init__(self, registry, image_folder=None, rng=random):
+        super().__init__(registry)
+        self.image_folder = image_folder
+        self.rng = rng
 
-        if self.name == 'image':
-            img_src = generate_local_image(image_folder)
-            result = result.replace('<img alt="Dynamic image" class="image">', f'<img src="../{img_src}" alt="Dynamic image" class="image">')
+    def fallback(self, node):
+        # If no element mapping, use default rendering
+        return f"<{node.name}>{node.content}</{node.name}>"
 
-        return result
+    def random_text(self):
+        # Generate random text for text-based nodes
+        return generate_random_text(rng=self.rng)
+
+    def image_attributes(self, img_src):
+        attributes = f'src="../{img_src}"'
+        # Without an image folder there is no index and only the placeholder is linked
+        index = get_image_index(self.image_folder) if self.image_folder else None
+        name = os.path.basename(img_src)
+        size = index.dimensions(name) if index else None
+        if self.stats is not None:
+            self.stats.add_image(index.get(name) if index else None)
+        if size:
+            attributes += f' width="{size[0]}" height="{size[1]}"'
+        return attributes
+
+    def random_image_attributes(self):
+        return self.image_attributes(generate_local_image(self.image_folder, self.rng))
+
+    def carousel_image_attributes(self):
+        if not self.image_folder:
+            return [self.image_attributes("placeholder.jpg")]
+        image_files = get_image_index(self.image_folder).names() or ["placeholder.jpg"]
+        return [self.image_attributes(os.path.join(self.image_folder, f)) for f in image_files[:3]]
 
 class Compiler:
     def __init__(self, dsl_mapping_file_path, image_folder):
-        with open(dsl_mapping_file_path) as data_file:
-            self.dsl_mapping = json.load(data_file)
+        self.dsl_mapping, self.registry = load_registry(dsl_mapping_file_path)
         self.image_folder = image_folder
 
     def compile(self, input_dsl, output_html_path, output_css_path):
         try:
             root = self.parse_dsl(input_dsl)
-            html_content = root.render(self.dsl_mapping, self.image_folder)
+            html_content = root.render(self.registry, self.image_folder)
             
             full_html = f"""
 <!DOCTYPE html>
@@ -76,6 +97,11 @@ class Compiler:
             print(f"Error compiling {output_html_path}: {str(e)}")
 
     def parse_dsl(self, input_dsl):
+        """
+        :param input_dsl: DSL text without components
+        :return: Root Node
+        :raises ComponentError: For ``define``/``use`` lines, which only json_compiler supports
+        """
         lines = input_dsl.split('\n')
         root = Node("root")
         stack = [root]
@@ -91,6 +117,9 @@ class Compiler:
                 while indent < len(stack) - 1:
                     stack.pop()
 
+                if (line.endswith('{') and line.startswith(DEFINE_KEYWORD)) or line.startswith(USE_KEYWORD):
+                    raise ComponentError(f"Line {line_number}: components are not supported here, "
+                                         f"compile the DSL with json_compiler: {line}")
                 if line.endswith('{'):
                     name = line[:-1].strip()
                     node = Node(name, stack[-1])
@@ -103,13 +132,15 @@ class Compiler:
                     node = Node(line, stack[-1])
                     stack[-1].add_child(node)
 
+            except ComponentError:
+                raise
             except Exception as e:
                 print(f"Error parsing line {line_number}: {line}")
                 print(f"Error details: {str(e)}")
 
         return root
 
-def generate_random_text(min_words=5, max_words=15):
+def generate_random_text(min_words=5, max_words=15, rng=random):
     lorem_ipsum = [
         "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
         "Sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.",
@@ -117,20 +148,16 @@ def generate_random_text(min_words=5, max_words=15):
         "Duis aute irure dolor in reprehenderit in voluptate velit esse cillum.",
         "Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia.",
     ]
-    num_words = random.randint(min_words, max_words)
-    words = " ".join(random.choice(lorem_ipsum).split()[:num_words])
+    num_words = rng.randint(min_words, max_words)
+    words = " ".join(rng.choice(lorem_ipsum).split()[:num_words])
     return words
 
-def generate_local_image(image_folder):
-    try:
-        image_files = [f for f in os.listdir(image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-        if not image_files:
-            return "placeholder.jpg"
-        image_filename = random.choice(image_files)
-        return os.path.join(image_folder, image_filename)
-    except Exception as e:
-        print(f"Error generating image: {e}")
+def generate_local_image(image_folder, rng=random):
+    image_files = get_image_index(image_folder).names() if image_folder else None
+    if not image_files:
         return "placeholder.jpg"
+    image_filename = rng.choice(image_files)
+    return os.path.join(image_folder, image_filename)
 
 def generate_css(custom_vars=None):
     # Default CSS variables
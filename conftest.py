@@ -0,0 +1,19 @@
+import os
+import shutil
+
+import pytest
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def mapping_path(tmp_path):
+    # A copy, so a test can edit the mapping without touching the repository's
+    path = tmp_path / 'dsl_mapping.json'
+    shutil.copy(os.path.join(REPO, 'dsl_mapping.json'), path)
+    return str(path)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Relative defaults such as 'images' and 'output' resolve inside the test's folder
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
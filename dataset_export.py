@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import os
+
+import numpy as np
+
+from dependency_index import NON_ELEMENT_KEYS
+from json_compiler import ComponentError, Compiler, iter_dsl_documents
+
+SPECIAL_TOKENS = ['<pad>', '<unk>', '<start>', '<end>', '{', '}']
+
+def build_vocabulary(dsl_mapping):
+    """
+    Build the token vocabulary from the DSL mapping
+
+    :param dsl_mapping: Parsed dsl_mapping.json
+    :return: Dictionary of token -> integer id
+    """
+    elements = sorted(key for key in dsl_mapping if key not in NON_ELEMENT_KEYS)
+    return {token: i for i, token in enumerate(SPECIAL_TOKENS + elements)}
+
+def iter_tokens(node):
+    """
+    Yield the structure tokens of a parsed DSL tree, mirroring the DSL text
+
+    ``use`` nodes are replaced by the component's body, so a page yields the
+    same tokens as the DSL with its components written out.
+
+    :param node: Node returned by Compiler.parse_dsl
+    :return: Generator of token strings
+    """
+    for child in node.children:
+        if child.component is not None:
+            # A use node stands for the component's body, as in the JSON and HTML
+            yield from iter_tokens(child)
+            continue
+        yield child.name
+        if child.children:
+            yield '{'
+            yield from iter_tokens(child)
+            yield '}'
+
+def encode_tree(root, vocab):
+    """
+    Encode a parsed DSL tree as a sequence of token ids
+
+    :param root: Node returned by Compiler.parse_dsl
+    :param vocab: Vocabulary from build_vocabulary
+    :return: List of integer token ids, wrapped in <start>/<end>
+    """
+    unk = vocab['<unk>']
+    ids = [vocab['<start>']]
+    ids.extend(vocab.get(token, unk) for token in iter_tokens(root))
+    ids.append(vocab['<end>'])
+    return ids
+
+def iter_sources(source):
+    """
+    :param source: Folder of .dsl files, or a multi-document bundle/JSONL file
+    :return: Generator of (page, dsl) pairs
+    """
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.endswith('.dsl'):
+                with open(os.path.join(source, filename), 'r') as dsl_file:
+                    yield filename[:-4], dsl_file.read()
+    else:
+        with open(source, 'r', buffering=1 << 16) as stream:
+            yield from iter_dsl_documents(stream)
+
+def export_dataset(source, export_folder, dsl_mapping_path='dsl_mapping.json', output_folder='output', shard_size=10000,
+                   json_folder=None, image_folder='images'):
+    """
+    Export tokenized DSL pages as sharded, memory-mappable NumPy arrays.
+
+    Every shard is written as ``tokens-NNNNN.npy`` (all sequences of the shard
+    concatenated) and ``offsets-NNNNN.npy`` (start offset of each sequence plus
+    a final end offset). ``vocab.json`` holds the vocabulary and
+    ``metadata.csv`` links every sequence to its shard, position and HTML output.
+
+    With a json_folder the pages are compiled as well: the tokens, the JSON
+    intermediate and the HTML come from one traversal of each parsed tree.
+
+    :param source: Folder of .dsl files, or a multi-document bundle/JSONL file
+    :param export_folder: Folder to write the dataset to
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param output_folder: Folder the HTML pages are generated into
+    :param shard_size: Number of sequences per shard
+    :param json_folder: Optional folder to write the JSON of every page to, together
+        with its HTML and CSS in output_folder
+    :param image_folder: Folder containing images for the HTML output
+    :return: Number of exported sequences
+    """
+    os.makedirs(export_folder, exist_ok=True)
+    with open(dsl_mapping_path, 'r') as f:
+        vocab = build_vocabulary(json.load(f))
+    dtype = np.uint16 if len(vocab) <= np.iinfo(np.uint16).max else np.int32
+    compiler = Compiler(dsl_mapping_path)
+    html_compiler = None
+    if json_folder:
+        from backends import HTMLBackend, JSONBackend, TokenBackend, traverse
+        from new_compiler import JSONCompiler, generate_css_cached
+        os.makedirs(json_folder, exist_ok=True)
+        html_compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder)
+
+    def flush(shard, sequences):
+        lengths = [len(seq) for seq in sequences]
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        tokens = np.fromiter((t for seq in sequences for t in seq), dtype=dtype, count=int(offsets[-1]))
+        np.save(os.path.join(export_folder, f"tokens-{shard:05d}.npy"), tokens)
+        np.save(os.path.join(export_folder, f"offsets-{shard:05d}.npy"), offsets)
+
+    shard = 0
+    sequences = []
+    count = 0
+    with open(os.path.join(export_folder, 'metadata.csv'), 'w', newline='') as meta_file:
+        writer = csv.writer(meta_file)
+        writer.writerow(['id', 'shard', 'index', 'length', 'html'])
+        for page, input_dsl in iter_sources(source):
+            try:
+                root = compiler.parse_dsl(input_dsl)
+            except ComponentError as e:
+                print(f"Error parsing {page}: {e}")
+                continue
+            if html_compiler:
+                ids, json_data, html_content = traverse(root, [TokenBackend(vocab), JSONBackend(), HTMLBackend(html_compiler)])
+                with open(os.path.join(json_folder, f"{page}.json"), 'w') as json_file:
+                    json.dump(json_data, json_file, indent=2)
+                with open(os.path.join(output_folder, f"{page}_styles.css"), 'w') as css_file:
+                    css_file.write(generate_css_cached(json_data.get('styles', {})))
+                html_compiler.write_page(page, html_compiler.document_head(f"{page}_styles.css")
+                                         + html_compiler.document_body(html_content))
+            else:
+                ids = encode_tree(root, vocab)
+            writer.writerow([page, shard, len(sequences), len(ids), os.path.join(output_folder, f"{page}.html")])
+            sequences.append(ids)
+            count += 1
+            if len(sequences) == shard_size:
+                flush(shard, sequences)
+                shard += 1
+                sequences = []
+        if sequences:
+            flush(shard, sequences)
+
+    with open(os.path.join(export_folder, 'vocab.json'), 'w') as f:
+        json.dump(vocab, f, indent=2)
+
+    print(f"Exported {count} sequences to {export_folder}")
+    return count
+
+def load_shard(export_folder, shard):
+    """
+    Memory-map one shard of an exported dataset
+
+    :param export_folder: Folder written by export_dataset
+    :param shard: Shard number
+    :return: (tokens, offsets) arrays; sequence i is tokens[offsets[i]:offsets[i + 1]]
+    """
+    tokens = np.load(os.path.join(export_folder, f"tokens-{shard:05d}.npy"), mmap_mode='r')
+    offsets = np.load(os.path.join(export_folder, f"offsets-{shard:05d}.npy"), mmap_mode='r')
+    return tokens, offsets
+
+if __name__ == "__main__":
+    export_dataset('dsl', 'dataset')
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from backends import TokenBackend, traverse
+from dataset_export import build_vocabulary, encode_tree, export_dataset, iter_tokens, load_shard
+from json_compiler import Compiler
+
+BUNDLE = """--- a
+container{
+	text
+	button
+}
+--- b
+row
+--- c
+unknown-element
+"""
+
+def test_encode_tree_mirrors_the_dsl(mapping_path):
+    with open(mapping_path) as f:
+        vocab = build_vocabulary(json.load(f))
+    root = Compiler(mapping_path).parse_dsl("container{\n\ttext\n}\n")
+    ids = encode_tree(root, vocab)
+    assert ids == [vocab[t] for t in ('<start>', 'container', '{', 'text', '}', '<end>')]
+
+def test_export_dataset_shards_and_offsets(tmp_path, mapping_path):
+    bundle = tmp_path / 'pages.dsl'
+    bundle.write_text(BUNDLE)
+    export = tmp_path / 'dataset'
+    assert export_dataset(str(bundle), str(export), mapping_path, shard_size=2) == 3
+
+    with open(export / 'vocab.json') as f:
+        vocab = json.load(f)
+    tokens, offsets = load_shard(str(export), 0)
+    assert list(offsets) == [0, 7, 10]
+    assert list(tokens[offsets[1]:offsets[2]]) == [vocab['<start>'], vocab['row'], vocab['<end>']]
+
+    tokens, offsets = load_shard(str(export), 1)
+    assert list(tokens) == [vocab['<start>'], vocab['<unk>'], vocab['<end>']]
+
+    with open(export / 'metadata.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['id'], row['shard'], row['index']) for row in rows] == [('a', '0', '0'), ('b', '0', '1'), ('c', '1', '0')]
+
+def test_export_dataset_with_html_gives_the_same_tokens(tmp_path, mapping_path):
+    bundle = tmp_path / 'pages.dsl'
+    bundle.write_text(BUNDLE)
+    export_dataset(str(bundle), str(tmp_path / 'plain'), mapping_path)
+    export_dataset(str(bundle), str(tmp_path / 'full'), mapping_path, str(tmp_path / 'output'),
+                   json_folder=str(tmp_path / 'json'), image_folder=str(tmp_path / 'images'))
+    assert list(load_shard(str(tmp_path / 'plain'), 0)[0]) == list(load_shard(str(tmp_path / 'full'), 0)[0])
+    assert (tmp_path / 'json' / 'a.json').exists()
+    assert (tmp_path / 'output' / 'a.html').exists()
+
+COMPONENTS = """define hdr {
+\tnavlink
+\trow{
+\t\tbutton
+\t}
+}
+header{
+\tuse hdr
+}
+"""
+
+def test_use_nodes_are_tokenized_as_the_component_body(mapping_path):
+    with open(mapping_path) as f:
+        vocab = build_vocabulary(json.load(f))
+    root = Compiler(mapping_path).parse_dsl(COMPONENTS)
+    written_out = Compiler(mapping_path).parse_dsl("header{\n\tnavlink\n\trow{\n\t\tbutton\n\t}\n}\n")
+    assert list(iter_tokens(root)) == list(iter_tokens(written_out))
+    ids = encode_tree(root, vocab)
+    assert vocab['<unk>'] not in ids
+    assert traverse(root, [TokenBackend(vocab)])[0] == ids
+
+def test_export_dataset_skips_pages_with_component_errors(tmp_path, mapping_path, capsys):
+    bundle = tmp_path / 'pages.dsl'
+    bundle.write_text("--- a\nrow{\n\tuse nope\n}\n--- b\n" + COMPONENTS)
+    export = tmp_path / 'dataset'
+    assert export_dataset(str(bundle), str(export), mapping_path) == 1
+    assert 'Error parsing a' in capsys.readouterr().out
+    with open(export / 'metadata.csv', newline='') as f:
+        assert [row['id'] for row in csv.DictReader(f)] == ['b']
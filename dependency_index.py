@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+INDEX_FILENAME = '.element_index.json'
+
+# Keys in dsl_mapping.json that configure the parser rather than an element
+NON_ELEMENT_KEYS = ('opening-tag', 'closing-tag')
+
+
+def collect_elements(node, elements=None):
+    """
+    Collect the set of element names used in a JSON page tree
+
+    :param node: Root JSON node of the page
+    :param elements: Optional set to add the element names to
+    :return: Set of element names
+    """
+    if elements is None:
+        elements = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        elements.add(current.get('element', ''))
+        stack.extend(current.get('nodes', []))
+        # Component definitions kept as references on the root (see Node.tojson)
+        for nodes in current.get('components', {}).values():
+            stack.extend(nodes)
+    return elements
+
+
+def changed_elements(old_mapping, new_mapping):
+    """
+    Diff two DSL mappings key by key
+
+    :param old_mapping: Mapping the current outputs were built with
+    :param new_mapping: Mapping to build with next
+    :return: Set of element names whose template was added, removed or changed
+    """
+    changed = set()
+    for key in set(old_mapping) | set(new_mapping):
+        if key in NON_ELEMENT_KEYS:
+            continue
+        if old_mapping.get(key) != new_mapping.get(key):
+            changed.add(key)
+    return changed
+
+
+class ElementIndex:
+    """
+    Inverted index from element names to the pages that contain them
+
+    The index is stored next to the generated pages together with a snapshot
+    of the DSL mapping they were built with, so a later run can work out which
+    pages are affected by a mapping change.
+    """
+
+    def __init__(self, mapping=None):
+        self.mapping = mapping or {}
+        self.pages = {}
+        self.element_pages = {}
+
+    def add_page(self, page, elements):
+        """
+        Record the elements used by a page, replacing any previous entry
+
+        :param page: Page name (the JSON filename without extension)
+        :param elements: Iterable of element names used by the page
+        """
+        self.remove_page(page)
+        elements = set(elements)
+        self.pages[page] = elements
+        for element in elements:
+            self.element_pages.setdefault(element, set()).add(page)
+
+    def remove_page(self, page):
+        for element in self.pages.pop(page, ()):
+            pages = self.element_pages.get(element)
+            if pages is not None:
+                pages.discard(page)
+                if not pages:
+                    del self.element_pages[element]
+
+    def pages_using(self, element):
+        """
+        :param element: Element name, e.g. ``carousel``
+        :return: Set of page names that contain the element
+        """
+        return set(self.element_pages.get(element, ()))
+
+    def affected_pages(self, new_mapping):
+        """
+        :param new_mapping: DSL mapping to build with next
+        :return: Set of page names that reference an element whose template changed
+        """
+        affected = set()
+        for element in changed_elements(self.mapping, new_mapping):
+            affected |= self.element_pages.get(element, set())
+        return affected
+
+    def save(self, output_folder):
+        path = os.path.join(output_folder, INDEX_FILENAME)
+        data = {
+            'mapping': self.mapping,
+            'pages': {page: sorted(elements) for page, elements in sorted(self.pages.items())}
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, output_folder):
+        """
+        Load the index stored in an output folder
+
+        :param output_folder: Folder the pages were generated into
+        :return: The stored index, or an empty one if none exists yet
+        """
+        path = os.path.join(output_folder, INDEX_FILENAME)
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        index = cls(data.get('mapping', {}))
+        for page, elements in data.get('pages', {}).items():
+            index.add_page(page, elements)
+        return index
@@ -0,0 +1,59 @@
+import json
+import os
+
+from dependency_index import INDEX_FILENAME, ElementIndex, changed_elements, collect_elements
+from new_compiler import process_json_files, rebuild_changed_pages
+
+def node(element, *nodes):
+    return {'name': '', 'element': element, 'nodes': list(nodes)}
+
+def write_pages(folder, pages):
+    os.makedirs(folder, exist_ok=True)
+    for page, data in pages.items():
+        with open(os.path.join(folder, f"{page}.json"), 'w') as f:
+            json.dump(data, f)
+
+def test_collect_elements_includes_component_definitions():
+    page = node('root', node('row', node('text')))
+    page['components'] = {'card': [node('button')]}
+    assert collect_elements(page) == {'root', 'row', 'text', 'button'}
+
+def test_changed_elements_ignores_parser_keys():
+    old = {'opening-tag': '{', 'text': '<p>{}</p>', 'row': '<div>{}</div>'}
+    new = {'opening-tag': '[', 'text': '<p class="t">{}</p>', 'row': '<div>{}</div>', 'card': '<div>{}</div>'}
+    assert changed_elements(old, new) == {'text', 'card'}
+
+def test_index_round_trip_and_affected_pages(tmp_path):
+    index = ElementIndex({'text': 'a', 'row': 'b'})
+    index.add_page('p1', {'root', 'text'})
+    index.add_page('p2', {'root', 'row'})
+    index.save(tmp_path)
+
+    loaded = ElementIndex.load(tmp_path)
+    assert loaded.pages_using('root') == {'p1', 'p2'}
+    assert loaded.affected_pages({'text': 'changed', 'row': 'b'}) == {'p1'}
+
+    loaded.remove_page('p1')
+    assert loaded.pages_using('text') == set()
+
+def test_rebuild_changed_pages_rebuilds_only_affected(workdir, mapping_path):
+    write_pages('json', {
+        'with_image': node('root', node('image')),
+        'with_text': node('root', node('text')),
+    })
+    process_json_files('json', 'output', mapping_path, 'images')
+    assert os.path.exists(os.path.join('output', INDEX_FILENAME))
+
+    with open(mapping_path) as f:
+        mapping = json.load(f)
+    mapping['text'] = '<p class="text changed">{}</p>'
+    with open(mapping_path, 'w') as f:
+        json.dump(mapping, f)
+
+    # The default image folder is used for the pages with images
+    assert rebuild_changed_pages('json', 'output', mapping_path) == {'with_text'}
+    with open(os.path.join('output', 'with_text.html')) as f:
+        assert 'text changed' in f.read()
+
+    # Nothing changed since the last rebuild
+    assert rebuild_changed_pages('json', 'output', mapping_path) == set()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+import json
+import marshal
+import sys
+
+from dependency_index import NON_ELEMENT_KEYS
+
+CAROUSEL_HTML = """
+            <div class="carousel-container">
+                <div id="carouselExample" class="carousel slide" data-bs-ride="carousel">
+                    <div class="carousel-inner">
+                        {slides}
+                    </div>
+                    <button class="carousel-control-prev" type="button" data-bs-target="#carouselExample" data-bs-slide="prev">
+                        <span class="carousel-control-prev-icon" aria-hidden="true"></span>
+                        <span class="visually-hidden">Previous</span>
+                    </button>
+                    <button class="carousel-control-next" type="button" data-bs-target="#carouselExample" data-bs-slide="next">
+                        <span class="carousel-control-next-icon" aria-hidden="true"></span>
+                        <span class="visually-hidden">Next</span>
+                    </button>
+                </div>
+            </div>
+            """
+
+CAROUSEL_SLIDE_HTML = """
+                <div class="carousel-item {active_class}">
+                    <img {attributes} class="d-block w-100" alt="Carousel Image {number}">
+                </div>
+                """
+
+# Handler factories registered for all registries: element -> factory(element, template)
+SPECIAL_HANDLERS = {}
+
+def register_handler(*elements):
+    """
+    Decorator registering a handler factory for one or more elements.
+
+    A factory is called once per registry with the element name and its
+    template from dsl_mapping.json (empty if unmapped). It returns the
+    handler, a callable ``handler(renderer, node) -> str``. A handler whose
+    output can differ between renders of the same JSON node sets a
+    ``volatile`` attribute: a callable taking the JSON node and returning
+    True when that is the case. A handler whose output needs page assets
+    (scripts, stylesheets) names them in a ``features`` attribute; renderers
+    collect the features of every page they render.
+
+    :param elements: Element names handled by the factory
+    """
+    def decorator(factory):
+        for element in elements:
+            SPECIAL_HANDLERS[element] = factory
+        return factory
+    return decorator
+
+def split_template(template):
+    """
+    :param template: Mapping template with an optional "{}" slot
+    :return: (prefix, suffix) around the slot, or None if the template has no slot
+    """
+    if '{}' not in template:
+        return None
+    prefix, suffix = template.split('{}', 1)
+    return prefix, suffix
+
+def template_handler(element, template, parts=False):
+    """
+    Compile a plain mapping template into a handler that fills its slot with the children
+
+    :param parts: Result of split_template(template) if already known
+    """
+    if parts is False:
+        parts = split_template(template)
+    if parts is None:
+        return lambda renderer, node: template
+    prefix, suffix = parts
+    return lambda renderer, node: prefix + renderer.render_children(node) + suffix
+
+def _missing_text(node):
+    return node.get('text') is None
+
+@register_handler('text', 'text-c', 'text-r')
+def text_handler(element, template):
+    parts = split_template(template)
+    if parts is None:
+        return lambda renderer, node: template
+    prefix, suffix = parts
+    def handle(renderer, node):
+        return prefix + renderer.node_text(node) + suffix
+    # Placeholder text is generated when the node carries none
+    handle.volatile = _missing_text
+    return handle
+
+@register_handler('image')
+def image_handler(element, template):
+    def handle(renderer, node):
+        attributes = renderer.random_image_attributes()
+        if not attributes:
+            return template
+        return template.replace('<img ', f'<img {attributes} ', 1)
+    handle.volatile = lambda node: True
+    return handle
+
+@register_handler('navlink')
+def navlink_handler(element, template):
+    empty_tag = f'<a href="#" class="{element}"></a>'
+    def handle(renderer, node):
+        return template.replace(
+            empty_tag,
+            f"<a class='{element}' href='{renderer.node_href(node)}'>{renderer.node_text(node, 'Link')}</a>"
+        )
+    return handle
+
+@register_handler('button', 'button-c', 'button-r')
+def button_handler(element, template):
+    empty_tag = f'<button class="{element}"></button>'
+    def handle(renderer, node):
+        return template.replace(
+            empty_tag,
+            f"<button class='{element}'>{renderer.node_text(node, 'click here')}</button>"
+        )
+    return handle
+
+@register_handler('carousel')
+def carousel_handler(element, template):
+    def handle(renderer, node):
+        slides = ""
+        for i, attributes in enumerate(renderer.carousel_image_attributes()):
+            active_class = "active" if i == 0 else ""
+            slides += CAROUSEL_SLIDE_HTML.format(active_class=active_class, attributes=attributes, number=i + 1)
+        return CAROUSEL_HTML.format(slides=slides)
+    handle.features = ('carousel',)
+    return handle
+
+@register_handler('use')
+def use_handler(element, template):
+    def handle(renderer, node):
+        return renderer.render_component(node)
+    # A reference without its body depends on the page's definitions, not on the node
+    handle.volatile = lambda node: not node.get('nodes')
+    return handle
+
+def compile_templates(dsl_mapping):
+    """
+    :param dsl_mapping: Parsed dsl_mapping.json
+    :return: Dictionary of element -> split_template() result for every mapped element
+    """
+    return {element: split_template(template)
+            for element, template in dsl_mapping.items() if element not in NON_ELEMENT_KEYS}
+
+class ElementRegistry:
+    """
+    Table of element name -> handler shared by all compilers
+
+    Built once from the DSL mapping: every mapped element gets a compiled
+    template handler, then the registered special handlers replace the
+    elements they cover. Rendering a node is a single dictionary lookup.
+
+    Handlers are called as ``handler(renderer, node)``. The renderer is the
+    compiler-specific object that knows how to walk its node type and supplies
+    ``render_children(node)``, ``node_text(node, default=None)``,
+    ``node_href(node)``, ``random_image_attributes()``,
+    ``carousel_image_attributes()`` and ``render_component(node)``.
+    """
+
+    def __init__(self, dsl_mapping, handlers=None, templates=None):
+        """
+        :param dsl_mapping: Parsed dsl_mapping.json
+        :param handlers: Optional extra element -> factory entries for this registry only
+        :param templates: Optional precompiled element -> split_template() results
+        """
+        self.dsl_mapping = dsl_mapping
+        self.handlers = {}
+        self.factories = {}
+        self.volatile = {}
+        self.features = {}
+        if templates is None:
+            templates = compile_templates(dsl_mapping)
+        for element, parts in templates.items():
+            self._install(element, template_handler, template_handler(element, dsl_mapping[element], parts))
+        for element, factory in {**SPECIAL_HANDLERS, **(handlers or {})}.items():
+            self.register(element, factory)
+
+    def register(self, element, factory):
+        """
+        Install a handler factory for an element in this registry
+
+        :param element: Element name
+        :param factory: Callable factory(element, template) -> handler
+        """
+        self._install(element, factory, factory(element, self.dsl_mapping.get(element, '')))
+
+    def _install(self, element, factory, handler):
+        self.handlers[element] = handler
+        self.factories[element] = factory
+        self.volatile.pop(element, None)
+        if getattr(handler, 'volatile', None) is not None:
+            self.volatile[element] = handler.volatile
+        self.features.pop(element, None)
+        if getattr(handler, 'features', None):
+            self.features[element] = frozenset(handler.features)
+        self._version = None
+
+    def get(self, element):
+        """
+        :param element: Element name
+        :return: Handler for the element, or None if it is unknown
+        """
+        return self.handlers.get(element)
+
+    def is_volatile(self, element, node):
+        """
+        :param element: Element name
+        :param node: JSON node
+        :return: True if rendering the node can give a different result each time
+        """
+        volatile = self.volatile.get(element)
+        return volatile is not None and volatile(node)
+
+    @property
+    def version(self):
+        """
+        Fingerprint of the mapping and the code of every installed handler factory
+        """
+        if self._version is None:
+            import hashlib
+            digest = hashlib.sha1(sys.version.encode('utf-8'))
+            digest.update(json.dumps(self.dsl_mapping, sort_keys=True).encode('utf-8'))
+            for element, factory in sorted(self.factories.items()):
+                code = getattr(factory, '__code__', None)
+                digest.update(element.encode('utf-8'))
+                digest.update(marshal.dumps(code) if code is not None else repr(factory).encode('utf-8'))
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+class NodeRenderer:
+    """
+    Renderer for trees of compiler Node objects (name, children, attributes)
+
+    Subclasses provide the placeholder content for their compiler.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        # Features (see register_handler) used by the rendered nodes
+        self.features = set()
+        # Optional budgets.PageStats filled in while rendering
+        self.stats = None
+        self._depth = 0
+        # Rendered body of every component used so far, by definition node
+        self.component_html = {}
+
+    def render(self, node):
+        stats = self.stats
+        if stats is not None:
+            self._depth += 1
+            stats.add_node(node.name, self._depth)
+        handler = self.registry.get(node.name)
+        if handler is None:
+            result = self.fallback(node)
+        else:
+            features = self.registry.features.get(node.name)
+            if features:
+                self.features.update(features)
+            result = handler(self, node)
+            for key, value in node.attributes.items():
+                result = result.replace(f"${key}", value)
+        if stats is not None:
+            self._depth -= 1
+        return result
+
+    def fallback(self, node):
+        return f"<{node.name}></{node.name}>"
+
+    def render_children(self, node):
+        return "".join(self.render(child) for child in node.children) or getattr(node, 'content', '')
+
+    def render_component(self, node):
+        # All uses of a component share its children, so the body is rendered once
+        html = self.component_html.get(node.component)
+        if html is None:
+            html = self.component_html[node.component] = self.render_children(node)
+        elif self.stats is not None:
+            stack = [(child, self._depth + 1) for child in node.children]
+            while stack:
+                current, depth = stack.pop()
+                self.stats.add_node(current.name, depth)
+                stack.extend((child, depth + 1) for child in current.children)
+        return html
+
+    def node_text(self, node, default=None):
+        return default if default is not None else self.random_text()
+
+    def node_href(self, node):
+        return '#'
+
+    def random_text(self):
+        return ''
+
+    def random_image_attributes(self):
+        return ''
+
+    def carousel_image_attributes(self):
+        return []
+
+class PrerenderedChildren:
+    """
+    Renderer proxy that hands already rendered children to a handler
+
+    Lets a caller that rendered the children itself (from a cache or in a
+    post-order walk) run the parent's handler on the same renderer.
+    """
+
+    def __init__(self, renderer, html):
+        self._renderer = renderer
+        self._html = html
+
+    def render_children(self, node):
+        return self._html
+
+    def render_component(self, node):
+        return self._html
+
+    def __getattr__(self, name):
+        return getattr(self._renderer, name)
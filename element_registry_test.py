@@ -0,0 +1,52 @@
+import random
+
+from compiler import Node, PageRenderer
+from element_registry import ElementRegistry, PrerenderedChildren, split_template
+from mapping_cache import load_mapping, load_registry
+
+def tree(name, *children):
+    node = Node(name)
+    for child in children:
+        child.parent = node
+        node.add_child(child)
+    return node
+
+def test_split_template():
+    assert split_template('<div>{}</div>') == ('<div>', '</div>')
+    assert split_template('<hr>') is None
+
+def test_registry_uses_special_handlers_and_templates(mapping_path):
+    mapping, registry = load_registry(mapping_path)
+    renderer = PageRenderer(registry)
+    html = renderer.render(tree('row', tree('button')))
+    assert html.startswith(split_template(mapping['row'])[0])
+    assert "<button class='button'>click here</button>" in html
+    assert registry.get('no-such-element') is None
+
+def test_volatile_and_features(mapping_path):
+    registry = ElementRegistry(load_mapping(mapping_path))
+    assert registry.is_volatile('text', {'element': 'text'})
+    assert not registry.is_volatile('text', {'element': 'text', 'text': 'fixed'})
+    assert registry.is_volatile('image', {'element': 'image'})
+    assert not registry.is_volatile('row', {'element': 'row'})
+    assert registry.features['carousel'] == {'carousel'}
+
+def test_registry_version_follows_handlers(mapping_path):
+    mapping = load_mapping(mapping_path)
+    registry = ElementRegistry(mapping)
+    assert registry.version == ElementRegistry(mapping).version
+    registry.register('row', lambda element, template: lambda renderer, node: '<hr>')
+    assert registry.version != ElementRegistry(mapping).version
+    assert PageRenderer(registry).render(tree('row', tree('text'))) == '<hr>'
+
+def test_page_renderer_without_image_folder(mapping_path):
+    renderer = PageRenderer(ElementRegistry(load_mapping(mapping_path)), None, random.Random(0))
+    html = renderer.render(tree('container', tree('image'), tree('carousel')))
+    assert html.count('placeholder.jpg') == 2
+    assert renderer.features == {'carousel'}
+
+def test_prerendered_children(mapping_path):
+    mapping, registry = load_registry(mapping_path)
+    renderer = PageRenderer(registry)
+    html = registry.get('row')(PrerenderedChildren(renderer, '<b>cached</b>'), tree('row'))
+    assert html == split_template(mapping['row'])[0] + '<b>cached</b>' + split_template(mapping['row'])[1]
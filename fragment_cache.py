@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def subtree_digests(root, registry, version):
+    """
+    Work out which subtrees of a JSON page can be served from the fragment cache.
+
+    A subtree is deterministic when none of its nodes has a volatile handler
+    (one that draws random content, such as ``image``). Only maximal
+    deterministic subtrees that contain children get a key, so nested
+    fragments are not stored twice.
+
+    :param root: Root JSON node of the page
+    :param registry: ElementRegistry used to render the page
+    :param version: Mapping/handler version string mixed into every key
+    :return: Dictionary of id(node) -> cache key
+    """
+    keys = {}
+
+    def visit(node):
+        digest = hashlib.sha1()
+        for field, value in sorted(node.items()):
+            if field != 'nodes':
+                digest.update(json.dumps([field, value], sort_keys=True).encode('utf-8'))
+        deterministic = not registry.is_volatile(node.get('element', ''), node)
+        children = [visit(child) for child in node.get('nodes', ())]
+        for child_digest, _ in children:
+            digest.update(child_digest)
+        deterministic = deterministic and all(child_deterministic for _, child_deterministic in children)
+
+        if not deterministic:
+            for child, (child_digest, child_deterministic) in zip(node.get('nodes', ()), children):
+                if child_deterministic and child.get('nodes'):
+                    keys[id(child)] = version + child_digest.hex()
+        return digest.digest(), deterministic
+
+    root_digest, root_deterministic = visit(root)
+    if root_deterministic and root.get('nodes'):
+        keys[id(root)] = version + root_digest.hex()
+    return keys
+
+class FragmentCache:
+    """
+    SQLite-backed store of rendered HTML fragments shared across runs
+
+    The database runs in WAL mode with a busy timeout so several build
+    processes can read and write it at once. New fragments and last-use
+    times are buffered and written in one transaction on flush(), after
+    which the least recently used fragments are evicted down to max_bytes.
+
+    A cache can be shared by the threads of one process: each thread reads
+    through its own connection and the buffers are guarded by a lock.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param path: Path of the SQLite database file
+        :param max_bytes: Size cap for the stored HTML
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._touched = {}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._connections = []
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self.conn
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS fragments ('
+            'key TEXT PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS fragments_last_used ON fragments (last_used)')
+
+    @property
+    def conn(self):
+        """
+        SQLite connection of the calling thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # close() may run on another thread than the one that opened the connection
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key):
+        """
+        :param key: Fragment key
+        :return: Cached HTML, or None on a miss
+        """
+        with self._lock:
+            html = self._pending.get(key)
+        if html is None:
+            row = self.conn.execute('SELECT html FROM fragments WHERE key = ?', (key,)).fetchone()
+            html = row[0] if row else None
+        with self._lock:
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._touched[key] = time.time()
+        return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._pending[key] = html
+            full = len(self._pending) >= 1000
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered fragments and access times, then enforce the size cap
+        """
+        now = time.time()
+        conn = self.conn
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO fragments (key, html, size, last_used) VALUES (?, ?, ?, ?)',
+                    [(key, html, len(html.encode('utf-8')), now) for key, html in self._pending.items()]
+                )
+                conn.executemany(
+                    'UPDATE fragments SET last_used = ? WHERE key = ?',
+                    [(used, key) for key, used in self._touched.items()]
+                )
+                self._evict(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            self._pending = {}
+            self._touched = {}
+
+    def _evict(self, conn):
+        (total,) = conn.execute('SELECT COALESCE(SUM(size), 0) FROM fragments').fetchone()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in conn.execute('SELECT key, size FROM fragments ORDER BY last_used'):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM fragments WHERE key = ?', doomed)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._local = threading.local()
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        print(f"Fragment cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)")
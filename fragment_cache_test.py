@@ -0,0 +1,65 @@
+import json
+
+from fragment_cache import FragmentCache, subtree_digests
+from mapping_cache import load_registry
+from new_compiler import JSONCompiler
+
+def node(element, *nodes, **fields):
+    return {'name': '', 'element': element, 'nodes': list(nodes), **fields}
+
+def page():
+    fixed = node('row', node('text', text='hello'), node('button', text='go'))
+    return node('root', node('container', fixed, node('image')), node('card', node('paragraph', text='static')))
+
+def test_subtree_digests_keys_maximal_deterministic_subtrees(mapping_path):
+    _, registry = load_registry(mapping_path)
+    data = page()
+    keys = subtree_digests(data, registry, 'v1')
+    container, card = data['nodes']
+    row = container['nodes'][0]
+    # The image makes the root and its container volatile
+    assert set(keys) == {id(row), id(card)}
+    assert all(key.startswith('v1') for key in keys.values())
+    # Keys depend on the content and the version, not on the objects
+    same = page()
+    assert subtree_digests(same, registry, 'v1')[id(same['nodes'][1])] == keys[id(card)]
+    assert subtree_digests(same, registry, 'v2')[id(same['nodes'][1])] != keys[id(card)]
+
+def test_put_get_and_eviction(tmp_path):
+    cache = FragmentCache(str(tmp_path / 'cache' / 'fragments.sqlite'), max_bytes=10)
+    assert cache.get('a') is None
+    cache.put('a', '12345')
+    assert cache.get('a') == '12345'
+    cache.flush()
+    cache.put('b', '1234567')
+    cache.flush()
+    # The least recently used fragment went to keep the total under max_bytes
+    assert cache.get('a') is None
+    assert cache.get('b') == '1234567'
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
+
+def test_compiler_reuses_fragments_across_runs_and_invalidates_on_mapping_change(tmp_path, mapping_path):
+    images = str(tmp_path / 'images')
+    path = str(tmp_path / 'fragments.sqlite')
+
+    def render():
+        cache = FragmentCache(path)
+        html = JSONCompiler(mapping_path, None, images, cache).render_page(page())
+        cache.close()
+        return html, cache
+
+    first, cache = render()
+    assert cache.hits == 0 and cache.misses == 2
+    second, cache = render()
+    assert cache.hits == 2
+    assert second == first
+
+    with open(mapping_path) as f:
+        mapping = json.load(f)
+    mapping['paragraph'] = '<p class="paragraph changed">{}</p>'
+    with open(mapping_path, 'w') as f:
+        json.dump(mapping, f)
+    third, cache = render()
+    assert cache.hits == 0
+    assert 'paragraph changed' in third
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+import json
+import mmap
+import os
+import struct
+import threading
+
+INDEX_FILENAME = '.image_index.json'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+# JPEG start-of-frame markers (SOF0-SOF15 without DHT, JPG and DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def _jpeg_orientation(data, start, end):
+    # EXIF APP1 segment: "Exif\0\0" followed by a TIFF header
+    if data[start:start + 6] != b'Exif\x00\x00':
+        return 1
+    tiff = start + 6
+    order = '<' if data[tiff:tiff + 2] == b'II' else '>'
+    ifd = tiff + struct.unpack(order + 'I', data[tiff + 4:tiff + 8])[0]
+    if ifd + 2 > end:
+        return 1
+    (entries,) = struct.unpack(order + 'H', data[ifd:ifd + 2])
+    for i in range(entries):
+        entry = ifd + 2 + i * 12
+        if entry + 12 > end:
+            break
+        tag, _, _, value = struct.unpack(order + 'HHIH', data[entry:entry + 10])
+        if tag == 0x0112:
+            return value
+    return 1
+
+def _jpeg_size(data):
+    pos = 2
+    orientation = 1
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        (segment_length,) = struct.unpack('>H', data[pos + 2:pos + 4])
+        if marker == 0xE1:
+            orientation = _jpeg_orientation(data, pos + 4, min(pos + 2 + segment_length, length))
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            # Orientations 5-8 rotate by 90 degrees, which browsers apply when displaying
+            if orientation >= 5:
+                width, height = height, width
+            return width, height
+        pos += 2 + segment_length
+    return None
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        (bits,) = struct.unpack('<I', data[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+def probe_dimensions(data):
+    """
+    Read pixel dimensions from a JPEG, PNG, GIF or WebP header without decoding
+
+    :param data: Image bytes, typically an mmap of the file
+    :return: (format, width, height), or (None, None, None) if unrecognised
+    """
+    try:
+        if data[:8] == b'\x89PNG\r\n\x1a\n':
+            width, height = struct.unpack('>II', data[16:24])
+            return 'png', width, height
+        if data[:6] in (b'GIF87a', b'GIF89a'):
+            width, height = struct.unpack('<HH', data[6:10])
+            return 'gif', width, height
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            size = _webp_size(data)
+            if size:
+                return ('webp',) + size
+        if data[:2] == b'\xff\xd8':
+            size = _jpeg_size(data)
+            if size:
+                return ('jpeg',) + size
+    except struct.error:
+        pass
+    return None, None, None
+
+def _probe_file(path, size):
+    import hashlib
+    entry = {'sha256': hashlib.sha256(b'').hexdigest(), 'format': None, 'width': None, 'height': None}
+    if size == 0:
+        return entry
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        entry['sha256'] = hashlib.sha256(data).hexdigest()
+        entry['format'], entry['width'], entry['height'] = probe_dimensions(data)
+    return entry
+
+class ImageIndex:
+    """
+    Persistent metadata index of the images in an image folder
+
+    Records size, mtime, content hash and pixel dimensions for each image in
+    ``<image_folder>/.image_index.json``. refresh() only re-reads files whose
+    size or mtime changed since the index was written.
+    """
+
+    def __init__(self, image_folder):
+        self.image_folder = image_folder
+        self.images = {}
+        self._names = None
+
+    @property
+    def path(self):
+        return os.path.join(self.image_folder, INDEX_FILENAME)
+
+    @classmethod
+    def load(cls, image_folder):
+        index = cls(image_folder)
+        try:
+            with open(index.path, 'r') as f:
+                index.images = json.load(f).get('images', {})
+        except (OSError, ValueError):
+            index.images = {}
+        return index
+
+    def refresh(self):
+        """
+        Bring the index up to date with the image folder and save it if anything changed
+
+        :return: Number of added, changed or removed entries
+        """
+        seen = set()
+        changes = 0
+        try:
+            entries = list(os.scandir(self.image_folder))
+        except OSError as e:
+            print(f"Error scanning images: {e}")
+            entries = []
+
+        for entry in entries:
+            if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            current = self.images.get(entry.name)
+            if current and current['size'] == stat.st_size and current['mtime_ns'] == stat.st_mtime_ns:
+                continue
+            try:
+                metadata = _probe_file(entry.path, stat.st_size)
+            except OSError as e:
+                print(f"Error reading image {entry.name}: {e}")
+                continue
+            self.images[entry.name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, **metadata}
+            changes += 1
+
+        for name in set(self.images) - seen:
+            del self.images[name]
+            changes += 1
+
+        self._names = None
+        if changes:
+            self.save()
+        return changes
+
+    def save(self):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({'images': self.images}, f, indent=2, sort_keys=True)
+        except OSError as e:
+            print(f"Error saving image index: {e}")
+
+    def names(self):
+        """
+        :return: Sorted list of indexed image filenames
+        """
+        if self._names is None:
+            self._names = sorted(self.images)
+        return self._names
+
+    def fingerprint(self):
+        """
+        :return: Digest that changes whenever an image is added, removed or modified
+        """
+        import hashlib
+        digest = hashlib.sha1()
+        for name in self.names():
+            digest.update(f"{name}:{self.images[name]['sha256']}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def get(self, name):
+        return self.images.get(name)
+
+    def dimensions(self, name):
+        """
+        :param name: Image filename
+        :return: (width, height), or None if unknown
+        """
+        entry = self.images.get(name)
+        if entry and entry.get('width'):
+            return entry['width'], entry['height']
+        return None
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_image_index(image_folder):
+    """
+    Return the refreshed index of an image folder, loaded once per process
+
+    :param image_folder: Folder containing images
+    :return: ImageIndex
+    """
+    index = _indexes.get(image_folder)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(image_folder)
+            if index is None:
+                index = ImageIndex.load(image_folder)
+                index.refresh()
+                _indexes[image_folder] = index
+    return index
@@ -0,0 +1,55 @@
+import os
+import random
+import struct
+
+from compiler import Node
+from image_index import INDEX_FILENAME, ImageIndex, get_image_index, probe_dimensions
+from mapping_cache import load_mapping
+
+def png(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+
+def gif(width, height):
+    return b'GIF89a' + struct.pack('<HH', width, height) + b'\x00' * 8
+
+def test_probe_dimensions_reads_headers():
+    assert probe_dimensions(png(640, 480)) == ('png', 640, 480)
+    assert probe_dimensions(gif(3, 2)) == ('gif', 3, 2)
+    assert probe_dimensions(b'not an image') == (None, None, None)
+
+def test_refresh_only_rereads_changed_files(tmp_path):
+    (tmp_path / 'a.png').write_bytes(png(10, 20))
+    (tmp_path / 'b.gif').write_bytes(gif(1, 1))
+    (tmp_path / 'notes.txt').write_text('skipped')
+
+    index = ImageIndex.load(str(tmp_path))
+    assert index.refresh() == 2
+    assert index.names() == ['a.png', 'b.gif']
+    assert index.dimensions('a.png') == (10, 20)
+    assert (tmp_path / INDEX_FILENAME).exists()
+
+    index = ImageIndex.load(str(tmp_path))
+    fingerprint = index.fingerprint()
+    assert index.refresh() == 0
+
+    (tmp_path / 'a.png').write_bytes(png(30, 40) + b'\x00')
+    os.remove(tmp_path / 'b.gif')
+    assert index.refresh() == 2
+    assert index.names() == ['a.png']
+    assert index.dimensions('a.png') == (30, 40)
+    assert index.fingerprint() != fingerprint
+
+def test_legacy_renderer_sizes_images_from_the_index(tmp_path, mapping_path):
+    (tmp_path / 'a.png').write_bytes(png(10, 20))
+    get_image_index(str(tmp_path))
+    root = Node('root')
+    root.add_child(Node('image', root))
+    html = root.render(load_mapping(mapping_path), str(tmp_path), random.Random(0))
+    assert 'a.png' in html and 'width="10" height="20"' in html
+
+def test_legacy_renderer_without_image_folder_links_the_placeholder(mapping_path):
+    root = Node('root')
+    for name in ('image', 'carousel'):
+        root.add_child(Node(name, root))
+    html = root.render(load_mapping(mapping_path))
+    assert 'placeholder.jpg' in html
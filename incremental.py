@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import bisect
+import itertools
+import re
+
+from element_registry import PrerenderedChildren
+from json_compiler import DEFINE_KEYWORD, Compiler, Node
+
+_DEFINITION = re.compile(rf'^[ \t]*{DEFINE_KEYWORD}.*{{[ \t]*$', re.M)
+
+def scan_blocks(text, depth=1):
+    """
+    Split DSL text into top-level blocks, following the stack rules of Compiler.parse_dsl
+
+    A block starts at every non-blank line read while the parser stack only
+    holds the root, so each block parses on its own to the same nodes it
+    gets when the whole text is parsed.
+
+    :param text: DSL text starting at a line boundary
+    :param depth: Parser stack depth before the first line (1 = only the root)
+    :return: (head, blocks, depth) where head is the text before the first
+        block, blocks the block texts and depth the stack depth after the text
+    """
+    starts = []
+    pos = 0
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped:
+            if depth == 1:
+                starts.append(pos)
+            indent = len(line) - len(line.lstrip())
+            depth = min(depth, indent + 2)
+            if stripped.endswith('{'):
+                depth += 1
+            elif stripped == '}' and depth > 1:
+                depth -= 1
+        pos += len(line) + 1
+    bounds = starts + [len(text)]
+    return text[:bounds[0]], [text[a:b] for a, b in zip(bounds, bounds[1:])], depth
+
+class Block:
+    """
+    One top-level block of a document with its parsed nodes and cached JSON and HTML
+    """
+    __slots__ = ('text', 'nodes', 'json', 'html', 'features')
+
+    def __init__(self, text, nodes):
+        self.text = text
+        self.nodes = nodes
+        self.json = None
+        self.html = None
+        self.features = None
+
+class IncrementalDocument:
+    def __init__(self, text, compiler=None, renderer=None):
+        """
+        DSL document that reparses and re-renders only the blocks an edit touches
+
+        The text is kept as a list of top-level blocks (see scan_blocks). An
+        edit reparses the blocks it overlaps, extended while the parser state
+        after them differs from the one the following block was parsed with.
+        Every other block keeps its Node objects, its JSON (so placeholder
+        text stays put) and its rendered HTML. Component definitions are
+        shared by all blocks, so an edit that touches one reparses the whole
+        document.
+
+        :param text: DSL text
+        :param compiler: json_compiler.Compiler used for parsing, defaults to the default mapping
+        :param renderer: Optional new_compiler.JSONCompiler used by render()
+        """
+        self.compiler = compiler or Compiler()
+        self.renderer = renderer
+        self._load(text)
+
+    def _load(self, text):
+        # A ComponentError leaves the document as it was
+        components = {}
+        head, texts, _ = scan_blocks(text)
+        blocks = [self._parse(t, components) for t in ([head] if head else []) + texts]
+        self.components = components
+        self.blocks = blocks
+        self._reindex()
+
+    def _parse(self, text, components=None):
+        return Block(text, self.compiler.parse_dsl(text, self.components if components is None else components).children)
+
+    def _reindex(self):
+        self.starts = [0]
+        self.starts.extend(itertools.accumulate(len(block.text) for block in self.blocks[:-1]))
+        self._root = None
+
+    @property
+    def text(self):
+        return ''.join(block.text for block in self.blocks)
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Apply a text edit
+
+        :param offset: Character offset of the edit
+        :param deleted: Number of characters removed at offset
+        :param inserted: Text inserted at offset
+        :return: range of the indices of the blocks that were reparsed
+        :raises json_compiler.ComponentError: If the edited text uses an undefined
+            component; the document is left unchanged
+        """
+        if not self.blocks:
+            self.blocks = [Block('', [])]
+            self._reindex()
+        i = max(bisect.bisect_right(self.starts, offset) - 1, 0)
+        j = max(bisect.bisect_left(self.starts, offset + deleted) - 1, i)
+        region = ''.join(block.text for block in self.blocks[i:j + 1])
+        relative = offset - self.starts[i]
+        region = region[:relative] + inserted + region[relative + deleted:]
+
+        head, texts, depth = scan_blocks(region)
+        texts = ([head] if head else []) + texts
+        k = j + 1
+        while k < len(self.blocks):
+            following = self.blocks[k].text
+            if texts and not texts[-1].endswith('\n'):
+                # The edit left a partial last line: it continues into the next block
+                head, more, depth = scan_blocks(texts.pop() + following)
+                texts.extend(([head] if head else []) + more)
+            elif depth != 1:
+                # Unbalanced braces: the next block now nests under the edited one
+                head, more, depth = scan_blocks(following, depth)
+                texts[-1] += head
+                texts.extend(more)
+            else:
+                break
+            k += 1
+
+        if any(_DEFINITION.search(t) for t in texts + [block.text for block in self.blocks[i:k]]):
+            self._load(''.join([block.text for block in self.blocks[:i]] + texts + [block.text for block in self.blocks[k:]]))
+            return range(len(self.blocks))
+
+        # Blocks whose text came back unchanged keep their nodes and renders
+        previous = {block.text: block for block in self.blocks[i:k]}
+        self.blocks[i:k] = [previous.pop(t, None) or self._parse(t) for t in texts]
+
+        # Shift the offsets of the blocks after the edit instead of recounting them all
+        starts = list(itertools.accumulate((len(t) for t in texts), initial=self.starts[i]))
+        delta = len(inserted) - deleted
+        self.starts[i:] = starts[:-1] + [start + delta for start in self.starts[k:]]
+        if not self.blocks:
+            self.starts = [0]
+        self._root = None
+        return range(i, i + len(texts))
+
+    @property
+    def root(self):
+        """
+        Root Node of the whole document, as Compiler.parse_dsl would return it
+        """
+        if self._root is None:
+            root = Node('root')
+            root.components = self.components
+            for block in self.blocks:
+                for node in block.nodes:
+                    node.parent = root
+                    root.add_child(node)
+            self._root = root
+        return self._root
+
+    def _block_json(self, block):
+        if block.json is None:
+            block.json = [node.tojson() for node in block.nodes]
+        return block.json
+
+    def tojson(self):
+        """
+        :return: JSON of the whole document, as Node.tojson would return it
+        """
+        data = Node('root').tojson()
+        for block in self.blocks:
+            data['nodes'].extend(self._block_json(block))
+        return data
+
+    def render(self):
+        """
+        Render the document with the renderer, reusing the HTML of unchanged blocks
+
+        The features used by the document are left in renderer.features.
+
+        :return: Rendered HTML string
+        """
+        renderer = self.renderer
+        features = set()
+        parts = []
+        for block in self.blocks:
+            if block.html is None:
+                renderer.features = set()
+                block.html = ''.join(renderer.render_node(node) for node in self._block_json(block))
+                block.features = renderer.features
+            parts.append(block.html)
+            features.update(block.features)
+
+        data = Node('root').tojson()
+        handler = renderer.registry.get('root')
+        html = ''.join(parts)
+        renderer.features = features
+        if handler is None:
+            return f'<div class="root">{html}</div>'
+        return handler(PrerenderedChildren(renderer, html), data)
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from incremental import IncrementalDocument, scan_blocks
+from json_compiler import ComponentError, Compiler
+from new_compiler import JSONCompiler
+
+TEXT = """container{
+\trow{
+\t\ttext
+\t}
+}
+card{
+\tbutton
+}
+footer
+"""
+
+def shape(node):
+    return node.name, [shape(child) for child in node.children]
+
+def test_scan_blocks_splits_top_level_blocks():
+    head, blocks, depth = scan_blocks(TEXT)
+    assert head == ''
+    assert blocks == ['container{\n\trow{\n\t\ttext\n\t}\n}\n', 'card{\n\tbutton\n}\n', 'footer\n']
+    assert depth == 1
+    assert scan_blocks('row{\n\ttext\n')[2] == 2
+
+def test_edit_reparses_only_the_touched_block(mapping_path):
+    compiler = Compiler(mapping_path)
+    document = IncrementalDocument(TEXT, compiler)
+    container, card, footer = document.blocks
+
+    offset = TEXT.index('button')
+    reparsed = document.edit(offset, len('button'), 'paragraph')
+    assert list(reparsed) == [1]
+    assert document.blocks[0] is container and document.blocks[2] is footer
+    assert document.text == TEXT.replace('button', 'paragraph')
+    assert shape(document.root) == shape(compiler.parse_dsl(document.text))
+
+def test_unbalanced_edit_extends_the_reparsed_range(mapping_path):
+    compiler = Compiler(mapping_path)
+    document = IncrementalDocument(TEXT, compiler)
+    # Dropping the closing brace nests the following blocks under the container
+    offset = TEXT.index('}\ncard')
+    document.edit(offset, 2, '')
+    assert shape(document.root) == shape(compiler.parse_dsl(document.text))
+
+def test_random_edits_match_a_full_parse(mapping_path):
+    compiler = Compiler(mapping_path)
+    rng = random.Random(7)
+    pieces = ['text', 'row{', '}', '\t', '\n', 'button', 'card{\n\ttext\n}\n', '']
+    document = IncrementalDocument(TEXT, compiler)
+    for _ in range(300):
+        text = document.text
+        offset = rng.randint(0, len(text))
+        deleted = rng.randint(0, min(8, len(text) - offset))
+        inserted = rng.choice(pieces)
+        document.edit(offset, deleted, inserted)
+        assert document.text == text[:offset] + inserted + text[offset + deleted:]
+        assert shape(document.root) == shape(compiler.parse_dsl(document.text))
+
+def test_render_reuses_unchanged_blocks(tmp_path, mapping_path):
+    renderer = JSONCompiler(mapping_path, None, str(tmp_path / 'images'))
+    document = IncrementalDocument(TEXT, Compiler(mapping_path), renderer)
+    first = document.render()
+    container_html = document.blocks[0].html
+    json_before = document.tojson()['nodes'][0]
+
+    document.edit(TEXT.index('button'), len('button'), 'button-c')
+    second = document.render()
+    # The container's placeholder text and HTML are kept
+    assert document.blocks[0].html is container_html
+    assert document.tojson()['nodes'][0] == json_before
+    assert container_html in first and container_html in second
+    assert "button-c" in second
+
+COMPONENTS = """define hdr {
+\tnavlink
+}
+header{
+\tuse hdr
+}
+footer
+"""
+
+def test_editing_a_definition_updates_its_uses(mapping_path):
+    compiler = Compiler(mapping_path)
+    document = IncrementalDocument(COMPONENTS, compiler)
+    assert list(document.edit(COMPONENTS.index('navlink'), len('navlink'), 'button')) == [0, 1, 2]
+    header = document.root.children[0]
+    assert header.children[0].children[0].name == 'button'
+    assert shape(document.root) == shape(compiler.parse_dsl(document.text))
+
+def test_edit_using_an_undefined_component_leaves_the_document_unchanged(mapping_path):
+    document = IncrementalDocument(COMPONENTS, Compiler(mapping_path))
+    blocks = list(document.blocks)
+    for offset, inserted in ((COMPONENTS.index('footer'), 'use missing\n'), (0, 'use hdr\n')):
+        with pytest.raises(ComponentError):
+            document.edit(offset, 0, inserted)
+        assert document.blocks == blocks
+        assert document.text == COMPONENTS
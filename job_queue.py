@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+QUEUE_FILENAME = '.build_queue.sqlite'
+
+# Temporary files written by write_atomic: .<name>.<pid>.tmp
+_TMP_NAME = re.compile(r'^\.(.+)\.(\d+)\.tmp$')
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+def queue_path(output_folder):
+    """
+    :param output_folder: Folder the pages are generated into
+    :return: Path of the job queue database kept in that folder
+    """
+    return os.path.join(output_folder, QUEUE_FILENAME)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobQueue:
+    """
+    Durable queue of pages to compile, stored in a local SQLite database
+
+    Every page is one row that moves from pending to running (claimed by a
+    worker process) to done, or back to pending when it fails, until it has
+    used up max_attempts and is marked failed. Claims are made in an
+    immediate transaction, so concurrent workers never get the same page.
+
+    A claim is a lease: the worker renews it with heartbeat() while it
+    works, and recover() reclaims the jobs of leases that expired.
+    """
+
+    def __init__(self, path, max_attempts=3, lease=300):
+        """
+        :param path: Path of the SQLite database, created if missing
+        :param max_attempts: Attempts per page before it is marked failed
+        :param lease: Seconds a claim stays valid without a heartbeat
+        """
+        import sqlite3
+
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease = lease
+        # Transactions are issued explicitly, claims need BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY, page TEXT UNIQUE NOT NULL, source TEXT NOT NULL, '
+            'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, worker INTEGER, '
+            'claimed REAL, error TEXT, elements TEXT)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, attempts, id)')
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, jobs, chunk_size=10000):
+        """
+        Add jobs; pages already in the queue keep their state, so a rerun resumes
+
+        :param jobs: Iterable of (page, source path)
+        :return: Number of new jobs
+        """
+        added = 0
+        chunk = []
+        for job in jobs:
+            chunk.append(job)
+            if len(chunk) >= chunk_size:
+                added += self._insert(chunk)
+                chunk = []
+        if chunk:
+            added += self._insert(chunk)
+        return added
+
+    def _insert(self, chunk):
+        before = self.conn.total_changes
+        self.conn.execute('BEGIN')
+        self.conn.executemany(f"INSERT OR IGNORE INTO jobs (page, source, state) VALUES (?, ?, '{PENDING}')", chunk)
+        self.conn.execute('COMMIT')
+        return self.conn.total_changes - before
+
+    def claim(self, worker, limit):
+        """
+        Atomically take pending jobs
+
+        Fresh jobs are handed out in batches of limit. A job that failed or
+        whose worker died before is handed out alone, so a page that crashes
+        its worker cannot take other pages down with it again.
+
+        :param worker: Worker id, see worker_id()
+        :param limit: Maximum number of jobs
+        :return: List of (page, source); empty when nothing is pending
+        """
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self.conn.execute(
+                f"SELECT id, page, source, attempts FROM jobs WHERE state = '{PENDING}' "
+                'ORDER BY attempts, id LIMIT ?', (limit,)
+            ).fetchall()
+            if rows and rows[0][3]:
+                rows = rows[:1]
+            self.conn.executemany(
+                f"UPDATE jobs SET state = '{RUNNING}', attempts = attempts + 1, worker = ?, claimed = ? WHERE id = ?",
+                [(worker, time.time(), row[0]) for row in rows]
+            )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return [(page, source) for _, page, source, _ in rows]
+
+    def finish(self, worker, done, failed):
+        """
+        Record the outcome of claimed jobs in one transaction
+
+        Jobs that were recovered and claimed by another worker in the meantime
+        are left to that worker.
+
+        :param worker: Worker id the jobs were claimed with
+        :param done: List of (page, elements) for the compiled pages
+        :param failed: List of (page, error message); pages with attempts left go back to pending
+        """
+        self.conn.execute('BEGIN')
+        self.conn.executemany(
+            f"UPDATE jobs SET state = '{DONE}', worker = NULL, error = NULL, elements = ? "
+            f"WHERE page = ? AND state = '{RUNNING}' AND worker = ?",
+            [(json.dumps(sorted(elements)), page, worker) for page, elements in done]
+        )
+        self.conn.executemany(
+            f"UPDATE jobs SET state = CASE WHEN attempts < ? THEN '{PENDING}' ELSE '{FAILED}' END, "
+            f"worker = NULL, error = ? WHERE page = ? AND state = '{RUNNING}' AND worker = ?",
+            [(self.max_attempts, error, page, worker) for page, error in failed]
+        )
+        self.conn.execute('COMMIT')
+
+    def heartbeat(self, worker):
+        """
+        Renew the lease of a worker's running jobs
+
+        :param worker: Worker id, see worker_id()
+        """
+        self.conn.execute(f"UPDATE jobs SET claimed = ? WHERE state = '{RUNNING}' AND worker = ?", (time.time(), worker))
+
+    def recover(self, run=None):
+        """
+        Put the running jobs of dead workers back into the queue
+
+        A worker is dead when its lease expired, when its process is gone, or
+        when it belongs to the given run, whose workers have all exited. A
+        reused process id therefore delays recovery until the lease expires
+        but never leaves a job stuck. The attempt stays counted, so a page
+        that keeps killing its worker ends up failed.
+
+        :param run: Id of a run whose workers have all exited, see worker_id()
+        :return: Number of recovered jobs
+        """
+        expired = time.time() - self.lease
+        dead = []
+        for worker, claimed in self.conn.execute(
+                f"SELECT worker, MAX(claimed) FROM jobs WHERE state = '{RUNNING}' GROUP BY worker"):
+            # Ids are run:pid; queues written before leases hold the bare pid
+            worker_run, _, pid = str(worker).rpartition(':')
+            if (worker is None or claimed is None or claimed < expired or (run and worker_run == run)
+                    or not pid.isdigit() or not _pid_alive(int(pid))):
+                dead.append((worker,))
+        before = self.conn.total_changes
+        self.conn.execute('BEGIN')
+        self.conn.executemany(
+            f"UPDATE jobs SET state = CASE WHEN attempts < {self.max_attempts} THEN '{PENDING}' ELSE '{FAILED}' END, "
+            f"worker = NULL, error = 'worker process died' WHERE state = '{RUNNING}' AND worker IS ?",
+            dead
+        )
+        self.conn.execute('COMMIT')
+        return self.conn.total_changes - before
+
+    def retry_failed(self):
+        """
+        :return: Number of failed jobs put back into the queue with fresh attempts
+        """
+        before = self.conn.total_changes
+        self.conn.execute(f"UPDATE jobs SET state = '{PENDING}', attempts = 0 WHERE state = '{FAILED}'")
+        return self.conn.total_changes - before
+
+    def counts(self):
+        """
+        :return: Dictionary of state -> number of jobs
+        """
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(self.conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+        return counts
+
+    def failures(self, limit=20):
+        """
+        :return: List of (page, error) of failed jobs
+        """
+        return self.conn.execute(
+            f"SELECT page, error FROM jobs WHERE state = '{FAILED}' ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+
+    def done_elements(self):
+        """
+        :return: Generator of (page, element list) for every done job
+        """
+        for page, elements in self.conn.execute(f"SELECT page, elements FROM jobs WHERE state = '{DONE}'"):
+            yield page, json.loads(elements or '[]')
+
+def worker_id(run):
+    """
+    :param run: Id of the build run, a new one for every process_json_queue call
+    :return: Id of the calling worker process in the queue, unique even when process ids are reused
+    """
+    return f"{run}:{os.getpid()}"
+
+def write_atomic(path, text):
+    """
+    Write a file through a temporary file and a rename, so it is either complete or absent
+
+    The temporary file is ``.<name>.<pid>.tmp`` next to the target, see remove_stale_temporaries.
+
+    :param path: Target path
+    :param text: File content
+    """
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, f".{name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def remove_stale_temporaries(folder):
+    """
+    Delete the temporary files that write_atomic left behind in processes that were killed
+
+    Only names write_atomic creates are considered, and only those of
+    processes that are no longer running.
+
+    :param folder: Folder the pages are written to
+    :return: Number of deleted files
+    """
+    removed = 0
+    for entry in os.scandir(folder):
+        match = _TMP_NAME.match(entry.name)
+        if match and entry.is_file() and not _pid_alive(int(match.group(2))):
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+def _work(path, output_folder, dsl_mapping_path, image_folder, max_attempts, lease, batch_size, seed, run):
+    from dependency_index import collect_elements
+    from new_compiler import JSONCompiler, generate_css_cached
+
+    queue = JobQueue(path, max_attempts, lease)
+    compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder)
+    pid = os.getpid()
+    worker = worker_id(run)
+    compiled = 0
+    try:
+        while True:
+            jobs = queue.claim(worker, batch_size)
+            if not jobs:
+                return compiled
+            done = []
+            failed = []
+            renewed = time.time()
+            for page, source in jobs:
+                if time.time() - renewed > lease / 4:
+                    queue.heartbeat(worker)
+                    renewed = time.time()
+                try:
+                    with open(source, 'r') as f:
+                        data = json.load(f)
+                    context = compiler.context(random.Random(f"{seed}:{page}") if seed is not None else None)
+                    full_html = context.render_document(data, page)
+                    write_atomic(os.path.join(output_folder, f"{page}_styles.css"),
+                                 generate_css_cached(data.get('styles', {})))
+                    write_atomic(os.path.join(output_folder, f"{page}.html"), full_html)
+                    done.append((page, collect_elements(data)))
+                except Exception as e:
+                    failed.append((page, f"{type(e).__name__}: {e}"))
+            queue.finish(worker, done, failed)
+            compiled += len(done)
+            print(f"Worker {pid}: {compiled} pages compiled")
+    finally:
+        queue.close()
+
+def process_json_queue(json_folder, output_folder, dsl_mapping_path, image_folder='images', workers=None,
+                       batch_size=64, max_attempts=3, seed=None, retry_failed=False, lease=300):
+    """
+    Compile all JSON files in a folder through a durable job queue.
+
+    The queue lives in the output folder. Rerunning after a crash, an OOM
+    kill or Ctrl-C compiles only the pages that are not done yet. Pages of
+    dead workers, or of workers whose lease expired, are claimed again, and
+    failing pages are retried up to max_attempts times. HTML and CSS files are written through a temporary
+    file and a rename, so a page is never left half written.
+
+    :param json_folder: Folder containing JSON files
+    :param output_folder: Folder to store generated HTML and CSS
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder for dynamic images
+    :param workers: Number of worker processes, defaults to the CPU count
+    :param batch_size: Pages claimed per transaction
+    :param max_attempts: Attempts per page before it is marked failed
+    :param seed: Optional seed; each page gets an RNG seeded from it and the page name,
+        so a retried page comes out the same
+    :param retry_failed: Give the pages that failed in earlier runs new attempts
+    :param lease: Seconds after which the pages of a worker that stopped renewing its claim are claimed again
+    :return: Dictionary of state -> number of pages
+    """
+    from dependency_index import ElementIndex
+    from mapping_cache import load_mapping
+
+    os.makedirs(output_folder, exist_ok=True)
+    remove_stale_temporaries(output_folder)
+    path = queue_path(output_folder)
+    run = uuid.uuid4().hex
+    queue = JobQueue(path, max_attempts, lease)
+    try:
+        added = queue.enqueue((entry.name[:-5], entry.path) for entry in os.scandir(json_folder)
+                              if entry.name.endswith('.json'))
+        recovered = queue.recover()
+        retried = queue.retry_failed() if retry_failed else 0
+        counts = queue.counts()
+        print(f"Queue {path}: {added} new, {recovered} recovered, {retried} retried, "
+              f"{counts[PENDING]} pending, {counts[DONE]} done, {counts[FAILED]} failed")
+    finally:
+        # SQLite connections must not be inherited by the forked workers
+        queue.close()
+
+    workers = workers or os.cpu_count() or 1
+    while counts[PENDING]:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_work, path, output_folder, dsl_mapping_path, image_folder,
+                                       max_attempts, lease, batch_size, seed, run) for _ in range(workers)]
+                for future in as_completed(futures):
+                    future.result()
+        except BrokenProcessPool:
+            # A worker was killed (e.g. out of memory): its pages are requeued below
+            print("A worker process died, restarting the workers")
+        queue = JobQueue(path, max_attempts, lease)
+        try:
+            # Every worker of this run has exited, so all its running jobs are orphaned
+            queue.recover(run)
+            counts = queue.counts()
+        finally:
+            queue.close()
+
+    queue = JobQueue(path, max_attempts, lease)
+    try:
+        index = ElementIndex.load(output_folder)
+        index.mapping = load_mapping(dsl_mapping_path)
+        for page, elements in queue.done_elements():
+            index.add_page(page, elements)
+        index.save(output_folder)
+
+        for page, error in queue.failures():
+            print(f"Failed: {page}: {error}")
+    finally:
+        queue.close()
+    print(f"Compiled {counts[DONE]} pages, {counts[FAILED]} failed.")
+    return counts
@@ -0,0 +1,129 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from job_queue import (DONE, FAILED, PENDING, RUNNING, JobQueue, process_json_queue, queue_path,
+                       remove_stale_temporaries, worker_id, write_atomic)
+
+def node(element, *nodes):
+    return {'name': '', 'element': element, 'nodes': list(nodes)}
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+def states(queue):
+    return dict(queue.conn.execute('SELECT page, state FROM jobs'))
+
+def test_claim_finish_and_retry(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.sqlite'), max_attempts=3)
+    assert queue.enqueue([('a', 'a.json'), ('b', 'b.json'), ('c', 'c.json')]) == 3
+    assert queue.enqueue([('a', 'a.json')]) == 0
+
+    worker = worker_id('run')
+    assert queue.claim(worker, 2) == [('a', 'a.json'), ('b', 'b.json')]
+    queue.finish(worker, [('a', {'text', 'root'})], [('b', 'boom')])
+    assert states(queue) == {'a': DONE, 'b': PENDING, 'c': PENDING}
+    assert list(queue.done_elements()) == [('a', ['root', 'text'])]
+
+    assert queue.claim(worker, 2) == [('c', 'c.json'), ('b', 'b.json')]
+    queue.finish(worker, [], [('c', 'boom'), ('b', 'boom')])
+    # Once no fresh page is left, pages that failed before are claimed alone
+    assert queue.claim(worker, 2) == [('c', 'c.json')]
+    queue.finish(worker, [('c', set())], [])
+    assert queue.claim(worker, 2) == [('b', 'b.json')]
+    queue.finish(worker, [], [('b', 'boom again')])
+    # b used up its three attempts
+    assert queue.claim(worker, 2) == []
+    assert queue.failures() == [('b', 'boom again')]
+    assert queue.retry_failed() == 1
+    assert queue.counts()[PENDING] == 1
+    queue.close()
+
+def test_recover_reclaims_dead_expired_and_finished_runs(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.sqlite'), max_attempts=3, lease=60)
+    queue.enqueue([(page, f"{page}.json") for page in 'abcdef'])
+    live = worker_id('other')
+    claims = {
+        'a': f"old:{dead_pid()}",
+        'b': live,
+        'c': worker_id('stale'),
+        'd': worker_id('this'),
+        'e': dead_pid(),
+    }
+    for page, worker in claims.items():
+        queue.conn.execute(f"UPDATE jobs SET state = '{RUNNING}', attempts = 1, worker = ?, claimed = ? WHERE page = ?",
+                           (worker, time.time(), page))
+    # A live process id (possibly reused) that stopped renewing its lease
+    queue.conn.execute("UPDATE jobs SET claimed = ? WHERE page = 'c'", (time.time() - 120,))
+
+    assert queue.recover() == 3
+    assert states(queue) == {'a': PENDING, 'b': RUNNING, 'c': PENDING, 'd': RUNNING, 'e': PENDING, 'f': PENDING}
+    # Once a run's workers have exited, its jobs are reclaimed at once
+    assert queue.recover('this') == 1
+    assert states(queue)['d'] == PENDING
+
+    queue.heartbeat(live)
+    queue.conn.execute("UPDATE jobs SET claimed = claimed - 30 WHERE page = 'b'")
+    assert queue.recover() == 0
+    queue.close()
+
+def test_finish_of_a_recovered_job_is_ignored(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.sqlite'), lease=60)
+    queue.enqueue([('a', 'a.json')])
+    stale = worker_id('stale')
+    queue.claim(stale, 1)
+    queue.conn.execute("UPDATE jobs SET claimed = claimed - 120")
+    assert queue.recover() == 1
+    fresh = worker_id('fresh')
+    assert queue.claim(fresh, 1) == [('a', 'a.json')]
+    queue.finish(stale, [], [('a', 'late failure')])
+    assert states(queue) == {'a': RUNNING}
+    queue.finish(fresh, [('a', set())], [])
+    assert states(queue) == {'a': DONE}
+    queue.close()
+
+def test_only_stale_write_atomic_temporaries_are_removed(tmp_path):
+    write_atomic(str(tmp_path / 'page.html'), '<html>')
+    assert os.listdir(tmp_path) == ['page.html']
+
+    names = [f".page.html.{dead_pid()}.tmp", f".page.html.{os.getpid()}.tmp", 'notes.tmp', 'page.html.1.tmp']
+    for name in names:
+        (tmp_path / name).write_text('partial')
+    assert remove_stale_temporaries(str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(['page.html'] + names[1:])
+
+def test_process_json_queue_resumes_and_retries(workdir, mapping_path):
+    os.makedirs('json')
+    for page in ('a', 'b', 'c'):
+        with open(os.path.join('json', f"{page}.json"), 'w') as f:
+            json.dump(node('root', node('container', node('text'))), f)
+    with open(os.path.join('json', 'bad.json'), 'w') as f:
+        f.write('{')
+
+    counts = process_json_queue('json', 'output', mapping_path, workers=1, max_attempts=2, seed=1)
+    assert (counts[DONE], counts[FAILED]) == (3, 1)
+    with open(os.path.join('output', 'a.html')) as f:
+        first = f.read()
+
+    # A run that was killed while compiling b, leaving a temporary file behind
+    os.remove(os.path.join('output', 'b.html'))
+    (workdir / 'output' / f".b.html.{dead_pid()}.tmp").write_text('partial')
+    queue = JobQueue(queue_path('output'))
+    queue.conn.execute(f"UPDATE jobs SET state = '{RUNNING}', worker = ? WHERE page = 'b'", (f"gone:{dead_pid()}",))
+    queue.close()
+
+    counts = process_json_queue('json', 'output', mapping_path, workers=1, max_attempts=2, seed=1)
+    assert (counts[DONE], counts[FAILED]) == (3, 1)
+    assert os.path.exists(os.path.join('output', 'b.html'))
+    assert not [name for name in os.listdir('output') if name.endswith('.tmp')]
+    with open(os.path.join('output', 'a.html')) as f:
+        assert f.read() == first
+
+    with open(os.path.join('json', 'bad.json'), 'w') as f:
+        json.dump(node('root'), f)
+    counts = process_json_queue('json', 'output', mapping_path, workers=1, retry_failed=True)
+    assert (counts[DONE], counts[FAILED]) == (4, 0)
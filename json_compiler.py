@@ -3,15 +3,34 @@
 import json
 import random
 import os
+import re
+import sys
+import time
+
+from element_registry import ElementRegistry, NodeRenderer
+from mapping_cache import load_registry
+from telemetry import BuildTelemetry, history_path, tree_stats
 
 dsl_mapping_path='dsl_mapping.json'
 
+# Component syntax: "define name {" ... "}" and "use name"
+DEFINE_KEYWORD = 'define '
+USE_KEYWORD = 'use '
+
+class ComponentError(ValueError):
+    """
+    Raised for a ``use`` of a component that is not defined, or whose definition is still open
+    """
+
 class Node:
     def __init__(self, name, parent=None):
         self.name = name
         self.parent = parent
         self.children = []
         self.attributes = {}
+        # Definition node a ``use`` node refers to, and the root's definitions by name
+        self.component = None
+        self.components = None
 
     def add_child(self, child):
         self.children.append(child)
@@ -19,69 +38,96 @@ class Node:
     def set_attribute(self, key, value):
         self.attributes[key] = value
 
-    def render(self, dsl_mapping):
-        element_mapping = dsl_mapping.get(self.name, "")
-        
-        # Return a default representation if no mapping exists
-        if not element_mapping:
-            return f"<{self.name}></{self.name}>"
-
-        # Replace attributes in the mapping
-        result = element_mapping
-        for key, value in self.attributes.items():
-            result = result.replace(f"${key}", value)
-
-        # Render child nodes
-        child_content = "".join(child.render(dsl_mapping) for child in self.children)
-        result = result.replace("{}", child_content)
+    def render(self, registry, rng=random, stats=None):
+        if not isinstance(registry, ElementRegistry):
+            registry = ElementRegistry(registry)
+        renderer = TreeRenderer(registry, rng)
+        renderer.stats = stats
+        return renderer.render(self)
     
-        return result
-    
-    def tojson(self):
-        root={
-            'name':'',
-            'element':self.name,
-            'nodes':[]
-        }
-        
-        # Add global styles for root
-        if self.name=='root':
-            root['styles']={
-                'primaryColor':'#6a11cb',
-                'secondaryColor':'#2ecc71'
-            }
-        
-        # Add content based on element type
-        if self.name=='text':
-            root['text']=get_random_text(random.randint(1,4))
-        elif self.name=='paragraph':
-            root['text']=". ".join([get_random_text(random.randint(5,10)) for _ in range(random.randint(4,10))])
-        elif self.name in ["navlink",'button']:
-            root['text']=get_random_text(random.randint(1,3))
-            root['href']='#'
-        elif self.name=="image":
-            root['url']=''  # Placeholder for image URL
-        elif self.name=='table':
-            root['data']={}
-        elif self.name=="carousel":
-            root['images']=[]
+    def tojson(self, rng=random, inline=True):
+        """
+        :param rng: random.Random for the placeholder content, defaults to the global RNG
+        :param inline: Copy the body of every used component into its ``use`` node. When
+            False, ``use`` nodes keep only the component name and the root carries each
+            definition once under 'components'.
+        :return: JSON dictionary
+        """
+        root = node_fields(self, rng)
+        if not inline and self.component is not None:
+            return root
 
         # Recursively add child nodes
         for node in self.children:
-            root['nodes'].append(node.tojson())        
+            root['nodes'].append(node.tojson(rng, inline))        
+        if not inline and self.components:
+            root['components'] = {name: [node.tojson(rng, False) for node in component.children]
+                                  for name, component in self.components.items()}
         return root
 
+def node_fields(node, rng=random):
+    """
+    Build the JSON object of a node with an empty 'nodes' list
+
+    Placeholder content is drawn from rng, so generating the fields in
+    pre-order gives the same JSON as Node.tojson with the same rng.
+
+    :param node: Node returned by Compiler.parse_dsl
+    :param rng: random.Random instance, or the random module for the global RNG
+    :return: JSON dictionary
+    """
+    root={
+        'name':'',
+        'element':node.name,
+        'nodes':[]
+    }
+    
+    # Add global styles for root
+    if node.name=='root':
+        root['styles']={
+            'primaryColor':'#6a11cb',
+            'secondaryColor':'#2ecc71'
+        }
+    
+    # Add content based on element type
+    if node.name=='text':
+        root['text']=get_random_text(rng.randint(1,4), rng)
+    elif node.name=='paragraph':
+        root['text']=". ".join([get_random_text(rng.randint(5,10), rng) for _ in range(rng.randint(4,10))])
+    elif node.name in ["navlink",'button']:
+        root['text']=get_random_text(rng.randint(1,3), rng)
+        root['href']='#'
+    elif node.name=="image":
+        root['url']=''  # Placeholder for image URL
+    elif node.name=='table':
+        root['data']={}
+    elif node.name=="carousel":
+        root['images']=[]
+    elif node.component is not None:
+        root['component']=node.component.name
+    return root
+
+class TreeRenderer(NodeRenderer):
+    def __init__(self, registry, rng=random):
+        super().__init__(registry)
+        self.rng = rng
+
+    def random_text(self):
+        return get_random_text(self.rng.randint(1,4), self.rng)
+
 class Compiler:
-    def __init__(self):
-        with open(dsl_mapping_path) as data_file:
-            self.dsl_mapping = json.load(data_file)
+    def __init__(self, dsl_mapping_file_path=None):
+        self.dsl_mapping, self.registry = load_registry(dsl_mapping_file_path or dsl_mapping_path)
 
     def compile(self, input_dsl, output_html_path, output_css_path):
         try:
             root = self.parse_dsl(input_dsl)
-            html_content = root.render(self.dsl_mapping)
-            html_content+="<script src='./../../assets/script.js'></script>"
+            renderer = TreeRenderer(self.registry)
+            html_content = renderer.render(root)
             html_content=html_content.replace('<img src=\"placeholder.jpg\"  class=\"image\">','<div class=\'image\'></div>')
+            # The page script only drives the carousel
+            if 'carousel' in renderer.features:
+                html_content+="\n<script src='./../../assets/script.js' defer></script>"
 
             full_html = f"""
 <!DOCTYPE html>
@@ -106,12 +152,45 @@ class Compiler:
         except Exception as e:
             print(f"Error compiling {output_html_path}: {str(e)}")
 
-    def parse_dsl(self, input_dsl):
-        lines = input_dsl.split('\n')
+    def parse_dsl(self, input_dsl, components=None):
+        """
+        :param input_dsl: DSL text
+        :param components: Optional dictionary of component definitions usable in the
+            text; the text's own definitions are added to it
+        :return: Root Node, with the definitions in root.components
+        """
         root = Node("root")
-        stack = [root]
-        
-        for line_number, line in enumerate(lines, 1): 
+        root.components = {} if components is None else components
+        self.parse_lines(input_dsl.split('\n'), [root], components=root.components)
+        return root
+
+    def parse_lines(self, lines, stack, first_line=1, components=None):
+        """
+        Parse DSL lines into the node on top of stack
+
+        A ``define name {`` block is parsed once into a definition kept out of
+        the tree and registered when the block closes. Each later ``use name``
+        line adds a ``use`` node that shares the definition's children instead
+        of copying them.
+
+        :param lines: DSL lines without line endings
+        :param stack: Open nodes, outermost first; parse_dsl starts from [root]
+        :param first_line: Line number of lines[0], for error messages
+        :param components: Dictionary of component definitions by name, updated by ``define`` blocks
+        :raises ComponentError: For a ``use`` of an undefined component or inside its own
+            definition, which also rules out indirect cycles
+        """
+        if components is None:
+            components = {}
+        # Definitions whose block is still open, by id of their node
+        defining = {}
+
+        def close():
+            node = stack.pop()
+            if defining.pop(id(node), None) is not None:
+                components[node.name] = node
+
+        for line_number, line in enumerate(lines, first_line): 
             if not line.strip():
                 continue
 
@@ -121,42 +200,211 @@ class Compiler:
             
                 # Adjust the stack to match the current indentation level
                 while indent < len(stack) - 2:
-                    stack.pop()
+                    close()
 
                 if line.endswith('{'):
                     # New node with children
                     name = line[:-1].strip()
-                    node = Node(name, stack[-1])
-                    stack[-1].add_child(node)
+                    if name.startswith(DEFINE_KEYWORD):
+                        # Component definition, not part of the tree
+                        node = Node(name[len(DEFINE_KEYWORD):].strip())
+                        defining[id(node)] = node
+                    else:
+                        node = Node(name, stack[-1])
+                        stack[-1].add_child(node)
                     stack.append(node)
                 elif line == '}':
                     # End of current node
                     if len(stack) > 1:
-                        stack.pop()
+                        close()
+                elif line.startswith(USE_KEYWORD):
+                    # Component reference sharing the definition's children
+                    name = line[len(USE_KEYWORD):].strip()
+                    if any(node.name == name for node in defining.values()):
+                        raise ComponentError(f"Line {line_number}: component {name} is used inside its own definition")
+                    if name not in components:
+                        raise ComponentError(f"Line {line_number}: unknown component {name}")
+                    node = Node('use', stack[-1])
+                    node.component = components[name]
+                    node.children = node.component.children
+                    stack[-1].add_child(node)
                 else:
                     # Leaf node
                     node = Node(line, stack[-1])
                     stack[-1].add_child(node)
 
+            except ComponentError:
+                raise
             except Exception as e:
                 print(f"Error parsing line {line_number}: {line}")
                 print(f"Error details: {str(e)}")
 
-        return root
+        # Definitions left open at the end of the text end with it
+        for node in stack:
+            if defining.pop(id(node), None) is not None:
+                components[node.name] = node
 
-def get_random_text(n=10):
+def get_random_text(n=10, rng=random):
     paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum.Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia."
     words=paragraph.split()
-    return " ".join(random.sample(words,n))
+    return " ".join(rng.sample(words,n))
+
+def write_json(root, f, rng=random, compact=False, inline=True):
+    """
+    Serialize a parsed tree straight to a file, without building its JSON first
+
+    Nodes are visited once and only the fields of the nodes on the current
+    path are held in memory; the text is written in large buffered chunks.
+    Placeholder content is drawn in the same order as Node.tojson, so with
+    the same rng the pretty output is byte-identical to
+    ``json.dump(root.tojson(rng, inline), f, indent=2)``.
+
+    :param root: Node returned by Compiler.parse_dsl
+    :param f: Text file open for writing
+    :param rng: random.Random for the placeholder content, defaults to the global RNG
+    :param compact: Write without whitespace and leave out empty 'name' and 'nodes' fields
+    :param inline: Copy component bodies into their ``use`` nodes, see Node.tojson
+    :return: Number of characters written
+    """
+    encode_string = json.encoder.encode_basestring_ascii
+    parts = []
+    out = parts.append
+    written = 0
+
+    def flush():
+        nonlocal written
+        chunk = ''.join(parts)
+        f.write(chunk)
+        written += len(chunk)
+        parts.clear()
+
+    def children(node):
+        return node.children if inline or node.component is None else ()
+
+    def components(node):
+        if inline or not node.components:
+            return ()
+        return node.components.items()
+
+    def pretty(node, level):
+        if len(parts) >= 8192:
+            flush()
+        pad = '\n' + '  ' * (level + 1)
+        separator = '{'
+        for key, value in node_fields(node, rng).items():
+            if key == 'nodes':
+                out(f'{separator}{pad}"nodes": ')
+                pretty_list(children(node), level + 1)
+            elif isinstance(value, str):
+                out(f'{separator}{pad}"{key}": {encode_string(value)}')
+            else:
+                out(f'{separator}{pad}"{key}": ' + json.dumps(value, indent=2).replace('\n', pad))
+            separator = ','
+        definitions = components(node)
+        if definitions:
+            out(f',{pad}"components": ')
+            inner = pad + '  '
+            separator = '{'
+            for name, component in definitions:
+                out(f'{separator}{inner}{encode_string(name)}: ')
+                pretty_list(component.children, level + 2)
+                separator = ','
+            out(pad + '}')
+        out(pad[:-2] + '}')
+
+    def pretty_list(nodes, level):
+        if not nodes:
+            out('[]')
+            return
+        pad = '\n' + '  ' * (level + 1)
+        separator = '[' + pad
+        for child in nodes:
+            out(separator)
+            pretty(child, level + 1)
+            separator = ',' + pad
+        out(pad[:-2] + ']')
+
+    def dense(node):
+        if len(parts) >= 8192:
+            flush()
+        nodes = children(node)
+        separator = '{'
+        for key, value in node_fields(node, rng).items():
+            if key == 'nodes':
+                if not nodes:
+                    continue
+                out(f'{separator}"nodes":')
+                dense_list(nodes)
+            elif isinstance(value, str):
+                if key == 'name' and not value:
+                    continue
+                out(f'{separator}"{key}":{encode_string(value)}')
+            else:
+                out(f'{separator}"{key}":' + json.dumps(value, separators=(',', ':')))
+            separator = ','
+        definitions = components(node)
+        if definitions:
+            out(f'{separator}"components":')
+            separator = '{'
+            for name, component in definitions:
+                out(f'{separator}{encode_string(name)}:')
+                dense_list(component.children)
+                separator = ','
+            out('}')
+        out('}' if separator == ',' else '{}')
+
+    def dense_list(nodes):
+        separator = '['
+        for child in nodes:
+            out(separator)
+            dense(child)
+            separator = ','
+        out(']' if separator == ',' else '[]')
+
+    if compact:
+        dense(root)
+    else:
+        pretty(root, 0)
+    flush()
+    return written
 
-def process_dsl_files(dsl_folder, output_folder, json_folder, dsl_mapping_file_path):
+def compact_json(node):
+    """
+    :param node: JSON node as built by Node.tojson
+    :return: Copy without the empty 'name' and 'nodes' fields, as write_json(compact=True) writes it
+    """
+    compact = {}
+    for key, value in node.items():
+        if key == 'nodes':
+            if value:
+                compact[key] = [compact_json(child) for child in value]
+        elif key == 'components':
+            compact[key] = {name: [compact_json(child) for child in nodes] for name, nodes in value.items()}
+        elif key != 'name' or value:
+            compact[key] = value
+    return compact
+
+def process_dsl_files(dsl_folder, output_folder, json_folder, dsl_mapping_file_path, inline_components=True, compact=False,
+                      history=None):
+    """
+    Convert every DSL file in a folder to JSON, recording build telemetry
+
+    :param dsl_folder: Folder containing .dsl files
+    :param output_folder: Folder of the generated pages, holding the build history by default
+    :param json_folder: Folder to write the JSON files to
+    :param dsl_mapping_file_path: Path to DSL mapping file
+    :param inline_components: Copy component bodies into the JSON, see Node.tojson
+    :param compact: Write compact JSON, see write_json
+    :param history: Build history database, defaults to telemetry.history_path(output_folder)
+    """
     # Ensure output and json folders exist
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     if not os.path.exists(json_folder):
         os.makedirs(json_folder)
    
-    compiler = Compiler()
+    compiler = Compiler(dsl_mapping_file_path)
+    telemetry = BuildTelemetry(history or history_path(output_folder), 'dsl2json')
 
     # Process each DSL file
     for filename in os.listdir(dsl_folder):
@@ -167,18 +415,155 @@ def process_dsl_files(dsl_folder, output_folder, json_folder, dsl_mapping_file_p
             json_output_path = os.path.join(json_folder, f"{filename[:-4]}.json")
 
             # Read DSL file
+            start = time.perf_counter()
             with open(input_path, 'r') as dsl_file:
                 input_dsl = dsl_file.read()
 
-            # Convert DSL to JSON
-            root = compiler.parse_dsl(input_dsl)
-            json_data = root.tojson()
-
-            # Save JSON file
-            with open(json_output_path, 'w') as json_file:
-                json.dump(json_data, json_file, indent=2)
+            # Convert DSL to JSON, streamed to the file from the parse tree
+            try:
+                root = compiler.parse_dsl(input_dsl)
+            except ComponentError as e:
+                print(f"Error parsing {input_path}: {e}")
+                continue
+            parsed = time.perf_counter()
+            with open(json_output_path, 'w', buffering=1 << 16) as json_file:
+                json_size = write_json(root, json_file, compact=compact, inline=inline_components)
+            written = time.perf_counter()
             print(f"Generated JSON: {json_output_path}")
 
+            # Nothing is rendered: serializing happens while the JSON is written
+            nodes, depth = tree_stats(root)
+            telemetry.record(filename[:-4], len(input_dsl), json_size, nodes, depth,
+                             parsed - start, 0.0, written - parsed)
+
+    telemetry.close()
+
+BUNDLE_DELIMITER = '---'
+
+def iter_dsl_documents(lines, fmt='auto'):
+    """
+    Split a multi-document stream into individual DSL documents.
+
+    Two formats are understood: a DSL bundle in which every document starts
+    with a ``--- <id>`` delimiter line, and JSON lines of ``{"id": ..., "dsl": ...}``
+    records. Only one document is held in memory at a time.
+
+    :param lines: Iterable of text lines, e.g. an open file or sys.stdin
+    :param fmt: 'bundle', 'jsonl' or 'auto' to detect from the first non-blank line
+    :return: Generator of (doc_id, dsl) pairs
+    """
+    doc_id = None
+    buffer = []
+    count = 0
+
+    for line in lines:
+        if fmt == 'auto':
+            if not line.strip():
+                continue
+            fmt = 'jsonl' if line.lstrip().startswith('{"') else 'bundle'
+
+        if fmt == 'jsonl':
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            count += 1
+            yield str(record.get('id', count)), record['dsl']
+            continue
+
+        if line.startswith(BUNDLE_DELIMITER):
+            if buffer and (doc_id is not None or ''.join(buffer).strip()):
+                count += 1
+                yield doc_id or str(count), ''.join(buffer)
+            doc_id = line[len(BUNDLE_DELIMITER):].strip() or None
+            buffer = []
+        else:
+            buffer.append(line)
+
+    if buffer and (doc_id is not None or ''.join(buffer).strip()):
+        count += 1
+        yield doc_id or str(count), ''.join(buffer)
+
+def process_dsl_stream(stream, json_folder=None, output_folder=None, dsl_mapping_file_path=dsl_mapping_path, image_folder='images', fmt='auto', inline_components=True, compact=False):
+    """
+    Compile a multi-document DSL stream one document at a time.
+
+    Each document is parsed with Compiler.parse_dsl and converted with
+    Node.tojson; the JSON is written to json_folder and/or rendered straight
+    to HTML in output_folder, without a round trip through the filesystem.
+    When HTML is written, the JSON and HTML come from a single traversal of
+    the parsed tree (see backends.py).
+
+    :param stream: Path of a bundle/JSONL file, '-' for stdin, or an open text stream
+    :param json_folder: Optional folder to write the JSON intermediate to
+    :param output_folder: Optional folder to write HTML and CSS to
+    :param dsl_mapping_file_path: Path to the DSL mapping file
+    :param image_folder: Folder containing images for the HTML output
+    :param fmt: 'bundle', 'jsonl' or 'auto'
+    :param inline_components: Copy component bodies into the JSON, see Node.tojson
+    :param compact: Write compact JSON, see write_json
+    :return: Number of documents processed
+    """
+    compiler = Compiler(dsl_mapping_file_path)
+    html_compiler = None
+    if json_folder:
+        os.makedirs(json_folder, exist_ok=True)
+    if output_folder:
+        from backends import HTMLBackend, JSONBackend, traverse
+        from new_compiler import JSONCompiler, generate_css_cached
+        html_compiler = JSONCompiler(dsl_mapping_file_path, output_folder, image_folder)
+
+    if stream == '-':
+        lines = sys.stdin
+    elif isinstance(stream, str):
+        lines = open(stream, 'r', buffering=1 << 16)
+    else:
+        lines = stream
+
+    count = 0
+    try:
+        for doc_id, input_dsl in iter_dsl_documents(lines, fmt):
+            page = re.sub(r'[^A-Za-z0-9_.-]', '_', doc_id)
+            try:
+                root = compiler.parse_dsl(input_dsl)
+            except ComponentError as e:
+                print(f"Error parsing {doc_id}: {e}")
+                continue
+            json_output_path = os.path.join(json_folder, f"{page}.json") if json_folder else None
+            if not html_compiler:
+                # Nothing else needs the JSON objects: stream them to the file
+                if json_output_path:
+                    with open(json_output_path, 'w', buffering=1 << 16) as json_file:
+                        write_json(root, json_file, compact=compact, inline=inline_components)
+                    print(f"Generated JSON: {json_output_path}")
+                count += 1
+                continue
+
+            if inline_components:
+                json_data, html_content = traverse(root, [JSONBackend(), HTMLBackend(html_compiler)])
+            else:
+                json_data = root.tojson(inline=False)
+                html_content = html_compiler.render_page(json_data)
+
+            if json_output_path:
+                with open(json_output_path, 'w') as json_file:
+                    if compact:
+                        json.dump(compact_json(json_data), json_file, separators=(',', ':'))
+                    else:
+                        json.dump(json_data, json_file, indent=2)
+                print(f"Generated JSON: {json_output_path}")
+
+            css_path = os.path.join(output_folder, f"{page}_styles.css")
+            with open(css_path, 'w') as css_file:
+                css_file.write(generate_css_cached(json_data.get('styles', {})))
+            full_html = html_compiler.document_head(f"{page}_styles.css") + html_compiler.document_body(html_content)
+            html_compiler.write_page(page, full_html)
+            count += 1
+    finally:
+        if lines is not stream and lines is not sys.stdin:
+            lines.close()
+
+    return count
+
 def dsl_to_json(dsl):
     compiler = Compiler()
     return compiler.parse_dsl(dsl).tojson()
@@ -190,5 +575,9 @@ if __name__ == "__main__":
     output_folder = "output"
     json_folder = "json"  # New JSON output folder
 
-    # Process all DSL files
-    process_dsl_files(dsl_folder, output_folder, json_folder, dsl_mapping_path)
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Multi-document bundle or JSONL file; '-' reads from stdin
+        process_dsl_stream(sys.argv[1], json_folder, output_folder, dsl_mapping_path)
+    else:
+        # Process all DSL files
+        process_dsl_files(dsl_folder, output_folder, json_folder, dsl_mapping_path)
\ No newline at end of file
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import random
+
+import pytest
+
+from compiler import Compiler as LegacyCompiler
+from json_compiler import ComponentError, Compiler, compact_json, iter_dsl_documents, process_dsl_stream, write_json
+
+BUNDLE = """--- home
+container{
+	text
+}
+--- about
+row{
+	button
+}
+"""
+
+def test_iter_dsl_documents_splits_bundles():
+    documents = list(iter_dsl_documents(io.StringIO(BUNDLE)))
+    assert [doc_id for doc_id, _ in documents] == ['home', 'about']
+    assert documents[1][1] == 'row{\n\tbutton\n}\n'
+
+def test_iter_dsl_documents_numbers_unnamed_documents():
+    documents = list(iter_dsl_documents(io.StringIO("text\n---\nbutton\n"), 'bundle'))
+    assert documents == [('1', 'text\n'), ('2', 'button\n')]
+
+def test_iter_dsl_documents_reads_jsonl():
+    lines = [json.dumps({'id': 'a', 'dsl': 'text\n'}) + '\n', '\n', json.dumps({'dsl': 'button\n'}) + '\n']
+    assert list(iter_dsl_documents(lines)) == [('a', 'text\n'), ('2', 'button\n')]
+
+def test_process_dsl_stream_writes_json_and_html(tmp_path, mapping_path):
+    bundle = tmp_path / 'pages.dsl'
+    bundle.write_text(BUNDLE.replace('--- about', '--- about us'))
+    count = process_dsl_stream(str(bundle), str(tmp_path / 'json'), str(tmp_path / 'output'), mapping_path,
+                               str(tmp_path / 'images'))
+    assert count == 2
+    # Document ids are made safe for filenames
+    assert sorted(os.listdir(tmp_path / 'json')) == ['about_us.json', 'home.json']
+    with open(tmp_path / 'json' / 'home.json') as f:
+        assert json.load(f)['nodes'][0]['element'] == 'container'
+    assert (tmp_path / 'output' / 'about_us.html').exists()
+    assert (tmp_path / 'output' / 'about_us_styles.css').exists()
+
+COMPONENTS = """define hdr {
+	navlink
+	navlink
+}
+header{
+	use hdr
+}
+footer{
+	use hdr
+}
+"""
+
+def test_use_shares_the_closed_definition(mapping_path):
+    root = Compiler(mapping_path).parse_dsl(COMPONENTS)
+    header, footer = root.children
+    assert header.children[0].component is root.components['hdr']
+    assert header.children[0].children is footer.children[0].children
+    data = root.tojson()
+    assert [node['element'] for node in data['nodes'][0]['nodes'][0]['nodes']] == ['navlink', 'navlink']
+
+@pytest.mark.parametrize('text', [
+    "header{\n\tuse hdr\n}\ndefine hdr {\n\tnavlink\n}\n",
+    "define a {\n\trow{\n\t\tuse a\n\t}\n}\n",
+    "define a {\n\tuse b\n}\ndefine b {\n\tuse a\n}\n",
+    "define a {\n\tdefine b {\n\t\tuse a\n\t}\n}\n",
+])
+def test_use_of_an_undefined_or_open_component_is_an_error(mapping_path, text):
+    with pytest.raises(ComponentError):
+        Compiler(mapping_path).parse_dsl(text)
+
+def test_definition_closed_by_indentation_or_end_of_text(mapping_path):
+    text = "define a {\n\trow{\n\t\tdefine b {\n\t\t\ttext\n\tuse b\n\t}\n}\nuse a\ndefine c {\n\tbutton"
+    root = Compiler(mapping_path).parse_dsl(text)
+    assert [child.name for child in root.children] == ['use']
+    assert [child.name for child in root.components['a'].children[0].children] == ['use']
+    assert set(root.components) == {'a', 'b', 'c'}
+
+def test_stream_skips_documents_with_component_errors(tmp_path, mapping_path):
+    bundle = tmp_path / 'pages.dsl'
+    bundle.write_text("--- bad\nrow{\n\tuse missing\n}\n" + BUNDLE)
+    count = process_dsl_stream(str(bundle), str(tmp_path / 'json'), None, mapping_path)
+    assert count == 2
+    assert sorted(os.listdir(tmp_path / 'json')) == ['about.json', 'home.json']
+
+def test_legacy_compiler_rejects_components(tmp_path, mapping_path):
+    compiler = LegacyCompiler(mapping_path, None)
+    with pytest.raises(ComponentError, match='json_compiler'):
+        compiler.parse_dsl(COMPONENTS)
+    with pytest.raises(ComponentError):
+        compiler.parse_dsl("row{\n\tuse hdr\n}\n")
+    assert [child.name for child in compiler.parse_dsl("row{\n\ttext\n}\n").children] == ['row']
+
+PAGE = COMPONENTS + """container{
+\ttext
+\trow{
+\t\timage
+\t\tparagraph
+\t}
+\tcarousel
+}
+"""
+
+@pytest.mark.parametrize('inline', [True, False])
+def test_write_json_matches_tojson(mapping_path, inline):
+    root = Compiler(mapping_path).parse_dsl(PAGE)
+    for seed in range(3):
+        pretty = io.StringIO()
+        written = write_json(root, pretty, random.Random(seed), inline=inline)
+        expected = json.dumps(root.tojson(random.Random(seed), inline), indent=2)
+        assert pretty.getvalue() == expected
+        assert written == len(expected)
+
+        compact = io.StringIO()
+        write_json(root, compact, random.Random(seed), compact=True, inline=inline)
+        expected = json.dumps(compact_json(root.tojson(random.Random(seed), inline)), separators=(',', ':'))
+        assert compact.getvalue() == expected
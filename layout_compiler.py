@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import re
+
+from json_compiler import Node, node_fields
+from new_compiler import JSONCompiler
+
+# Elements whose JSON fields draw placeholder text (see json_compiler.node_fields)
+TEXT_ELEMENTS = ('text', 'paragraph', 'navlink', 'button')
+
+_SLOT = re.compile('\x00(\\d+)\x00')
+
+def _sentinel(index):
+    return f"\x00{index}\x00"
+
+class _Draws:
+    """
+    The renderer's placeholder text generator, drawing from a given RNG
+    """
+    __slots__ = ('rng',)
+    generate_random_text = JSONCompiler.generate_random_text
+
+    def __init__(self, rng):
+        self.rng = rng
+
+class CompiledLayout:
+    """
+    A page compiled into constant HTML chunks and the dynamic slots between them
+
+    render(rng) gives the same HTML as
+    ``compiler.render_page(root.tojson(rng))`` for the page the layout was
+    compiled from, drawing the same numbers from rng, without walking the
+    tree or calling any handler.
+    """
+
+    def __init__(self, chunks, slots, kinds, image_attributes, features):
+        """
+        :param chunks: Constant HTML around the slots, one more than there are slots
+        :param slots: Index of the value shown at each slot
+        :param kinds: What each value is, in draw order: the element name for the
+            texts Node.tojson draws, then ``(min_words, max_words)`` for texts and
+            'image' for images drawn while rendering
+        :param image_attributes: Image filename -> <img> attribute string
+        :param features: Features used by the page, for JSONCompiler.document_body
+        """
+        self.chunks = chunks
+        self.slots = slots
+        self.kinds = kinds
+        self.image_attributes = image_attributes
+        self.features = features
+        self._choices = list(image_attributes.values())
+        # Placeholder nodes let node_fields draw the JSON texts exactly as tojson does
+        self._stubs = [Node(kind) for kind in kinds if kind in TEXT_ELEMENTS]
+        self._render_draws = kinds[len(self._stubs):]
+
+    def render(self, rng=None, seed=None):
+        """
+        :param rng: random.Random for the placeholder content
+        :param seed: Seed of a new random.Random, used when rng is not given
+        :return: Rendered HTML string
+        """
+        if rng is None:
+            rng = random.Random(seed)
+        values = [node_fields(stub, rng)['text'] for stub in self._stubs]
+        draws = _Draws(rng)
+        for kind in self._render_draws:
+            values.append(rng.choice(self._choices) if kind == 'image' else draws.generate_random_text(*kind))
+        return self._join(values)
+
+    def fill(self, values):
+        """
+        Render the layout with given content instead of random content
+
+        :param values: One value per entry of self.kinds: a text, or an image filename
+        :return: Rendered HTML string
+        """
+        if len(values) != len(self.kinds):
+            raise ValueError(f"Layout takes {len(self.kinds)} values, got {len(values)}")
+        return self._join([self.image_attributes[value] if kind == 'image' else value
+                           for kind, value in zip(self.kinds, values)])
+
+    def _join(self, values):
+        parts = [None] * (2 * len(self.slots) + 1)
+        parts[0::2] = self.chunks
+        parts[1::2] = [values[i] for i in self.slots]
+        return ''.join(parts)
+
+def compile_layout(root, compiler):
+    """
+    Compile a parsed page into a CompiledLayout
+
+    The page is rendered once through the element handlers with a sentinel
+    in place of every random text and image. The sentinels split the HTML
+    into the constant chunks and the slots.
+
+    :param root: Root Node returned by json_compiler.Compiler.parse_dsl
+    :param compiler: new_compiler.JSONCompiler providing the registry and images
+    :return: CompiledLayout
+    """
+    data = root.tojson(random.Random(0))
+    kinds = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if node['element'] in TEXT_ELEMENTS:
+            node['text'] = _sentinel(len(kinds))
+            kinds.append(node['element'])
+        stack.extend(reversed(node['nodes']))
+
+    context = compiler.context()
+    context.fragment_cache = None
+
+    def generate_random_text(min_words=3, max_words=10):
+        kinds.append((min_words, max_words))
+        return _sentinel(len(kinds) - 1)
+    context.generate_random_text = generate_random_text
+
+    names = compiler.image_index.names()
+    if names:
+        # Without images the placeholder is used and nothing is drawn
+        def random_image_attributes():
+            kinds.append('image')
+            return _sentinel(len(kinds) - 1)
+        context.random_image_attributes = random_image_attributes
+
+    parts = _SLOT.split(context.render_page(data))
+    image_attributes = {name: compiler.image_attributes(os.path.join(compiler.image_folder, name)) for name in names}
+    return CompiledLayout(parts[0::2], [int(index) for index in parts[1::2]], kinds,
+                          image_attributes, frozenset(context.features))
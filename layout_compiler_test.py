@@ -0,0 +1,71 @@
+import random
+import struct
+
+import pytest
+
+from json_compiler import Compiler
+from layout_compiler import compile_layout
+from new_compiler import JSONCompiler
+
+DSL = """define hdr {
+\tnavlink
+\tbutton
+}
+header{
+\tuse hdr
+}
+container{
+\ttext
+\ttext-c
+\trow{
+\t\timage
+\t\tparagraph
+\t}
+\tcarousel
+}
+footer{
+\tuse hdr
+}
+"""
+
+def png(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height)
+
+@pytest.mark.parametrize('with_images', [True, False])
+def test_render_matches_render_page_of_tojson(tmp_path, mapping_path, with_images):
+    images = tmp_path / 'images'
+    images.mkdir()
+    if with_images:
+        for name in ('a.png', 'b.png', 'c.png', 'd.png'):
+            (images / name).write_bytes(png(8, 6))
+    compiler = JSONCompiler(mapping_path, None, str(images))
+    root = Compiler(mapping_path).parse_dsl(DSL)
+    layout = compile_layout(root, compiler)
+
+    for seed in range(10):
+        rng = random.Random(seed)
+        expected_rng = random.Random(seed)
+        expected = compiler.context(expected_rng).render_page(root.tojson(expected_rng))
+        assert layout.render(rng) == expected
+        # The same numbers were drawn
+        assert rng.getstate() == expected_rng.getstate()
+    assert layout.render(seed='x') == layout.render(random.Random('x'))
+    assert ('image' in layout.kinds) == with_images
+
+def test_fill_places_the_given_values(tmp_path, mapping_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    (images / 'a.png').write_bytes(png(8, 6))
+    compiler = JSONCompiler(mapping_path, None, str(images))
+    layout = compile_layout(Compiler(mapping_path).parse_dsl(DSL), compiler)
+
+    values = ['a.png' if kind == 'image' else f"value-{i}" for i, kind in enumerate(layout.kinds)]
+    html = layout.fill(values)
+    # Values of texts no handler shows, such as a paragraph's JSON text, are left out
+    for i in layout.slots:
+        if layout.kinds[i] != 'image':
+            assert f"value-{i}" in html
+    assert layout.image_attributes['a.png'] in html
+    assert '\x00' not in html
+    with pytest.raises(ValueError):
+        layout.fill(values[:-1])
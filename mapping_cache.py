@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import json
+import marshal
+import os
+import threading
+
+from element_registry import ElementRegistry, compile_templates
+
+SNAPSHOT_VERSION = 1
+
+def snapshot_path(dsl_mapping_path):
+    directory, filename = os.path.split(os.path.abspath(dsl_mapping_path))
+    return os.path.join(directory, '__pycache__', f"{filename}.marshal")
+
+def load_compiled_mapping(dsl_mapping_path):
+    """
+    Load a DSL mapping and its precompiled templates, using a marshal snapshot when fresh.
+
+    The snapshot lives in ``__pycache__/<mapping>.marshal`` next to the mapping
+    and is rebuilt whenever the mapping's mtime or size changes.
+
+    :param dsl_mapping_path: Path to the DSL mapping file
+    :return: (dsl_mapping, templates) where templates is element -> split_template() result
+    """
+    stat = os.stat(dsl_mapping_path)
+    path = snapshot_path(dsl_mapping_path)
+    try:
+        with open(path, 'rb') as f:
+            snapshot = marshal.load(f)
+        if (snapshot.get('version') == SNAPSHOT_VERSION and snapshot.get('mtime_ns') == stat.st_mtime_ns
+                and snapshot.get('size') == stat.st_size):
+            return snapshot['mapping'], snapshot['templates']
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(dsl_mapping_path, 'r') as f:
+        dsl_mapping = json.load(f)
+    templates = compile_templates(dsl_mapping)
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'mapping': dsl_mapping,
+        'templates': templates,
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only checkout still works, just without the snapshot
+        pass
+    return dsl_mapping, templates
+
+def load_mapping(dsl_mapping_path):
+    """
+    :param dsl_mapping_path: Path to the DSL mapping file
+    :return: Parsed mapping dictionary
+    """
+    return load_compiled_mapping(dsl_mapping_path)[0]
+
+def load_registry(dsl_mapping_path):
+    """
+    :param dsl_mapping_path: Path to the DSL mapping file
+    :return: (dsl_mapping, ElementRegistry) built from the precompiled templates
+    """
+    dsl_mapping, templates = load_compiled_mapping(dsl_mapping_path)
+    return dsl_mapping, ElementRegistry(dsl_mapping, templates=templates)
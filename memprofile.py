@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import itertools
+import json
+import os
+import re
+import sys
+import tracemalloc
+
+# Compile phases, in the order a page goes through them
+PHASES = ('parse_dsl', 'tojson', 'json.load', 'render_node', 'write')
+
+def _reset_peak_rss():
+    # Linux resets the VmHWM high-water mark to the current RSS on this write
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _peak_rss():
+    """
+    :return: Peak resident set size in bytes since the last _reset_peak_rss, or
+        over the process lifetime where it cannot be reset; None if unknown
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _size(size):
+    if size is None:
+        return '        ?'
+    if abs(size) < 1 << 20:
+        return f"{size / 1024:6.1f} KB"
+    return f"{size / (1 << 20):6.1f} MB"
+
+class MemoryProfiler:
+    """
+    Memory used by every compile phase of every file, measured with tracemalloc and the peak RSS
+
+    Between phases a tracemalloc snapshot is summed up by allocating line.
+    Per phase the profiler keeps the traced peak and the retained memory above
+    the level the phase started at, the process's peak RSS during the phase,
+    and the source lines whose allocations grew most.
+    """
+
+    def __init__(self, sites=5):
+        """
+        :param sites: Allocation sites kept per phase
+        """
+        self.sites = sites
+        self.files = []
+        self._lines = {}
+
+    def _line_sizes(self):
+        # Only the per-line totals are kept: holding whole snapshots would take
+        # more memory than the pages being measured. The profiler's own lines
+        # are left out.
+        lines = {}
+        for stat in tracemalloc.take_snapshot().statistics('lineno'):
+            frame = stat.traceback[0]
+            if frame.filename not in (__file__, tracemalloc.__file__):
+                lines[f"{frame.filename}:{frame.lineno}"] = (stat.size, stat.count)
+        return lines
+
+    def begin(self, page):
+        """
+        Start tracing a file; phase() entries are recorded for it until end()
+
+        Tracing restarts for every file, so only the file's own allocations
+        are traced and the snapshots stay as small as the file.
+
+        :param page: Page name
+        """
+        self.files.append((page, []))
+        self._lines = {}
+        tracemalloc.start()
+
+    def end(self):
+        tracemalloc.stop()
+
+    def discard(self):
+        """
+        Drop the measurements of the file begun last, e.g. one that failed to parse
+        """
+        self.files.pop()
+        self._lines = {}
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def _record(self, name, start, current, peak, rss):
+        lines = self._line_sizes()
+        growth = []
+        for site, (size, count) in lines.items():
+            old_size, old_count = self._lines.get(site, (0, 0))
+            if size > old_size:
+                growth.append((site, size - old_size, count - old_count))
+        sites = sorted(growth, key=lambda g: g[1], reverse=True)[:self.sites]
+        self._lines = lines
+        self.files[-1][1].append((name, peak - start, current - start, rss, sites))
+
+    def heaviest(self, top=10):
+        """
+        :param top: Number of files
+        :return: List of (page, phases) of the files with the highest traced phase peaks
+        """
+        return sorted(self.files, key=lambda f: max((phase[1] for phase in f[1]), default=0), reverse=True)[:top]
+
+    def report(self, top=10):
+        """
+        Print the phases and top allocation sites of the heaviest files, and the per-phase maxima of all files.
+
+        :param top: Number of files listed in detail
+        """
+        print(f"Memory profile of {len(self.files)} files, {min(top, len(self.files))} heaviest:")
+        for page, phases in self.heaviest(top):
+            print(f"{page}:")
+            for name, peak, retained, rss, sites in phases:
+                print(f"  {name:<11} peak {_size(peak)}  retained {_size(retained)}  RSS peak {_size(rss)}")
+                for site, size, count in sites:
+                    print(f"      {_size(size)}  {count:9d} blocks  {site}")
+
+        print("Per-phase maximum over all files:")
+        for name in PHASES:
+            measured = [(phase, page) for page, phases in self.files for phase in phases if phase[0] == name]
+            if not measured:
+                continue
+            peak, peak_page = max(((phase[1], page) for phase, page in measured), key=lambda m: m[0])
+            rss, rss_page = max(((phase[3] or 0, page) for phase, page in measured), key=lambda m: m[0])
+            print(f"  {name:<11} peak {_size(peak)} ({peak_page})  RSS peak {_size(rss)} ({rss_page})")
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        _reset_peak_rss()
+        tracemalloc.reset_peak()
+        self.start = tracemalloc.get_traced_memory()[0]
+
+    def __exit__(self, exc_type, exc, tb):
+        current, peak = tracemalloc.get_traced_memory()
+        self.profiler._record(self.name, self.start, current, peak, _peak_rss())
+
+def iter_sources(inputs):
+    """
+    :param inputs: .dsl/.json files, folders of them, DSL bundle/JSONL files or '-' for stdin
+    :return: Generator of (page, kind, text) with kind 'json' or 'dsl'
+    """
+    from json_compiler import iter_dsl_documents
+    from regression import iter_corpus
+
+    for source in inputs:
+        if source == '-':
+            for page, text in iter_dsl_documents(sys.stdin):
+                yield page, 'dsl', text
+        elif os.path.isfile(source) and source.endswith('.json'):
+            with open(source, 'r') as f:
+                yield os.path.basename(source)[:-5], 'json', f.read()
+        elif os.path.isfile(source) and source.endswith('.dsl'):
+            # Read like cli.py does: a one-document bundle named after the file
+            page = os.path.basename(source)[:-4]
+            with open(source, 'r') as f:
+                for page, text in iter_dsl_documents(itertools.chain([f"--- {page}\n"], f)):
+                    yield page, 'dsl', text
+        else:
+            yield from iter_corpus(source)
+
+def profile_files(inputs, json_folder=None, output_folder=None, dsl_mapping_path='dsl_mapping.json', image_folder='images',
+                  top=10, inline_components=True, compact=False, sites=5):
+    """
+    Compile files one at a time under tracemalloc and report the memory of each phase.
+
+    DSL files go through parse_dsl, tojson, render_node and the write; JSON
+    files through json.load, render_node and the write. The phases run one
+    after the other even where a normal build fuses them (write_json, the
+    backends' single traversal), so every phase can be measured on its own.
+    tracemalloc slows compiling down several times and adds to the RSS.
+
+    :param inputs: .dsl/.json files, folders of them, DSL bundle/JSONL files or '-' for stdin
+    :param json_folder: Optional folder to write the JSON of DSL files to
+    :param output_folder: Optional folder to write HTML and CSS to
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder containing images
+    :param top: Number of heaviest files reported in detail
+    :param inline_components: Copy component bodies into the JSON, see Node.tojson
+    :param compact: Write compact JSON, see json_compiler.write_json
+    :param sites: Allocation sites reported per phase
+    :return: MemoryProfiler with the measurements
+    """
+    from json_compiler import ComponentError, Compiler, compact_json
+    from new_compiler import JSONCompiler, generate_css_cached
+
+    parser = Compiler(dsl_mapping_path)
+    compiler = None
+    if json_folder:
+        os.makedirs(json_folder, exist_ok=True)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+        compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder)
+
+    profiler = MemoryProfiler(sites)
+    for page, kind, text in iter_sources(inputs):
+        page = re.sub(r'[^A-Za-z0-9_.-]', '_', page)
+        profiler.begin(page)
+        try:
+            if kind == 'dsl':
+                with profiler.phase('parse_dsl'):
+                    root = parser.parse_dsl(text)
+                with profiler.phase('tojson'):
+                    data = root.tojson(inline=inline_components)
+            else:
+                root = None
+                with profiler.phase('json.load'):
+                    data = json.loads(text)
+            full_html = None
+            if compiler:
+                with profiler.phase('render_node'):
+                    full_html = compiler.render_document(data, page)
+            with profiler.phase('write'):
+                if json_folder and kind == 'dsl':
+                    with open(os.path.join(json_folder, f"{page}.json"), 'w') as f:
+                        if compact:
+                            json.dump(compact_json(data), f, separators=(',', ':'))
+                        else:
+                            json.dump(data, f, indent=2)
+                if full_html is not None:
+                    with open(os.path.join(output_folder, f"{page}_styles.css"), 'w') as f:
+                        f.write(generate_css_cached(data.get('styles', {})))
+                    compiler.write_page(page, full_html)
+        except ComponentError as e:
+            print(f"Error parsing {page}: {e}")
+            profiler.discard()
+            continue
+        finally:
+            profiler.end()
+        del root, data, full_html
+
+    profiler.report(top)
+    return profiler
@@ -0,0 +1,66 @@
+import json
+import os
+import tracemalloc
+
+from memprofile import MemoryProfiler, iter_sources, profile_files
+
+SMALL = "container{\n\ttext\n}\n"
+LARGE = "container{\n" + "\trow{\n\t\ttext\n\t\tbutton\n\t}\n" * 200 + "}\n"
+
+def test_iter_sources_reads_files_bundles_and_folders(tmp_path):
+    (tmp_path / 'one.dsl').write_text(SMALL)
+    (tmp_path / 'two.json').write_text('{}')
+    (tmp_path / 'bundle.txt').write_text(f"--- a\n{SMALL}--- b\n{SMALL}")
+    folder = tmp_path / 'pages'
+    folder.mkdir()
+    (folder / 'p.dsl').write_text(SMALL)
+
+    sources = list(iter_sources([str(tmp_path / 'one.dsl'), str(tmp_path / 'two.json'),
+                                 str(tmp_path / 'bundle.txt'), str(folder)]))
+    assert [(page, kind) for page, kind, _ in sources] == [
+        ('one', 'dsl'), ('two', 'json'), ('a', 'dsl'), ('b', 'dsl'), ('p', 'dsl')]
+    assert sources[0][2].strip() == SMALL.strip()
+
+def test_profile_files_records_every_phase(workdir, mapping_path):
+    with open('pages.dsl', 'w') as f:
+        f.write(f"--- small\n{SMALL}--- large\n{LARGE}")
+    with open('page.json', 'w') as f:
+        json.dump({'name': '', 'element': 'root', 'nodes': []}, f)
+
+    profiler = profile_files(['pages.dsl', 'page.json'], 'json', 'output', mapping_path, top=2, sites=3)
+    phases = {page: [phase[0] for phase in measured] for page, measured in profiler.files}
+    assert phases == {
+        'small': ['parse_dsl', 'tojson', 'render_node', 'write'],
+        'large': ['parse_dsl', 'tojson', 'render_node', 'write'],
+        'page': ['json.load', 'render_node', 'write'],
+    }
+    for _, measured in profiler.files:
+        for name, peak, retained, rss, sites in measured:
+            assert peak >= 0 and len(sites) <= 3
+    assert [page for page, _ in profiler.heaviest(1)] == ['large']
+    assert os.path.exists(os.path.join('json', 'large.json'))
+    assert os.path.exists(os.path.join('output', 'large.html'))
+
+def test_heaviest_orders_by_the_largest_phase_peak():
+    profiler = MemoryProfiler()
+    profiler.files = [('a', [('tojson', 10, 0, None, [])]), ('b', [('tojson', 5, 0, None, []), ('write', 30, 0, None, [])]),
+                      ('c', [])]
+    assert [page for page, _ in profiler.heaviest(3)] == ['b', 'a', 'c']
+
+def test_profile_files_skips_pages_with_component_errors(workdir, mapping_path, capsys):
+    with open('pages.dsl', 'w') as f:
+        f.write(f"--- a\nrow{{\n\tuse nope\n}}\n--- b\n{SMALL}")
+    profiler = profile_files(['pages.dsl'], 'json', None, mapping_path)
+    assert 'Error parsing a' in capsys.readouterr().out
+    assert [page for page, _ in profiler.files] == ['b']
+    assert os.listdir('json') == ['b.json']
+    # Tracing was stopped for the skipped page too
+    assert not tracemalloc.is_tracing()
+
+def test_dsl2json_memprofile_skips_pages_with_component_errors(workdir, mapping_path):
+    from cli import main
+
+    with open('pages.dsl', 'w') as f:
+        f.write(f"--- a\nrow{{\n\tuse nope\n}}\n--- b\n{SMALL}")
+    main(['--mapping', mapping_path, 'dsl2json', 'pages.dsl', '-j', 'json', '--memprofile', '5'])
+    assert os.listdir('json') == ['b.json']
@@ -1,25 +1,33 @@
 #!/usr/bin/env python3
 
+import functools
 import json
 import os
 import random
+import time
 
 class JSONCompiler:
-    def __init__(self, dsl_mapping_path, output_folder, image_folder='images'):
+    def __init__(self, dsl_mapping_path, output_folder, image_folder='images', fragment_cache=None, vendor_folder=None):
         """
         Initialize the compiler with DSL mapping and output configurations
         
         :param dsl_mapping_path: Path to the DSL mapping JSON file
-        :param output_folder: Folder where HTML files will be generated
+        :param output_folder: Folder where HTML files will be generated, or None to only render
         :param image_folder: Folder containing images for dynamic image generation
+        :param fragment_cache: Optional FragmentCache for deterministic subtrees
+        :param vendor_folder: Folder of vendored front-end assets, defaults to assets.VENDOR_FOLDER
         """
-        # Load DSL mapping
-        with open(dsl_mapping_path, 'r') as f:
-            self.dsl_mapping = json.load(f)
+        from assets import AssetManifest
+        from image_index import get_image_index
+        from mapping_cache import load_registry
+
+        # Load DSL mapping and the element handlers compiled from it
+        self.dsl_mapping, self.registry = load_registry(dsl_mapping_path)
         
         # Create output folder if it doesn't exist
         self.output_folder = output_folder
-        os.makedirs(output_folder, exist_ok=True)
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
         
         # Image folder for dynamic image generation
         self.image_folder = image_folder
@@ -27,6 +35,51 @@ class JSONCompiler:
         # Ensure image folder exists
         os.makedirs(image_folder, exist_ok=True)
 
+        # Size, hash and dimensions of the available images
+        self.image_index = get_image_index(image_folder)
+
+        # Rendered fragments persisted across runs, keyed per page by render_page
+        self.fragment_cache = fragment_cache
+        self._fragment_keys = {}
+
+        # Features used by the last rendered page and the assets they pull in
+        self.features = set()
+        self.assets = AssetManifest(output_folder, vendor_folder)
+
+        # budgets.PageStats of the page being rendered, if render_page was given one
+        self.stats = None
+        self._depth = 0
+
+        # Component definitions of the page being rendered (see Node.tojson) and their rendered bodies
+        self.components = {}
+        self._component_html = {}
+
+        # Placeholder content comes from the global RNG unless a context has its own
+        self.rng = random
+
+    def context(self, rng=None):
+        """
+        Per-call view of the compiler for concurrent rendering
+
+        The view shares the mapping, registry, image index, asset manifest and
+        fragment cache, none of which rendering modifies, and has its own RNG,
+        features, page statistics, components and fragment keys. Threads
+        rendering through separate contexts of one compiler do not interfere.
+
+        :param rng: random.Random for placeholder content, defaults to a new unseeded one
+        :return: JSONCompiler context
+        """
+        import copy
+
+        context = copy.copy(self)
+        context.rng = rng if rng is not None else random.Random()
+        context.features = set()
+        context.stats = None
+        context.components = {}
+        context._component_html = {}
+        context._fragment_keys = {}
+        return context
+
     def generate_random_text(self, min_words=3, max_words=10):
         """
         Generate random placeholder text
@@ -43,8 +96,8 @@ class JSONCompiler:
             "Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia."
         ]
         
-        num_words = random.randint(min_words, max_words)
-        words = " ".join(random.choice(lorem_ipsum).split()[:num_words])
+        num_words = self.rng.randint(min_words, max_words)
+        words = " ".join(self.rng.choice(lorem_ipsum).split()[:num_words])
         return words
 
     def generate_local_image(self):
@@ -53,18 +106,71 @@ class JSONCompiler:
         
         :return: Relative path to a random image
         """
-        try:
-            image_files = [f for f in os.listdir(self.image_folder) 
-                           if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-            
-            if not image_files:
-                return "placeholder.jpg"
-            
-            return os.path.join(self.image_folder, random.choice(image_files))
-        except Exception as e:
-            print(f"Error generating image: {e}")
+        image_files = self.image_index.names()
+        if not image_files:
             return "placeholder.jpg"
 
+        return os.path.join(self.image_folder, self.rng.choice(image_files))
+
+    def image_attributes(self, img_path):
+        """
+        Build the src and intrinsic size attributes of an <img> tag
+
+        :param img_path: Image path as returned by generate_local_image
+        :return: Attribute string
+        """
+        attributes = f'src="..\\{img_path}"'
+        size = self.image_index.dimensions(os.path.basename(img_path))
+        if self.stats is not None:
+            self.stats.add_image(self.image_index.get(os.path.basename(img_path)))
+        if size:
+            attributes += f' width="{size[0]}" height="{size[1]}"'
+        return attributes
+
+    def random_image_attributes(self):
+        return self.image_attributes(self.generate_local_image())
+
+    def carousel_image_attributes(self):
+        # Limit to 3 images for the carousel
+        image_files = self.image_index.names() or ["placeholder.jpg"]
+        return [self.image_attributes(os.path.join(self.image_folder, img)) for img in image_files[:3]]
+
+    def node_text(self, node, default=None):
+        text = node.get('text')
+        if text is None:
+            text = default if default is not None else self.generate_random_text()
+        return text
+
+    def node_href(self, node):
+        return node.get('href', '#')
+
+    def render_children(self, node):
+        return ''.join(self.render_node(child) for child in node.get('nodes', ()))
+
+    def render_component(self, node):
+        """
+        Render a ``use`` node
+
+        A node with its component body inlined renders its children. A
+        reference is looked up in self.components and its body is rendered
+        once per page, then reused for every other reference.
+
+        :param node: JSON node of element ``use``
+        :return: Rendered HTML string
+        """
+        if node.get('nodes'):
+            return self.render_children(node)
+        name = node.get('component')
+        html = self._component_html.get(name)
+        if html is None:
+            html = self._component_html[name] = ''.join(self.render_node(child) for child in self.components.get(name, ()))
+        elif self.stats is not None:
+            # A reference to a missing definition rendered nothing and adds no statistics
+            nodes = self.components.get(name)
+            if nodes is not None:
+                self._collect_stats(nodes, html)
+        return html
+
     def render_node(self, node):
         """
         Recursively render a JSON node to HTML
@@ -72,93 +178,160 @@ class JSONCompiler:
         :param node: JSON node to render
         :return: Rendered HTML string
         """
+        key = self._fragment_keys.get(id(node)) if self._fragment_keys else None
+        if key is not None:
+            html = self.fragment_cache.get(key)
+            if html is not None:
+                if self.registry.features:
+                    self._collect_features(node)
+                if self.stats is not None:
+                    self._collect_stats([node], html)
+                return html
+
         element = node.get('element', '')
+        stats = self.stats
+        if stats is not None:
+            self._depth += 1
+            stats.add_node(element, self._depth)
+        handler = self.registry.get(element)
+        features = self.registry.features.get(element)
+        if features:
+            self.features.update(features)
+        if handler is None:
+            # Fallback to generic div for unmapped elements
+            html = f'<div class="{element}">{self.render_children(node)}</div>'
+        else:
+            html = handler(self, node)
+        if stats is not None:
+            self._depth -= 1
+
+        if key is not None:
+            self.fragment_cache.put(key, html)
+        return html
+
+    def _collect_features(self, node):
+        # A subtree served from the fragment cache still needs its page assets
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            features = self.registry.features.get(current.get('element', ''))
+            if features:
+                self.features.update(features)
+            stack.extend(current.get('nodes', ()))
+
+    def _collect_stats(self, nodes, html):
+        # Same for the page statistics; the images are read back from the cached HTML
+        stack = [(node, self._depth + 1) for node in nodes]
+        while stack:
+            current, depth = stack.pop()
+            self.stats.add_node(current.get('element', ''), depth)
+            stack.extend((child, depth + 1) for child in current.get('nodes', ()))
+        self.stats.add_images_from_html(html, self.image_index)
+
+    def render_page(self, data, stats=None):
+        """
+        Render a root JSON node, serving deterministic subtrees from the fragment cache
 
-        if element == 'carousel':
-            # Fetch all image files from the images folder
-            try:
-                image_files = [f for f in os.listdir(self.image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-            except Exception as e:
-                print(f"Error fetching images: {e}")
-                image_files = ["placeholder.jpg"]
-
-            # Limit to 3 images for the carousel
-            images = image_files[:3]
-
-            # Carousel HTML template
-            carousel_html = """
-            <div class="carousel-container">
-                <div id="carouselExample" class="carousel slide" data-bs-ride="carousel">
-                    <div class="carousel-inner">
-                        {slides}
-                    </div>
-                    <button class="carousel-control-prev" type="button" data-bs-target="#carouselExample" data-bs-slide="prev">
-                        <span class="carousel-control-prev-icon" aria-hidden="true"></span>
-                        <span class="visually-hidden">Previous</span>
-                    </button>
-                    <button class="carousel-control-next" type="button" data-bs-target="#carouselExample" data-bs-slide="next">
-                        <span class="carousel-control-next-icon" aria-hidden="true"></span>
-                        <span class="visually-hidden">Next</span>
-                    </button>
-                </div>
-            </div>
-            """
+        The features used by the page are left in self.features for document_body.
 
-            
-            # Generate slides using images from the folder
-            slides = ""
-            for i, img in enumerate(images):
-                active_class = "active" if i == 0 else ""
-                img_path = os.path.join(self.image_folder, img)
-                slides += f"""
-                <div class="carousel-item {active_class}">
-                    <img src="..\{img_path}" class="d-block w-100" alt="Carousel Image {i+1}">
-                </div>
-                """
-
-            # Replace placeholder with slides
-            return carousel_html.format(slides=slides)
+        :param data: Root JSON node
+        :param stats: Optional budgets.PageStats to fill in with the page's
+            element counts, depth and images while rendering
+        :return: Rendered HTML string
+        """
+        self.features = set()
+        self.stats = stats
+        self._depth = 0
+        self.components = data.get('components', {})
+        self._component_html = {}
+        try:
+            if self.fragment_cache is None:
+                return self.render_node(data)
+            from fragment_cache import subtree_digests
+            version = self.registry.version + self.image_index.fingerprint()
+            self._fragment_keys = subtree_digests(data, self.registry, version)
+            return self.render_node(data)
+        finally:
+            self._fragment_keys = {}
+            self.stats = None
+
+    def document_head(self, css_filename):
+        """
+        Build the start of an HTML document up to and including <body>
 
-        
-        # Special handling for dynamic content
-        if element == 'text':
-            return self.dsl_mapping.get('text', '').format(
-                node.get('text', self.generate_random_text())
-            )
-        
-        if element == 'text-c':
-            return self.dsl_mapping.get('text-c', '').format(
-                self.generate_random_text()
-            )
-        
-        if element == 'image':
-            img_path = self.generate_local_image()
-            return self.dsl_mapping.get('image', '').replace(
-                '<img alt="Dynamic image" class="image">', 
-                f'<img src="..\{img_path}" alt="Dynamic image" class="image">'
-            )
-        if element == 'navlink':
-            return self.dsl_mapping.get('navlink', '').replace(
-                '<a href="#" class="navlink"></a>',
-                f"<a class='navlink' href='{node.get('href', '#')}'>{node.get('text', 'Link')}</a>"
-            )
+        :param css_filename: Stylesheet linked from the page
+        :return: HTML string
+        """
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Generated Page</title>
+    <link rel="stylesheet" href="{css_filename}">
+{self.assets.stylesheet_links()}</head>
+<body>
+"""
+
+    def document_body(self, html_content, features=None):
+        """
+        Build the rest of an HTML document from the rendered page content
+
+        :param html_content: Rendered root node
+        :param features: Features used by the page, defaults to those of the last render_page
+        :return: HTML string
+        """
+        scripts = self.assets.script_tags(self.features if features is None else features)
+        return f"""{html_content}
+{scripts}</body>
+</html>"""
+
+    def write_page(self, base_filename, full_html):
+        """
+        Write a complete HTML document to the output folder
 
+        :param base_filename: Page name without extension
+        :param full_html: HTML document
+        :return: Path of the written file
+        """
+        output_html_path = os.path.join(self.output_folder, f"{base_filename}.html")
+        with open(output_html_path, 'w') as f:
+            f.write(full_html)
         
-        if element == 'button':
-            return self.dsl_mapping.get('button', '').replace(
-                '<button class="button"></button>',
-                f"<button class='button'>{node.get('text', 'click here')}</button>"
-            )
-            
+        print(f"Successfully compiled: {output_html_path}")
+        return output_html_path
+
+    def render_document(self, data, base_filename, stats=None):
+        """
+        Render a JSON page to a complete HTML document
+
+        :param data: Root JSON node
+        :param base_filename: Page name used for the CSS filename
+        :param stats: Optional budgets.PageStats, see render_page; html_bytes is set to the document size
+        :return: HTML document string
+        """
+        # Generate the corresponding CSS filename
+        css_filename = f"{base_filename}_styles.css"
         
-        # Render children for container-like elements
-        children_html = ''
-        if 'nodes' in node:
-            children_html = ''.join(self.render_node(child) for child in node['nodes'])
+        # Render the root node
+        html_content = self.render_page(data, stats)
         
-        # Use mapping template or fallback to generic div
-        template = self.dsl_mapping.get(element, '<div class="{}">{}</div>'.format(element, '{}'))
-        return template.format(children_html)
+        # Generate full HTML document
+        full_html = self.document_head(css_filename) + self.document_body(html_content)
+        if stats is not None:
+            stats.html_bytes = len(full_html.encode('utf-8'))
+        return full_html
+
+    def compile_data(self, data, base_filename, stats=None):
+        """
+        Compile an already loaded JSON page to HTML
+
+        :param data: Root JSON node
+        :param base_filename: Page name used for the HTML and CSS filenames
+        :param stats: Optional budgets.PageStats, see render_document
+        :return: Path of the written HTML file
+        """
+        return self.write_page(base_filename, self.render_document(data, base_filename, stats))
 
     def compile_json(self, input_json_path):
         """
@@ -170,41 +343,9 @@ class JSONCompiler:
         with open(input_json_path, 'r') as f:
             data = json.load(f)
 
-
         # Extract the base filename (without extension) for the JSON file
         base_filename = os.path.splitext(os.path.basename(input_json_path))[0]
-
-        # Generate the corresponding CSS filename
-        css_filename = f"{base_filename}_styles.css"
-        
-        # Render the root node
-        html_content = self.render_node(data)
-        
-        # Generate full HTML document
-        full_html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Generated Page</title>
-    <link rel="stylesheet" href="{css_filename}">
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-</head>
-<body>
-{html_content}
-</body>
-</html>"""
-        
-        # Generate output filename
-        base_filename = os.path.splitext(os.path.basename(input_json_path))[0]
-        output_html_path = os.path.join(self.output_folder, f"{base_filename}.html")
-        
-        # Write HTML file
-        with open(output_html_path, 'w') as f:
-            f.write(full_html)
-        
-        print(f"Successfully compiled: {output_html_path}")
+        return self.compile_data(data, base_filename)
 
 def generate_css(custom_vars=None):
     """
@@ -419,7 +560,21 @@ body {{
 """
     return css_content
 
-def process_json_files(json_folder, output_folder, dsl_mapping_path, image_folder=None):
+@functools.lru_cache(maxsize=None)
+def _generate_css_cached(var_items):
+    return generate_css(dict(var_items))
+
+def generate_css_cached(custom_vars=None):
+    """
+    Memoized variant of generate_css for repeated variable sets
+
+    :param custom_vars: Optional dictionary of custom CSS variables
+    :return: CSS stylesheet as a string
+    """
+    return _generate_css_cached(tuple((custom_vars or {}).items()))
+
+def process_json_files(json_folder, output_folder, dsl_mapping_path, image_folder=None, only=None, fragment_cache_path=None, stats=None,
+                       history=None):
     """
     Process all JSON files in a folder and generate HTML and CSS dynamically.
     
@@ -427,38 +582,227 @@ def process_json_files(json_folder, output_folder, dsl_mapping_path, image_folde
     :param output_folder: Folder to store generated HTML and CSS
     :param dsl_mapping_path: Path to DSL mapping file
     :param image_folder: Optional folder for dynamic images
+    :param only: Optional set of page names to rebuild; other pages are left untouched
+    :param fragment_cache_path: Optional SQLite file used to reuse rendered fragments across runs
+    :param stats: Optional list to append a budgets.PageStats per page to
+    :param history: Build history database, defaults to telemetry.history_path(output_folder)
     """
+    from dependency_index import ElementIndex, collect_elements
+    from telemetry import BuildTelemetry, history_path, tree_stats
+
+    if stats is not None:
+        from budgets import PageStats
+
     # Create output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
     
     # Create an instance of the JSON compiler
-    compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder)
+    fragment_cache = None
+    if fragment_cache_path:
+        from fragment_cache import FragmentCache
+        fragment_cache = FragmentCache(fragment_cache_path)
+    compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder, fragment_cache)
+
+    # A selective rebuild keeps the index entries of the pages it skips
+    index = ElementIndex.load(output_folder) if only is not None else ElementIndex()
+    index.mapping = compiler.dsl_mapping
+
+    telemetry = BuildTelemetry(history or history_path(output_folder), 'json2html')
     
     # Process each JSON file
     for filename in os.listdir(json_folder):
         if filename.endswith('.json'):
+            page = os.path.splitext(filename)[0]
+            if only is not None and page not in only:
+                continue
             json_path = os.path.join(json_folder, filename)
             
             # Load the JSON file
+            start = time.perf_counter()
             with open(json_path, 'r') as f:
-                json_data = json.load(f)
+                raw_json = f.read()
+            json_data = json.loads(raw_json)
+            parsed = time.perf_counter()
 
             # Extract the style from the JSON file
             style_from_json = json_data.get('styles', {})
 
             print(style_from_json)
 
-            # Generate CSS using the style from JSON
-            css_path = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}_styles.css")
+            # Generate CSS using the style from JSON and render the page
             css_content = generate_css(style_from_json)
+            page_stats = PageStats(page) if stats is not None else None
+            full_html = compiler.render_document(json_data, page, page_stats)
+            rendered = time.perf_counter()
+            if page_stats is not None:
+                page_stats.css_bytes = len(css_content.encode('utf-8'))
+                stats.append(page_stats)
+
+            css_path = os.path.join(output_folder, f"{page}_styles.css")
             with open(css_path, 'w') as f:
                 f.write(css_content)
-
-            # Compile the JSON file to HTML
-            compiler.compile_json(json_path)
-    
+            compiler.write_page(page, full_html)
+            written = time.perf_counter()
+
+            index.add_page(page, collect_elements(json_data))
+            nodes, depth = tree_stats(json_data)
+            telemetry.record(page, len(raw_json), len(full_html) + len(css_content), nodes, depth,
+                             parsed - start, rendered - parsed, written - rendered)
+
+    index.save(output_folder)
+    telemetry.close()
+    if fragment_cache is not None:
+        fragment_cache.close()
+        fragment_cache.report()
     print("HTML and CSS generation complete.")
 
+def process_json_batch(json_folder, output_folder, dsl_mapping_path, image_folder='images', workers=None, seed=None, fragment_cache_path=None, stats=None):
+    """
+    Compile all JSON files in a folder on a thread pool.
+
+    One compiler is shared by all threads; every page renders through its own
+    JSONCompiler.context, so pages never share RNG or render state. Threads
+    overlap file I/O on standard CPython builds and render in parallel on
+    free-threaded (3.13t+) builds.
+
+    :param json_folder: Folder containing JSON files
+    :param output_folder: Folder to store generated HTML and CSS
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder for dynamic images
+    :param workers: Number of threads, defaults to ThreadPoolExecutor's default
+    :param seed: Optional seed; each page gets an RNG seeded from it and the page name,
+        so the output does not depend on scheduling
+    :param fragment_cache_path: Optional SQLite file used to reuse rendered fragments across runs
+    :param stats: Optional list to append a budgets.PageStats per page to
+    :return: Number of compiled pages
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    from dependency_index import ElementIndex, collect_elements
+
+    if stats is not None:
+        from budgets import PageStats
+
+    os.makedirs(output_folder, exist_ok=True)
+    fragment_cache = None
+    if fragment_cache_path:
+        from fragment_cache import FragmentCache
+        fragment_cache = FragmentCache(fragment_cache_path)
+    compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder, fragment_cache)
+    index = ElementIndex()
+    index.mapping = compiler.dsl_mapping
+
+    def compile_page(filename):
+        page = os.path.splitext(filename)[0]
+        context = compiler.context(random.Random(f"{seed}:{page}") if seed is not None else None)
+        with open(os.path.join(json_folder, filename), 'r') as f:
+            json_data = json.load(f)
+        css_content = generate_css_cached(json_data.get('styles', {}))
+        page_stats = PageStats(page) if stats is not None else None
+        full_html = context.render_document(json_data, page, page_stats)
+        if page_stats is not None:
+            page_stats.css_bytes = len(css_content.encode('utf-8'))
+        with open(os.path.join(output_folder, f"{page}_styles.css"), 'w') as f:
+            f.write(css_content)
+        with open(os.path.join(output_folder, f"{page}.html"), 'w') as f:
+            f.write(full_html)
+        return page, collect_elements(json_data), page_stats
+
+    filenames = sorted(filename for filename in os.listdir(json_folder) if filename.endswith('.json'))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(compile_page, filename) for filename in filenames]):
+            page, elements, page_stats = future.result()
+            index.add_page(page, elements)
+            if page_stats is not None:
+                stats.append(page_stats)
+            print(f"Successfully compiled: {os.path.join(output_folder, page + '.html')}")
+
+    index.save(output_folder)
+    if fragment_cache is not None:
+        fragment_cache.close()
+        fragment_cache.report()
+    print(f"Compiled {len(filenames)} pages.")
+    return len(filenames)
+
+def rebuild_changed_pages(json_folder, output_folder, dsl_mapping_path, image_folder='images'):
+    """
+    Rebuild only the pages affected by a change to the DSL mapping.
+
+    The mapping is diffed key by key against the snapshot stored with the
+    element index of the previous build. Pages that reference a changed
+    element, and pages that are not in the index yet, are rebuilt.
+
+    :param json_folder: Folder containing JSON files
+    :param output_folder: Folder holding the previously generated HTML and CSS
+    :param dsl_mapping_path: Path to the (changed) DSL mapping file
+    :param image_folder: Folder for dynamic images
+    :return: Set of page names that were rebuilt
+    """
+    from dependency_index import ElementIndex
+    from mapping_cache import load_mapping
+
+    new_mapping = load_mapping(dsl_mapping_path)
+
+    index = ElementIndex.load(output_folder)
+    pages = {os.path.splitext(f)[0] for f in os.listdir(json_folder) if f.endswith('.json')}
+    affected = index.affected_pages(new_mapping) | (pages - set(index.pages))
+    for page in set(index.pages) - pages:
+        index.remove_page(page)
+
+    if affected:
+        index.save(output_folder)
+        process_json_files(json_folder, output_folder, dsl_mapping_path, image_folder, only=affected)
+    else:
+        index.mapping = new_mapping
+        index.save(output_folder)
+    print(f"Rebuilt {len(affected)} of {len(pages)} pages.")
+    return affected
+
+def process_json_themes(json_folder, output_folder, dsl_mapping_path, themes, image_folder='images'):
+    """
+    Render every JSON page once and publish it in several themes.
+
+    Each page's HTML is rendered a single time and written once per theme as
+    ``<page>_<theme>.html``, differing only in the linked stylesheet. CSS is
+    generated through generate_css_cached and written once per distinct set
+    of variables, so the work grows with pages + themes rather than
+    pages x themes.
+
+    :param json_folder: Folder containing JSON files
+    :param output_folder: Folder to store generated HTML and CSS
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param themes: Dictionary of theme name -> custom CSS variables
+    :param image_folder: Folder for dynamic images
+    """
+    import hashlib
+
+    os.makedirs(output_folder, exist_ok=True)
+    compiler = JSONCompiler(dsl_mapping_path, output_folder, image_folder)
+    written_css = set()
+
+    for filename in os.listdir(json_folder):
+        if not filename.endswith('.json'):
+            continue
+        page = os.path.splitext(filename)[0]
+        with open(os.path.join(json_folder, filename), 'r') as f:
+            json_data = json.load(f)
+        style_from_json = json_data.get('styles', {})
+
+        # Render the page once; only the head differs between themes
+        body = compiler.document_body(compiler.render_page(json_data))
+
+        for theme, theme_vars in themes.items():
+            css_content = generate_css_cached({**style_from_json, **theme_vars})
+            digest = hashlib.sha1(css_content.encode('utf-8')).hexdigest()[:10]
+            css_filename = f"{theme}_styles_{digest}.css"
+            if css_filename not in written_css:
+                with open(os.path.join(output_folder, css_filename), 'w') as f:
+                    f.write(css_content)
+                written_css.add(css_filename)
+            compiler.write_page(f"{page}_{theme}", compiler.document_head(css_filename) + body)
+
+    print(f"Themed generation complete: {len(themes)} themes, {len(written_css)} stylesheets.")
+
 if __name__ == "__main__":
     # Configuration
     json_folder = 'json'  # Current directory
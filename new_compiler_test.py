@@ -0,0 +1,98 @@
+import json
+import os
+import random
+
+from json_compiler import Compiler
+from new_compiler import JSONCompiler, generate_css, generate_css_cached, process_json_batch, process_json_themes
+
+def node(element, *nodes):
+    return {'name': '', 'element': element, 'nodes': list(nodes)}
+
+def test_generate_css_cached_matches_generate_css():
+    variables = {'primary-color': '#000000'}
+    assert generate_css_cached(variables) == generate_css(variables)
+    assert generate_css_cached(variables) is generate_css_cached(dict(variables))
+    assert generate_css_cached() == generate_css()
+
+def test_process_json_themes_writes_each_page_per_theme(workdir, mapping_path):
+    os.makedirs('json')
+    for page in ('a', 'b'):
+        with open(os.path.join('json', f"{page}.json"), 'w') as f:
+            json.dump(node('root', node('image'), node('text')), f)
+
+    themes = {'dark': {'background-color': '#000000'}, 'light': {}}
+    # The default image folder is used for the image nodes
+    process_json_themes('json', 'output', mapping_path, themes)
+
+    files = set(os.listdir('output'))
+    assert {'a_dark.html', 'a_light.html', 'b_dark.html', 'b_light.html'} <= files
+    # One stylesheet per distinct set of variables, shared by the pages
+    assert len([f for f in files if f.endswith('.css')]) == 2
+
+    with open(os.path.join('output', 'a_dark.html')) as f:
+        dark = f.read()
+    with open(os.path.join('output', 'a_light.html')) as f:
+        light = f.read()
+    assert dark.split('<body>', 1)[1] == light.split('<body>', 1)[1]
+    assert 'dark_styles_' in dark and 'light_styles_' in light
+
+DSL = """container{
+\ttext-c
+\trow{
+\t\tparagraph
+\t\ttext-r
+\t}
+}
+"""
+
+def read_outputs(folder):
+    outputs = {}
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith('.html'):
+            with open(os.path.join(folder, filename), 'r') as f:
+                outputs[filename] = f.read()
+    return outputs
+
+def write_pages(folder, mapping_path, count):
+    os.makedirs(folder)
+    root = Compiler(mapping_path).parse_dsl(DSL)
+    for i in range(count):
+        with open(os.path.join(folder, f"{i}.json"), 'w') as f:
+            json.dump(root.tojson(random.Random(i)), f)
+
+def test_seeded_batch_output_does_not_depend_on_threads(workdir, mapping_path):
+    write_pages('json', mapping_path, 12)
+    assert process_json_batch('json', 'serial', mapping_path, workers=1, seed=7) == 12
+    assert process_json_batch('json', 'threaded', mapping_path, workers=4, seed=7) == 12
+    serial = read_outputs('serial')
+    assert len(serial) == 12
+    assert read_outputs('threaded') == serial
+
+    process_json_batch('json', 'other', mapping_path, workers=4, seed=8)
+    assert read_outputs('other') != serial
+
+def test_contexts_do_not_share_render_state(tmp_path, mapping_path):
+    compiler = JSONCompiler(mapping_path, None, str(tmp_path / 'images'))
+    data = Compiler(mapping_path).parse_dsl(DSL).tojson(random.Random(0))
+    first = compiler.context(random.Random(3))
+    second = compiler.context(random.Random(3))
+    html = first.render_node(data)
+    assert second.render_node(data) == html
+    assert first.features is not second.features
+    assert first.rng is not compiler.context().rng
+
+def test_component_references_with_stats(tmp_path, mapping_path):
+    from budgets import PageStats
+
+    compiler = JSONCompiler(mapping_path, None, str(tmp_path / 'images'))
+    data = node('root', node('header', {'name': '', 'element': 'use', 'component': 'hdr', 'nodes': []}),
+                {'name': '', 'element': 'use', 'component': 'hdr', 'nodes': []},
+                {'name': '', 'element': 'use', 'component': 'missing', 'nodes': []},
+                {'name': '', 'element': 'use', 'component': 'missing', 'nodes': []})
+    data['components'] = {'hdr': [node('navlink'), node('button')]}
+    stats = PageStats('p')
+    html = compiler.render_page(data, stats)
+    assert html.count('<button') == 2
+    # root, header, four use nodes and the component body twice
+    assert stats.nodes == 6 + 4
+    assert stats.elements['button'] == 2
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dependency_index import NON_ELEMENT_KEYS
+from mapping_cache import load_mapping
+
+# Elements whose "{}" slot holds text rather than child elements
+TEXT_ELEMENTS = ('text', 'text-c', 'text-r', 'paragraph')
+
+# Elements that have a "{}" slot but are rendered without their children
+OPAQUE_ELEMENTS = ('carousel',)
+
+# Page-level wrappers that never appear inside a generated page
+WRAPPER_ELEMENTS = ('root', 'body')
+
+def classify_elements(dsl_mapping):
+    """
+    Split the mapped elements into containers and leaves
+
+    :param dsl_mapping: Parsed dsl_mapping.json
+    :return: (containers, leaves) as sorted lists of element names
+    """
+    containers = []
+    leaves = []
+    for element, template in dsl_mapping.items():
+        if element in NON_ELEMENT_KEYS or element in WRAPPER_ELEMENTS:
+            continue
+        if '{}' in template and element not in TEXT_ELEMENTS and element not in OPAQUE_ELEMENTS:
+            containers.append(element)
+        else:
+            leaves.append(element)
+    return sorted(containers), sorted(leaves)
+
+class PageGenerator:
+    def __init__(self, dsl_mapping, max_depth=5, fanout=(1, 4), container_probability=0.6, top_level=(1, 4)):
+        """
+        Generate random, grammatically valid DSL pages
+
+        :param dsl_mapping: Parsed dsl_mapping.json
+        :param max_depth: Maximum nesting depth of containers
+        :param fanout: (min, max) number of children per container
+        :param container_probability: Chance that a child at depth 0 is a container;
+            it falls off linearly to 0 at max_depth
+        :param top_level: (min, max) number of top-level blocks per page
+        """
+        self.containers, self.leaves = classify_elements(dsl_mapping)
+        self.max_depth = max_depth
+        self.fanout = fanout
+        self.container_probability = container_probability
+        self.top_level = top_level
+
+    def _block(self, rng, lines, depth):
+        for _ in range(rng.randint(*self.fanout)):
+            p = self.container_probability * (1 - depth / self.max_depth)
+            if rng.random() < p:
+                lines.append('\t' * depth + rng.choice(self.containers) + '{')
+                self._block(rng, lines, depth + 1)
+                lines.append('\t' * depth + '}')
+            else:
+                lines.append('\t' * depth + rng.choice(self.leaves))
+
+    def generate(self, rng):
+        """
+        :param rng: random.Random instance
+        :return: DSL text of one page
+        """
+        lines = []
+        for _ in range(rng.randint(*self.top_level)):
+            lines.append(rng.choice(self.containers) + '{')
+            self._block(rng, lines, 1)
+            lines.append('}')
+        return '\n'.join(lines)
+
+_worker = {}
+
+def _init_worker(dsl_mapping_path, image_folder, options):
+    from json_compiler import Compiler
+    from new_compiler import JSONCompiler
+
+    dsl_mapping = load_mapping(dsl_mapping_path)
+    _worker['generator'] = PageGenerator(dsl_mapping, **options)
+    _worker['parser'] = Compiler(dsl_mapping_path)
+    _worker['renderer'] = JSONCompiler(dsl_mapping_path, None, image_folder)
+
+def _run_shard(shard, pages, seed):
+    generator = _worker['generator']
+    parser = _worker['parser']
+    renderer = _worker['renderer']
+
+    # The page structure and its placeholder content come from one shard RNG;
+    # the global random module is left alone
+    rng = random.Random(seed * 1000003 + shard)
+    context = renderer.context(rng)
+    html_bytes = 0
+    for _ in range(pages):
+        root = parser.parse_dsl(generator.generate(rng))
+        html_bytes += len(context.render_node(root.tojson(rng)))
+    return shard, pages, html_bytes
+
+def generate_pages(total_pages, shard_size=1000, workers=None, seed=0, dsl_mapping_path='dsl_mapping.json', image_folder='images', **options):
+    """
+    Generate and compile synthetic pages across a process pool.
+
+    Every shard gets its own seed derived from seed and the shard number, so
+    a run is reproducible regardless of how shards are scheduled. Pages go
+    straight through Compiler.parse_dsl -> Node.tojson -> JSONCompiler.render_node
+    without touching the filesystem.
+
+    :param total_pages: Number of pages to generate
+    :param shard_size: Pages per shard (unit of work for a worker)
+    :param workers: Number of worker processes, defaults to the CPU count
+    :param seed: Base seed
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder containing images
+    :param options: Extra PageGenerator options (max_depth, fanout, ...)
+    :return: (pages, seconds, html_bytes)
+    """
+    shards = [(i, min(shard_size, total_pages - start)) for i, start in enumerate(range(0, total_pages, shard_size))]
+    done = 0
+    html_bytes = 0
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dsl_mapping_path, image_folder, options)) as pool:
+        futures = [pool.submit(_run_shard, shard, pages, seed) for shard, pages in shards]
+        for future in as_completed(futures):
+            shard, pages, shard_bytes = future.result()
+            done += pages
+            html_bytes += shard_bytes
+            elapsed = time.perf_counter() - start_time
+            print(f"Shard {shard}: {done}/{total_pages} pages, {done / elapsed:.0f} pages/s")
+
+    elapsed = time.perf_counter() - start_time
+    if done:
+        print(f"Generated {done} pages in {elapsed:.2f}s ({done / elapsed:.0f} pages/s, {html_bytes / done:.0f} HTML bytes/page)")
+    else:
+        print("Generated 0 pages.")
+    return done, elapsed, html_bytes
+
+if __name__ == "__main__":
+    generate_pages(10000, workers=os.cpu_count())
@@ -0,0 +1,41 @@
+import random
+
+import page_generator
+from json_compiler import Compiler
+from mapping_cache import load_mapping
+from page_generator import PageGenerator, classify_elements, generate_pages
+
+def test_classify_elements(mapping_path):
+    containers, leaves = classify_elements(load_mapping(mapping_path))
+    assert 'row' in containers and 'card' in containers
+    assert {'text', 'image', 'carousel'} <= set(leaves)
+    assert 'root' not in containers + leaves
+
+def test_generated_pages_parse_within_the_depth_limit(mapping_path):
+    generator = PageGenerator(load_mapping(mapping_path), max_depth=3)
+    parser = Compiler(mapping_path)
+    rng = random.Random(1)
+    for _ in range(20):
+        text = generator.generate(rng)
+        assert max(len(line) - len(line.lstrip('\t')) for line in text.split('\n')) <= 3
+        assert parser.parse_dsl(text).children
+
+def test_run_shard_is_deterministic_and_leaves_the_global_rng_alone(tmp_path, mapping_path):
+    page_generator._init_worker(mapping_path, str(tmp_path / 'images'), {})
+    random.seed(42)
+    state = random.getstate()
+    first = page_generator._run_shard(3, 5, 7)
+    assert random.getstate() == state
+    assert page_generator._run_shard(3, 5, 7) == first
+    assert page_generator._run_shard(4, 5, 7) != first
+
+def test_generate_pages(tmp_path, mapping_path):
+    pages, _, html_bytes = generate_pages(5, shard_size=2, workers=1, seed=1, dsl_mapping_path=mapping_path,
+                                          image_folder=str(tmp_path / 'images'))
+    assert pages == 5 and html_bytes > 0
+
+def test_generate_pages_without_pages(tmp_path, mapping_path, capsys):
+    pages, seconds, html_bytes = generate_pages(0, workers=1, dsl_mapping_path=mapping_path,
+                                                image_folder=str(tmp_path / 'images'))
+    assert (pages, html_bytes) == (0, 0)
+    assert 'Generated 0 pages.' in capsys.readouterr().out
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import difflib
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+from element_registry import PrerenderedChildren
+
+GOLDEN_VERSION = 2
+CHUNK_SIZE = 256
+
+_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)([^>]*)>')
+_CLASS = re.compile(r'class=["\']([^"\']*)["\']')
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'}
+
+def digest(*parts):
+    """
+    :param parts: Strings to hash
+    :return: 16 hex digit digest
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(part.encode('utf-8'))
+    return h.hexdigest()
+
+def skeleton(html):
+    """
+    Reduce HTML to its element outline, one indented ``tag.class`` per line
+
+    :param html: HTML fragment
+    :return: Outline string
+    """
+    lines = []
+    depth = 0
+    for closing, tag, attributes in _TAG.findall(html):
+        if closing:
+            depth = max(depth - 1, 0)
+            continue
+        match = _CLASS.search(attributes)
+        classes = '.' + '.'.join(match.group(1).split()) if match and match.group(1).strip() else ''
+        lines.append('  ' * depth + tag.lower() + classes)
+        if tag.lower() not in VOID_TAGS and not attributes.rstrip().endswith('/'):
+            depth += 1
+    return '\n'.join(lines)
+
+def iter_corpus(source):
+    """
+    :param source: Folder of .json or .dsl pages, or a multi-document DSL bundle/JSONL file
+    :return: Generator of (page, kind, text) with kind 'json' or 'dsl'
+    """
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            page, ext = os.path.splitext(filename)
+            if ext in ('.json', '.dsl'):
+                with open(os.path.join(source, filename), 'r') as f:
+                    yield page, ext[1:], f.read()
+    else:
+        from json_compiler import iter_dsl_documents
+
+        with open(source, 'r', buffering=1 << 16) as stream:
+            for page, text in iter_dsl_documents(stream):
+                yield page, 'dsl', text
+
+_worker = {}
+
+def _init_worker(dsl_mapping_path, image_folder):
+    from json_compiler import Compiler
+    from new_compiler import JSONCompiler
+
+    _worker['parser'] = Compiler(dsl_mapping_path)
+    _worker['compiler'] = JSONCompiler(dsl_mapping_path, None, image_folder)
+
+def compile_page(page, kind, text, seed):
+    """
+    Compile one page with RNGs seeded from seed and the page name
+
+    The JSON and the rendered content draw from separate RNGs, so an edit
+    that changes the number of JSON draws leaves the HTML of the fragments
+    before it unchanged.
+
+    :return: (document digest, list of top-level fragment HTML)
+    """
+    from new_compiler import generate_css_cached
+
+    context = _worker['compiler'].context(random.Random(f"{seed}:{page}"))
+    data = json.loads(text) if kind == 'json' else _worker['parser'].parse_dsl(text).tojson(random.Random(f"{seed}:{page}:json"))
+    context.components = data.get('components', {})
+
+    # Rendering the top-level children one by one draws the same random
+    # content as render_node(data) and yields the fragments on the way
+    fragments = [context.render_node(child) for child in data.get('nodes', ())]
+    element = data.get('element', '')
+    handler = context.registry.get(element)
+    children = ''.join(fragments)
+    body = handler(PrerenderedChildren(context, children), data) if handler else f'<div class="{element}">{children}</div>'
+    document = context.document_head(f"{page}_styles.css") + context.document_body(body)
+    return digest(document, generate_css_cached(data.get('styles', {}))), fragments
+
+def _record_chunk(items, seed):
+    from json_compiler import ComponentError
+
+    records = {}
+    errors = {}
+    for page, kind, text in items:
+        try:
+            page_digest, fragments = compile_page(page, kind, text, seed)
+        except ComponentError as e:
+            errors[page] = str(e)
+            continue
+        records[page] = [page_digest, [digest(f) for f in fragments], [skeleton(f) for f in fragments]]
+    return records, errors
+
+def _check_chunk(items, seed, expected):
+    from json_compiler import ComponentError
+
+    changes = {}
+    for page, kind, text in items:
+        try:
+            page_digest, fragments = compile_page(page, kind, text, seed)
+        except ComponentError as e:
+            # Reported as a change: the page no longer compiles
+            changes[page] = (None, str(e))
+            continue
+        golden = expected.get(page)
+        if golden is not None and golden[0] == page_digest:
+            continue
+        fragment_digests = [digest(f) for f in fragments]
+        golden_digests = golden[1] if golden is not None else []
+        # Outlines are only built for the fragments that changed
+        changed = {i: skeleton(f) for i, f in enumerate(fragments)
+                   if i >= len(golden_digests) or golden_digests[i] != fragment_digests[i]}
+        changes[page] = (fragment_digests, changed)
+    return changes
+
+def _run(source, dsl_mapping_path, image_folder, workers, submit, seen):
+    # Chunks in flight are bounded so a large corpus is never held in memory at once
+    corpus = iter_corpus(source)
+    limit = 4 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dsl_mapping_path, image_folder)) as pool:
+        pending = set()
+        for items in iter(lambda: list(itertools.islice(corpus, CHUNK_SIZE)), []):
+            seen.update(page for page, _, _ in items)
+            pending.add(submit(pool, items))
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+def record_golden(source, golden_path='regression.json.gz', dsl_mapping_path='dsl_mapping.json', image_folder='images', seed=0, workers=None):
+    """
+    Compile a corpus with fixed seeds and store a digest per page and per top-level fragment.
+
+    The golden file holds, per page, the digest of the HTML document and its
+    CSS, the digest of every top-level fragment and the fragments' element
+    outlines (see skeleton()), gzip-compressed in one JSON file. Pages that
+    fail to parse are reported and left out.
+
+    :param source: Folder of .json/.dsl pages, or a DSL bundle/JSONL file
+    :param golden_path: Golden file to write
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder containing images
+    :param seed: Base seed of the per-page RNGs
+    :param workers: Number of worker processes, defaults to the CPU count
+    :return: Number of recorded pages
+    """
+    pages = {}
+    for records, errors in _run(source, dsl_mapping_path, image_folder, workers,
+                                lambda pool, items: pool.submit(_record_chunk, items, seed), set()):
+        pages.update(records)
+        for page, error in errors.items():
+            print(f"Error parsing {page}: {error}")
+    with gzip.open(golden_path, 'wt', encoding='utf-8') as f:
+        json.dump({'version': GOLDEN_VERSION, 'seed': seed, 'pages': pages}, f, separators=(',', ':'))
+    print(f"Recorded {len(pages)} pages to {golden_path}")
+    return len(pages)
+
+def check_golden(source, golden_path='regression.json.gz', dsl_mapping_path='dsl_mapping.json', image_folder='images', workers=None):
+    """
+    Recompile a corpus with the recorded seeds and report the pages whose output changed.
+
+    For every changed page the element outlines of the changed top-level
+    fragments are diffed against the recorded ones. A page that fails to
+    parse is reported with its error and counts as changed.
+
+    :param source: Folder of .json/.dsl pages, or a DSL bundle/JSONL file
+    :param golden_path: Golden file written by record_golden
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder containing images
+    :param workers: Number of worker processes, defaults to the CPU count
+    :return: Sorted list of changed, added, removed and unparsable page names
+    """
+    with gzip.open(golden_path, 'rt', encoding='utf-8') as f:
+        golden = json.load(f)
+    if golden.get('version') != GOLDEN_VERSION:
+        raise ValueError(f"{golden_path} was recorded by another version, record it again")
+    seed = golden['seed']
+    expected = golden['pages']
+
+    def submit(pool, items):
+        return pool.submit(_check_chunk, items, seed, {page: expected[page][:2] for page, _, _ in items if page in expected})
+
+    changes = {}
+    seen = set()
+    for chunk in _run(source, dsl_mapping_path, image_folder, workers, submit, seen):
+        changes.update(chunk)
+
+    for page in sorted(changes):
+        fragment_digests, changed = changes[page]
+        if fragment_digests is None:
+            print(f"! {page}: {changed}")
+            continue
+        if page not in expected:
+            print(f"+ {page}: new page")
+            continue
+        _, golden_digests, golden_skeletons = expected[page]
+        print(f"~ {page}: {len(changed)} of {len(fragment_digests)} top-level fragments changed")
+        for i in sorted(changed):
+            old = golden_skeletons[i].split('\n') if i < len(golden_skeletons) else []
+            new = changed[i].split('\n')
+            if old == new:
+                print(f"  fragment {i}: content changed, structure unchanged")
+                continue
+            diff = difflib.unified_diff(old, new, f"golden/{page}[{i}]", f"current/{page}[{i}]", n=1, lineterm='')
+            for line in diff:
+                print(f"  {line}")
+        if len(golden_digests) > len(fragment_digests):
+            print(f"  {len(golden_digests) - len(fragment_digests)} trailing fragments removed")
+
+    removed = sorted(set(expected) - seen)
+    for page in removed:
+        print(f"- {page}: missing from the corpus")
+
+    changed_pages = sorted(set(changes) | set(removed))
+    print(f"Checked {len(seen)} pages: {len(changed_pages)} changed")
+    return changed_pages
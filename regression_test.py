@@ -0,0 +1,68 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from regression import check_golden, record_golden, skeleton
+
+PAGES = {
+    'home': "container{\n\ttext-c\n\trow{\n\t\tparagraph\n\t}\n}\nfooter{\n\ttext\n}\n",
+    'about': "header{\n\tnavlink\n}\ncontainer{\n\tbutton\n}\n",
+}
+
+def write_corpus(folder, pages):
+    os.makedirs(folder, exist_ok=True)
+    for page, text in pages.items():
+        with open(os.path.join(folder, f"{page}.dsl"), 'w') as f:
+            f.write(text)
+
+def test_skeleton_outlines_elements():
+    html = '<div class="row  a"><img src="x"><p>text <b>bold</b></p></div><br/>'
+    assert skeleton(html) == 'div.row.a\n  img\n  p\n    b\nbr'
+
+def test_unchanged_corpus_passes_and_edits_are_reported(workdir, mapping_path, capsys):
+    write_corpus('corpus', PAGES)
+    assert record_golden('corpus', 'golden.json.gz', mapping_path, workers=1, seed=3) == 2
+    assert check_golden('corpus', 'golden.json.gz', mapping_path, workers=1) == []
+
+    write_corpus('corpus', {'home': PAGES['home'].replace('\ttext\n', '\tbutton\n'), 'contact': "container{\n\ttext\n}\n"})
+    os.remove(os.path.join('corpus', 'about.dsl'))
+    capsys.readouterr()
+    assert check_golden('corpus', 'golden.json.gz', mapping_path, workers=1) == ['about', 'contact', 'home']
+    out = capsys.readouterr().out
+    # Only the footer, the second top-level fragment of home, changed
+    assert '~ home: 1 of 2 top-level fragments changed' in out
+    assert '+ contact: new page' in out
+    assert '- about: missing from the corpus' in out
+
+def test_mapping_change_is_detected(workdir, mapping_path):
+    write_corpus('corpus', PAGES)
+    record_golden('corpus', 'golden.json.gz', mapping_path, workers=1)
+    with open(mapping_path, 'r') as f:
+        mapping = json.load(f)
+    mapping['button'] = mapping['button'].replace('class="button"', 'class="button large"')
+    with open(mapping_path, 'w') as f:
+        json.dump(mapping, f)
+    assert check_golden('corpus', 'golden.json.gz', mapping_path, workers=1) == ['about']
+
+def test_golden_of_another_version_is_rejected(workdir, mapping_path):
+    write_corpus('corpus', PAGES)
+    with gzip.open('golden.json.gz', 'wt') as f:
+        json.dump({'version': 1, 'seed': 0, 'pages': {}}, f)
+    with pytest.raises(ValueError):
+        check_golden('corpus', 'golden.json.gz', mapping_path, workers=1)
+
+def test_pages_with_component_errors_are_reported(workdir, mapping_path, capsys):
+    write_corpus('corpus', dict(PAGES, broken="row{\n\tuse nope\n}\n"))
+    assert record_golden('corpus', 'golden.json.gz', mapping_path, workers=1) == 2
+    assert 'Error parsing broken' in capsys.readouterr().out
+    # Still broken: not in the golden file, so it is new, and it does not compile
+    assert check_golden('corpus', 'golden.json.gz', mapping_path, workers=1) == ['broken']
+
+    write_corpus('corpus', {'home': "row{\n\tuse nope\n}\n", 'broken': "row{\n\ttext\n}\n"})
+    capsys.readouterr()
+    assert check_golden('corpus', 'golden.json.gz', mapping_path, workers=1) == ['broken', 'home']
+    out = capsys.readouterr().out
+    assert '! home: Line 2: unknown component nope' in out
+    assert '+ broken: new page' in out
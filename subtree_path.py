@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import json
+import re
+
+from json_compiler import DEFINE_KEYWORD, USE_KEYWORD, Node
+
+_SEGMENT = re.compile(r'^(.+?)(?:\[(\d+)\])?$')
+
+def parse_path(path):
+    """
+    Parse a subtree path such as ``root/container/row[1]/div-6[0]``
+
+    Every segment names an element; the optional index counts the siblings
+    with that element name, from 0. A segment without an index means [0].
+
+    :param path: Slash-separated path starting at root
+    :return: List of (element, index) pairs, without the root
+    """
+    segments = [segment for segment in path.strip('/').split('/') if segment]
+    if not segments or segments[0] not in ('root', 'root[0]'):
+        raise ValueError(f"Path must start at root: {path}")
+    steps = []
+    for segment in segments[1:]:
+        match = _SEGMENT.match(segment)
+        steps.append((match.group(1), int(match.group(2) or 0)))
+    return steps
+
+def canonical_path(path):
+    """
+    :param path: Subtree path
+    :return: The same path with every index written out, e.g. root/container[0]/row[1]
+    """
+    return '/'.join(['root'] + [f"{element}[{index}]" for element, index in parse_path(path)])
+
+class JSONPathIndex:
+    def __init__(self, data):
+        """
+        Resolve subtree paths in a JSON page
+
+        Children are grouped by element name only for the nodes a lookup
+        passes through, so sibling branches are never visited.
+
+        :param data: Root JSON node
+        """
+        self.data = data
+        self.groups = {}
+
+    def _children(self, node):
+        groups = self.groups.get(id(node))
+        if groups is None:
+            groups = self.groups[id(node)] = {}
+            for child in node.get('nodes', ()):
+                groups.setdefault(child.get('element', ''), []).append(child)
+        return groups
+
+    def resolve(self, path):
+        """
+        :param path: Subtree path
+        :return: JSON node at the path, or None if there is none
+        """
+        node = self.data
+        for element, index in parse_path(path):
+            siblings = self._children(node).get(element, ())
+            if index >= len(siblings):
+                return None
+            node = siblings[index]
+        return node
+
+class DSLPathIndex:
+    def __init__(self, text, compiler):
+        """
+        Resolve subtree paths in DSL text and parse only the matching lines
+
+        The index maps every canonical path to its line range. It is built on
+        the first lookup by a line scan that follows Compiler.parse_dsl's
+        stack rules without creating any nodes. Paths below a ``use`` node
+        map to the lines of the component's definition, as its JSON copies
+        the definition's nodes there.
+
+        :param text: DSL text
+        :param compiler: json_compiler.Compiler used to parse the subtree
+        """
+        self.lines = text.split('\n')
+        self.compiler = compiler
+        self.ranges = None
+        self.definitions = None
+        self.components = None
+
+    def _build(self):
+        # path -> [first line, last line, parser stack depth above the node]
+        ranges = {'root': [0, len(self.lines) - 1, 0]}
+        # Line ranges of the component definitions, and the paths inside each
+        definitions = []
+        members = {}
+        # (path, sibling counts, span, paths of the enclosing definition or None)
+        stack = [('root', {}, ranges['root'], None)]
+        last = 0
+        for line_number, line in enumerate(self.lines):
+            if not line.strip():
+                continue
+            indent = len(line) - len(line.lstrip())
+            line = line.strip()
+            while indent < len(stack) - 2:
+                stack.pop()[2][1] = last
+            if line == '}':
+                if len(stack) > 1:
+                    stack.pop()[2][1] = line_number
+            else:
+                name = line[:-1].strip() if line.endswith('{') else line
+                parent, counts, _, scope = stack[-1]
+                span = [line_number, line_number, len(stack)]
+                if line.endswith('{') and name.startswith(DEFINE_KEYWORD):
+                    # Paths inside a definition are relative to it: a use maps
+                    # them below its own path, as its JSON copies the nodes there
+                    path = ''
+                    members[name[len(DEFINE_KEYWORD):].strip()] = scope = []
+                    definitions.append(span)
+                else:
+                    component = name[len(USE_KEYWORD):].strip() if name.startswith(USE_KEYWORD) else None
+                    if component is not None:
+                        name = 'use'
+                    index = counts.get(name, 0)
+                    counts[name] = index + 1
+                    path = f"{parent}/{name}[{index}]"
+                    mapped = [(path, span)]
+                    if component is not None:
+                        mapped.extend((path + inner, inner_span) for inner, inner_span in members.get(component, ()))
+                    if scope is not None:
+                        scope.extend(mapped)
+                    else:
+                        ranges.update(mapped)
+                if line.endswith('{'):
+                    stack.append((path, {}, span, scope))
+            last = line_number
+        while len(stack) > 1:
+            stack.pop()[2][1] = last
+        self.ranges = ranges
+        self.definitions = definitions
+
+    def _components(self):
+        # Every definition is parsed before the first lookup that may use one
+        if self.components is None:
+            self.components = {}
+            for first, last, depth in self.definitions:
+                stack = [Node('root') for _ in range(depth)]
+                self.compiler.parse_lines(self.lines[first:last + 1], stack, first + 1, self.components)
+        return self.components
+
+    def resolve(self, path):
+        """
+        :param path: Subtree path
+        :return: Node parsed from the subtree's lines only, or None if there is none
+        """
+        if self.ranges is None:
+            self._build()
+        path = canonical_path(path)
+        if path not in self.ranges:
+            return None
+        first, last, depth = self.ranges[path]
+        if depth == 0:
+            return self.compiler.parse_dsl('\n'.join(self.lines))
+        # Stand-ins for the enclosing nodes keep the indentation rules intact
+        stack = [Node('root') for _ in range(depth)]
+        self.compiler.parse_lines(self.lines[first:last + 1], stack, first + 1, self._components())
+        return stack[depth - 1].children[0]
+
+def render_path(source, path, dsl_mapping_path='dsl_mapping.json', image_folder='images'):
+    """
+    Render one subtree of a JSON or DSL page, without writing any file
+
+    :param source: Path of a .json or .dsl page
+    :param path: Subtree path, e.g. root/container/row[1]/div-6[0]
+    :param dsl_mapping_path: Path to DSL mapping file
+    :param image_folder: Folder containing images
+    :return: HTML fragment, or None if the path does not exist
+    """
+    from new_compiler import JSONCompiler
+
+    renderer = JSONCompiler(dsl_mapping_path, None, image_folder)
+    renderer.features = set()
+    if source.endswith('.json'):
+        with open(source, 'r') as f:
+            data = json.load(f)
+        renderer.components = data.get('components', {})
+        node = JSONPathIndex(data).resolve(path)
+        html = renderer.render_node(node) if node is not None else None
+    else:
+        from backends import HTMLBackend, traverse
+        from json_compiler import Compiler
+
+        with open(source, 'r') as f:
+            node = DSLPathIndex(f.read(), Compiler(dsl_mapping_path)).resolve(path)
+        html = traverse(node, [HTMLBackend(renderer)])[0] if node is not None else None
+
+    if html is None:
+        print(f"Path not found in {source}: {path}")
+    return html
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from json_compiler import Compiler
+from subtree_path import DSLPathIndex, JSONPathIndex, canonical_path, parse_path, render_path
+
+DSL = """container{
+\trow{
+\t\ttext
+\t}
+\trow{
+\t\tdiv-6{
+\t\t\tparagraph
+\t\t}
+\t\tdiv-6{
+\t\t\tbutton
+\t\t}
+\t}
+}
+footer{
+\ttext
+}
+"""
+
+def structure(data):
+    return (data['element'], [structure(child) for child in data['nodes']])
+
+def test_parse_and_canonical_path():
+    assert parse_path('root/container/row[1]/div-6[0]') == [('container', 0), ('row', 1), ('div-6', 0)]
+    assert canonical_path('/root/container/row[1]/') == 'root/container[0]/row[1]'
+    with pytest.raises(ValueError):
+        parse_path('container/row')
+
+def test_dsl_and_json_indexes_resolve_the_same_subtrees(mapping_path):
+    compiler = Compiler(mapping_path)
+    data = compiler.parse_dsl(DSL).tojson()
+    dsl_index = DSLPathIndex(DSL, compiler)
+    json_index = JSONPathIndex(data)
+
+    assert dsl_index.resolve('root/container') is not None
+    assert len(dsl_index.ranges) == 11
+    for path in dsl_index.ranges:
+        assert structure(dsl_index.resolve(path).tojson()) == structure(json_index.resolve(path))
+
+    assert structure(json_index.resolve('root/container/row[1]/div-6[1]')) == ('div-6', [('button', [])])
+    assert dsl_index.resolve('root/container/row[2]') is None
+    assert json_index.resolve('root/footer/row') is None
+
+def test_render_path_of_json_and_dsl_pages(workdir, mapping_path):
+    with open('page.dsl', 'w') as f:
+        f.write(DSL)
+    data = Compiler(mapping_path).parse_dsl(DSL).tojson()
+    with open('page.json', 'w') as f:
+        json.dump(data, f)
+
+    for source in ('page.json', 'page.dsl'):
+        html = render_path(source, 'root/container/row[1]/div-6[1]', mapping_path)
+        assert html.count('<button') == 1
+        assert '<p' not in html
+        assert render_path(source, 'root/missing', mapping_path) is None
+
+COMPONENTS = """define item {
+\tdiv-6{
+\t\tbutton
+\t}
+}
+define hdr {
+\tnavlink
+\trow{
+\t\tuse item
+\t}
+}
+header{
+\tuse hdr
+}
+container{
+\ttext
+\tuse hdr
+}
+"""
+
+def test_paths_below_use_map_to_the_definition(mapping_path):
+    compiler = Compiler(mapping_path)
+    data = compiler.parse_dsl(COMPONENTS).tojson()
+    dsl_index = DSLPathIndex(COMPONENTS, compiler)
+    json_index = JSONPathIndex(data)
+
+    paths = [
+        'root/header/use',
+        'root/header/use/row',
+        'root/container/use[0]/navlink',
+        'root/container/use/row/use/div-6/button',
+    ]
+    for path in paths:
+        expected = json_index.resolve(path)
+        assert expected is not None, path
+        assert structure(dsl_index.resolve(path).tojson()) == structure(expected)
+    assert json_index.resolve('root/container/use/row/div-6') is None
+    assert dsl_index.resolve('root/container/use/row/div-6') is None
+    # Lookups never reach the definitions themselves
+    assert all(path.startswith('root') for path in dsl_index.ranges)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+HISTORY_FILENAME = '.build_history.sqlite'
+
+def history_path(output_folder):
+    return os.path.join(output_folder, HISTORY_FILENAME)
+
+def tree_stats(node):
+    """
+    :param node: Root JSON node, or root Node of a parsed DSL tree
+    :return: (node count, maximum depth) of the tree, the root being depth 1
+    """
+    count = 0
+    max_depth = 0
+    stack = [(node, 1)]
+    while stack:
+        current, depth = stack.pop()
+        count += 1
+        max_depth = max(max_depth, depth)
+        children = current.get('nodes', ()) if isinstance(current, dict) else current.children
+        stack.extend((child, depth + 1) for child in children)
+    return count, max_depth
+
+def _connect(path):
+    # sqlite3 is imported here so a compile run only pays for it once, at close()
+    import sqlite3
+
+    # dsl2json records into the HTML folder, which may not exist yet
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS runs ('
+        'id INTEGER PRIMARY KEY, stage TEXT NOT NULL, started REAL NOT NULL, finished REAL)'
+    )
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS pages ('
+        'run_id INTEGER NOT NULL, page TEXT NOT NULL, stage TEXT NOT NULL, '
+        'bytes_in INTEGER, bytes_out INTEGER, nodes INTEGER, depth INTEGER, '
+        'parse_s REAL, render_s REAL, write_s REAL)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS pages_page ON pages (page, stage, run_id)')
+    return conn
+
+class BuildTelemetry:
+    """
+    Per-file build metrics appended to a local SQLite history
+
+    One row is kept per compiled file and run; rows are buffered in memory
+    and written in a single transaction by close().
+    """
+
+    def __init__(self, path, stage):
+        """
+        :param path: Path of the SQLite history database
+        :param stage: Name of the build stage, e.g. 'dsl2json' or 'json2html'
+        """
+        self.path = path
+        self.stage = stage
+        self.started = time.time()
+        self.rows = []
+
+    def record(self, page, bytes_in, bytes_out, nodes, depth, parse_s, render_s, write_s):
+        """
+        :param parse_s: Seconds spent reading and parsing the input
+        :param render_s: Seconds spent rendering HTML, 0 for stages that render nothing
+        :param write_s: Seconds spent serializing and writing the output
+        """
+        self.rows.append((page, self.stage, bytes_in, bytes_out, nodes, depth, parse_s, render_s, write_s))
+
+    def close(self):
+        import sqlite3
+
+        try:
+            conn = _connect(self.path)
+            with conn:
+                cursor = conn.execute('INSERT INTO runs (stage, started, finished) VALUES (?, ?, ?)',
+                                      (self.stage, self.started, time.time()))
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    'INSERT INTO pages (run_id, page, stage, bytes_in, bytes_out, nodes, depth, parse_s, render_s, write_s) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(run_id,) + row for row in self.rows]
+                )
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error recording build telemetry: {e}")
+
+def report(path, limit=10, threshold=1.5, window=5):
+    """
+    Print the slowest and largest pages of the latest runs and flag compile time regressions.
+
+    A page regressed when its latest total time exceeds threshold times the
+    mean of its previous `window` runs in the same stage.
+
+    :param path: Path of the SQLite history database
+    :param limit: Number of pages listed per table
+    :param threshold: Slowdown factor that counts as a regression
+    :param window: Number of earlier runs forming the rolling baseline
+    :return: List of (page, stage, latest seconds, baseline seconds) regressions
+    """
+    if not os.path.exists(path):
+        print(f"No build history at {path}")
+        return []
+    conn = _connect(path)
+    rows = conn.execute(
+        'SELECT page, stage, total, bytes_out, nodes, depth, rn FROM ('
+        '  SELECT page, stage, parse_s + render_s + write_s AS total, bytes_out, nodes, depth, '
+        '         ROW_NUMBER() OVER (PARTITION BY page, stage ORDER BY run_id DESC) AS rn '
+        '  FROM pages) '
+        'WHERE rn <= ? ORDER BY page, stage, rn', (window + 1,)
+    ).fetchall()
+    conn.close()
+
+    latest = []
+    history = {}
+    for page, stage, total, bytes_out, nodes, depth, rn in rows:
+        if rn == 1:
+            latest.append((page, stage, total, bytes_out, nodes, depth))
+        else:
+            history.setdefault((page, stage), []).append(total)
+
+    print("Slowest pages (latest run):")
+    for page, stage, total, bytes_out, nodes, depth in sorted(latest, key=lambda r: r[2], reverse=True)[:limit]:
+        print(f"  {total * 1000:9.2f} ms  {stage:<9} {page}  ({nodes} nodes, depth {depth})")
+
+    print("Largest pages (latest run):")
+    for page, stage, total, bytes_out, nodes, depth in sorted(latest, key=lambda r: r[3] or 0, reverse=True)[:limit]:
+        print(f"  {bytes_out:9d} B   {stage:<9} {page}")
+
+    regressions = []
+    for page, stage, total, _, _, _ in latest:
+        previous = history.get((page, stage))
+        if not previous:
+            continue
+        baseline = sum(previous) / len(previous)
+        if baseline > 0 and total > threshold * baseline:
+            regressions.append((page, stage, total, baseline))
+
+    print(f"Regressions (> {threshold:g}x the mean of the previous {window} runs):")
+    for page, stage, total, baseline in sorted(regressions, key=lambda r: r[2] / r[3], reverse=True):
+        print(f"  {stage:<9} {page}: {total * 1000:.2f} ms vs {baseline * 1000:.2f} ms ({total / baseline:.1f}x)")
+    if not regressions:
+        print("  none")
+    return regressions
@@ -0,0 +1,62 @@
+import sqlite3
+
+from json_compiler import process_dsl_files
+from telemetry import BuildTelemetry, history_path, report, tree_stats
+
+def test_tree_stats():
+    tree = {'element': 'root', 'nodes': [{'element': 'row', 'nodes': [{'element': 'text'}]}, {'element': 'text'}]}
+    assert tree_stats(tree) == (4, 3)
+
+def test_dsl2json_records_serialization_as_write_time(tmp_path, mapping_path):
+    (tmp_path / 'dsl').mkdir()
+    (tmp_path / 'dsl' / 'home.dsl').write_text('container{\n\ttext\n\tbutton\n}\n')
+    output = tmp_path / 'output'
+    process_dsl_files(str(tmp_path / 'dsl'), str(output), str(tmp_path / 'json'), mapping_path)
+
+    conn = sqlite3.connect(history_path(str(output)))
+    rows = conn.execute('SELECT page, stage, nodes, depth, parse_s, render_s, write_s FROM pages').fetchall()
+    conn.close()
+    assert len(rows) == 1
+    page, stage, nodes, depth, parse_s, render_s, write_s = rows[0]
+    assert (page, stage, nodes, depth) == ('home', 'dsl2json', 4, 3)
+    assert render_s == 0.0 and parse_s > 0 and write_s > 0
+
+def test_report_flags_regressions(tmp_path, capsys):
+    path = str(tmp_path / 'history.sqlite')
+    for total in (0.01, 0.01, 0.01, 0.05):
+        telemetry = BuildTelemetry(path, 'json2html')
+        telemetry.record('slow', 100, 1000, 10, 3, 0.0, total, 0.0)
+        telemetry.record('steady', 100, 1000, 10, 3, 0.0, 0.01, 0.0)
+        telemetry.close()
+    regressions = report(path, threshold=1.5, window=3)
+    assert [(page, stage) for page, stage, _, _ in regressions] == [('slow', 'json2html')]
+    assert 'Slowest pages' in capsys.readouterr().out
+
+def test_report_without_history(tmp_path):
+    assert report(str(tmp_path / 'missing.sqlite')) == []
+
+def stages(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT page, stage FROM pages ORDER BY stage').fetchall()
+    conn.close()
+    return rows
+
+def test_dsl2json_and_json2html_share_one_history(workdir, mapping_path, capsys):
+    from cli import main
+
+    (workdir / 'dsl').mkdir()
+    (workdir / 'dsl' / 'home.dsl').write_text('container{\n\ttext\n}\n')
+    main(['--mapping', mapping_path, 'dsl2json', 'dsl', '-j', 'json'])
+    main(['--mapping', mapping_path, 'json2html', 'json'])
+    # Nothing lands next to the JSON files
+    assert not (workdir / 'json' / '.build_history.sqlite').exists()
+    assert stages(history_path('output')) == [('home', 'dsl2json'), ('home', 'json2html')]
+
+    main(['--mapping', mapping_path, '--history', 'builds.sqlite', 'dsl2json', 'dsl', '-j', 'json'])
+    main(['--mapping', mapping_path, '--history', 'builds.sqlite', 'json2html', 'json', '-o', 'site'])
+    assert stages('builds.sqlite') == [('home', 'dsl2json'), ('home', 'json2html')]
+    assert not (workdir / 'site' / '.build_history.sqlite').exists()
+
+    capsys.readouterr()
+    main(['--history', 'builds.sqlite', 'report'])
+    assert 'dsl2json  home' in capsys.readouterr().out